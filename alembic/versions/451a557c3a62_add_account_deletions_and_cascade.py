@@ -0,0 +1,41 @@
+"""add account deletions and cascade note fk
+
+Revision ID: 451a557c3a62
+Revises: a837703010d6
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '451a557c3a62'
+down_revision = 'a837703010d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('account_deletions',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('status', sa.String(), server_default='pending', nullable=False),
+    sa.Column('notes_deleted', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_account_deletions_status'), 'account_deletions', ['status'], unique=False)
+
+    # Let the database cascade note deletion instead of the ORM loading every note
+    op.drop_constraint('notes_user_id_fkey', 'notes', type_='foreignkey')
+    op.create_foreign_key('notes_user_id_fkey', 'notes', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('notes_user_id_fkey', 'notes', type_='foreignkey')
+    op.create_foreign_key('notes_user_id_fkey', 'notes', 'users', ['user_id'], ['id'])
+
+    op.drop_index(op.f('ix_account_deletions_status'), table_name='account_deletions')
+    op.drop_table('account_deletions')
@@ -0,0 +1,51 @@
+"""add jobs table
+
+Revision ID: 6f0c2a9d4e1b
+Revises: 451a557c3a62
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6f0c2a9d4e1b'
+down_revision = '451a557c3a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Uuid(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('dedupe_key', sa.String(), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    sa.Column('secret', sa.LargeBinary(), nullable=True),
+    sa.Column('status', sa.String(), server_default='queued', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('max_attempts', sa.Integer(), server_default='5', nullable=False),
+    sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('lease', sa.Uuid(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_claimable', 'jobs', ['kind', 'run_at'], unique=False,
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.create_index('uq_jobs_dedupe_key_unfinished', 'jobs', ['dedupe_key'], unique=True,
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.create_index('ix_jobs_finished_at', 'jobs', ['finished_at'], unique=False,
+                    postgresql_where=sa.text("status IN ('done', 'failed')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_finished_at', table_name='jobs', postgresql_where=sa.text("status IN ('done', 'failed')"))
+    op.drop_index('uq_jobs_dedupe_key_unfinished', table_name='jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_index('ix_jobs_claimable', table_name='jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_table('jobs')
@@ -0,0 +1,99 @@
+"""store encrypted fields as bytea
+
+Existing values are base64 text. Some clients sent urlsafe, unpadded or
+line-wrapped base64, which decode() rejects, so values are normalized
+first. A value that still doesn't decode is kept as its raw text bytes
+and logged (note id and column) instead of aborting the migration.
+
+Revision ID: 80193dd100ca
+Revises: cc104efe219f
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import logging
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# revision identifiers, used by Alembic.
+revision = '80193dd100ca'
+down_revision = 'cc104efe219f'
+branch_labels = None
+depends_on = None
+
+
+DECODE_FUNCTION = r"""
+CREATE FUNCTION pg_temp.decode_legacy_base64(value text, note_id uuid, field text) RETURNS bytea
+LANGUAGE plpgsql AS $$
+DECLARE
+    normalized text;
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+    normalized := translate(regexp_replace(value, '\s', '', 'g'), '-_', '+/');
+    normalized := normalized || repeat('=', (4 - length(normalized) % 4) % 4);
+    RETURN decode(normalized, 'base64');
+EXCEPTION WHEN invalid_parameter_value THEN
+    INSERT INTO undecodable_base64 VALUES (note_id, field);
+    RETURN convert_to(value, 'UTF8');
+END
+$$
+"""
+
+
+def _decode(column: str) -> str:
+    return f"pg_temp.decode_legacy_base64({column}, id, '{column}')"
+
+
+def upgrade() -> None:
+    op.execute("CREATE TEMP TABLE undecodable_base64 (note_id uuid, field text)")
+    op.execute(DECODE_FUNCTION)
+    op.alter_column('notes', 'encrypted_title',
+               existing_type=sa.VARCHAR(),
+               type_=postgresql.BYTEA(),
+               postgresql_using=_decode('encrypted_title'))
+    op.alter_column('notes', 'encrypted_transcription',
+               existing_type=sa.TEXT(),
+               type_=postgresql.BYTEA(),
+               postgresql_using=_decode('encrypted_transcription'))
+    # The text default cannot be cast automatically, so swap it around the type change
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=sa.TEXT(),
+               server_default=None)
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=sa.TEXT(),
+               type_=postgresql.BYTEA(),
+               postgresql_using=_decode('encrypted_content'))
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=postgresql.BYTEA(),
+               server_default=sa.text("''::bytea"))
+    if not context.is_offline_mode():
+        for note_id, field in op.get_bind().execute(sa.text("SELECT note_id, field FROM undecodable_base64")):
+            logger.warning("note %s %s: not base64, kept as raw text bytes", note_id, field)
+
+
+def downgrade() -> None:
+    # encode() wraps base64 output at 76 characters; strip the newlines
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=postgresql.BYTEA(),
+               server_default=None)
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=postgresql.BYTEA(),
+               type_=sa.TEXT(),
+               postgresql_using="translate(encode(encrypted_content, 'base64'), E'\\n', '')")
+    op.alter_column('notes', 'encrypted_content',
+               existing_type=sa.TEXT(),
+               server_default='')
+    op.alter_column('notes', 'encrypted_transcription',
+               existing_type=postgresql.BYTEA(),
+               type_=sa.TEXT(),
+               postgresql_using="translate(encode(encrypted_transcription, 'base64'), E'\\n', '')")
+    op.alter_column('notes', 'encrypted_title',
+               existing_type=postgresql.BYTEA(),
+               type_=sa.VARCHAR(),
+               postgresql_using="translate(encode(encrypted_title, 'base64'), E'\\n', '')")
@@ -0,0 +1,150 @@
+"""partition notes by user_id
+
+Every note query is scoped to one user, so with notes hash-partitioned on
+user_id the planner reads a single partition (and its small indexes)
+instead of the whole table.
+
+The table is rebuilt online:
+
+1. create `notes_partitioned` (same columns, primary key (user_id, id))
+   and mirror every write on `notes` into it with a trigger
+2. copy the existing rows over in throttled, resumable batches
+3. swap the tables in one short transaction, and keep mirroring the new
+   `notes` into the old table, now `notes_unpartitioned`, so a downgrade
+   loses nothing. Ids are only unique per user from then on, so the old
+   table is re-keyed on (user_id, id) too, and `note_search_tokens` on
+   (user_id, note_id, token), from unique indexes built concurrently
+   beforehand
+
+The partition count can't be changed without another rebuild. It defaults
+to 16 and can be set on the first run with
+`alembic -x notes_partitions=32 upgrade head`.
+
+Revision e4f8a2c6b913 stops the mirror and drops `notes_unpartitioned`:
+deploy this revision on its own first and upgrade to head once the new
+table has proven itself; until then, downgrade swaps back.
+
+Revision ID: 9d1e7c4b2a60
+Revises: 6f0c2a9d4e1b
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import context, op
+
+from app.db.online_migrations import (
+    copy_rows,
+    create_index_concurrently,
+    mirror_writes,
+    set_lock_timeout,
+    stop_mirroring,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1e7c4b2a60'
+down_revision = '6f0c2a9d4e1b'
+branch_labels = None
+depends_on = None
+
+DEFAULT_PARTITIONS = 16
+
+COLUMNS = [
+    'id', 'user_id', 'title', 'encrypted_title', 'content', 'encrypted_content',
+    'content_chunks', 'content_version', 'is_archived', 'audio_file_path',
+    'audio_duration', 'encrypted_transcription', 'has_audio', 'created_at', 'updated_at',
+]
+INDEXES = ['title', 'user_id', 'has_audio']
+# The primary key (user_id, id) serves user_id lookups
+PARTITIONED_INDEXES = ['title', 'has_audio']
+
+
+def _rename(old: str, new: str, indexes: list[str]) -> None:
+    """Rename a table with its primary key, user foreign key and indexes."""
+    op.execute(f"ALTER TABLE {old} RENAME TO {new}")
+    op.execute(f"ALTER TABLE {new} RENAME CONSTRAINT {old}_pkey TO {new}_pkey")
+    op.execute(f"ALTER TABLE {new} RENAME CONSTRAINT {old}_user_id_fkey TO {new}_user_id_fkey")
+    for column in indexes:
+        op.execute(f"ALTER INDEX ix_{old}_{column} RENAME TO ix_{new}_{column}")
+
+
+def _swap_primary_key(table: str, unique_index: str) -> None:
+    op.execute(
+        f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey, "
+        f"ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {unique_index}"
+    )
+
+
+def _point_search_tokens(foreign_key: str, columns: str, referenced: str) -> None:
+    op.execute("ALTER TABLE note_search_tokens DROP CONSTRAINT IF EXISTS note_search_tokens_note_id_fkey")
+    op.execute("ALTER TABLE note_search_tokens DROP CONSTRAINT IF EXISTS note_search_tokens_user_id_note_id_fkey")
+    op.execute(
+        f"ALTER TABLE note_search_tokens ADD CONSTRAINT {foreign_key} "
+        f"FOREIGN KEY ({columns}) REFERENCES notes ({referenced}) ON DELETE CASCADE NOT VALID"
+    )
+
+
+def _validate_search_tokens(foreign_key: str) -> None:
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE note_search_tokens VALIDATE CONSTRAINT {foreign_key}")
+
+
+def upgrade() -> None:
+    partitions = int(context.get_x_argument(as_dictionary=True).get('notes_partitions', DEFAULT_PARTITIONS))
+    set_lock_timeout()
+    # The rollback key of the old table and the new search tokens key, see step 3
+    create_index_concurrently('notes_user_id_id_key', 'notes', ['user_id', 'id'], unique=True)
+    create_index_concurrently(
+        'note_search_tokens_user_id_note_id_token_key', 'note_search_tokens',
+        ['user_id', 'note_id', 'token'], unique=True,
+    )
+
+    op.execute(
+        "CREATE TABLE notes_partitioned (LIKE notes INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY HASH (user_id)"
+    )
+    for remainder in range(partitions):
+        op.execute(
+            f"CREATE TABLE notes_p{remainder} PARTITION OF notes_partitioned "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    op.execute("ALTER TABLE notes_partitioned ADD CONSTRAINT notes_partitioned_pkey PRIMARY KEY (user_id, id)")
+    op.execute(
+        "ALTER TABLE notes_partitioned ADD CONSTRAINT notes_partitioned_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    for column in PARTITIONED_INDEXES:
+        op.execute(f"CREATE INDEX ix_notes_partitioned_{column} ON notes_partitioned ({column})")
+    mirror_writes('notes', 'notes_partitioned', COLUMNS, ['user_id', 'id'])
+
+    # Commits the above first: from here on every write reaches both tables
+    copy_rows('notes_partitioned', 'notes', 'notes_partitioned', COLUMNS, ['user_id', 'id'])
+
+    op.execute("LOCK TABLE notes, note_search_tokens IN ACCESS EXCLUSIVE MODE")
+    stop_mirroring('notes', 'notes_partitioned')
+    _rename('notes', 'notes_unpartitioned', INDEXES)
+    _rename('notes_partitioned', 'notes', PARTITIONED_INDEXES)
+    _point_search_tokens('note_search_tokens_user_id_note_id_fkey', 'user_id, note_id', 'user_id, id')
+    # After the search tokens foreign key on `id` is gone
+    _swap_primary_key('notes_unpartitioned', 'notes_user_id_id_key')
+    _swap_primary_key('note_search_tokens', 'note_search_tokens_user_id_note_id_token_key')
+    mirror_writes('notes', 'notes_unpartitioned', COLUMNS, ['user_id', 'id'])
+    _validate_search_tokens('note_search_tokens_user_id_note_id_fkey')
+
+
+def downgrade() -> None:
+    set_lock_timeout()
+    # Fails if two users have since stored a note with the same id: the old
+    # table can't hold both
+    create_index_concurrently('notes_unpartitioned_id_key', 'notes_unpartitioned', ['id'], unique=True)
+    create_index_concurrently(
+        'note_search_tokens_note_id_token_key', 'note_search_tokens', ['note_id', 'token'], unique=True
+    )
+    op.execute("LOCK TABLE notes, notes_unpartitioned, note_search_tokens IN ACCESS EXCLUSIVE MODE")
+    stop_mirroring('notes', 'notes_unpartitioned')
+    _rename('notes', 'notes_partitioned', PARTITIONED_INDEXES)
+    _rename('notes_unpartitioned', 'notes', INDEXES)
+    _swap_primary_key('notes', 'notes_unpartitioned_id_key')
+    _swap_primary_key('note_search_tokens', 'note_search_tokens_note_id_token_key')
+    _point_search_tokens('note_search_tokens_note_id_fkey', 'note_id', 'id')
+    op.execute("DROP TABLE notes_partitioned")
+    _validate_search_tokens('note_search_tokens_note_id_fkey')
@@ -0,0 +1,35 @@
+"""add chunked note content
+
+Revision ID: a837703010d6
+Revises: c1ca6885ec4a
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a837703010d6'
+down_revision = 'c1ca6885ec4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('note_content_chunks',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('data', postgresql.BYTEA(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'digest')
+    )
+    op.add_column('notes', sa.Column('content_chunks', postgresql.ARRAY(sa.String(length=64)), nullable=True))
+    op.add_column('notes', sa.Column('content_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('notes', 'content_version')
+    op.drop_column('notes', 'content_chunks')
+    op.drop_table('note_content_chunks')
@@ -0,0 +1,33 @@
+"""add note search tokens
+
+Revision ID: c1ca6885ec4a
+Revises: 80193dd100ca
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1ca6885ec4a'
+down_revision = '80193dd100ca'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('note_search_tokens',
+    sa.Column('note_id', sa.Uuid(), nullable=False),
+    sa.Column('token', sa.String(length=128), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('note_id', 'token')
+    )
+    op.create_index('ix_note_search_tokens_user_id_token', 'note_search_tokens', ['user_id', 'token'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_search_tokens_user_id_token', table_name='note_search_tokens')
+    op.drop_table('note_search_tokens')
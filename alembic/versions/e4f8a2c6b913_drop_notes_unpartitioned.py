@@ -0,0 +1,55 @@
+"""drop notes_unpartitioned
+
+Ends the rollback window of 9d1e7c4b2a60: stops mirroring `notes` into
+`notes_unpartitioned` and drops it. Deploy 9d1e7c4b2a60 on its own first and
+upgrade past it once the partitioned table has proven itself.
+
+Downgrade rebuilds the copy online (mirror, then batched copy), so
+9d1e7c4b2a60 can swap back.
+
+Revision ID: e4f8a2c6b913
+Revises: 9d1e7c4b2a60
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+
+from app.db.online_migrations import copy_rows, mirror_writes, set_lock_timeout, stop_mirroring
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f8a2c6b913'
+down_revision = '9d1e7c4b2a60'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    'id', 'user_id', 'title', 'encrypted_title', 'content', 'encrypted_content',
+    'content_chunks', 'content_version', 'is_archived', 'audio_file_path',
+    'audio_duration', 'encrypted_transcription', 'has_audio', 'created_at', 'updated_at',
+]
+INDEXES = ['title', 'user_id', 'has_audio']
+
+
+def upgrade() -> None:
+    set_lock_timeout()
+    stop_mirroring('notes', 'notes_unpartitioned')
+    op.execute("DROP TABLE IF EXISTS notes_unpartitioned")
+
+
+def downgrade() -> None:
+    set_lock_timeout()
+    # As left by 9d1e7c4b2a60: keyed like `notes`, with the old table's indexes
+    op.execute("CREATE TABLE notes_unpartitioned (LIKE notes INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("ALTER TABLE notes_unpartitioned ADD CONSTRAINT notes_unpartitioned_pkey PRIMARY KEY (user_id, id)")
+    op.execute(
+        "ALTER TABLE notes_unpartitioned ADD CONSTRAINT notes_unpartitioned_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    for column in INDEXES:
+        op.execute(f"CREATE INDEX ix_notes_unpartitioned_{column} ON notes_unpartitioned ({column})")
+    mirror_writes('notes', 'notes_unpartitioned', COLUMNS, ['user_id', 'id'])
+
+    # Batches on `id` (a shared id copies every user's row at once); no index
+    # has `id` first, so each batch sorts the table: acceptable for a rollback
+    copy_rows('notes_unpartitioned', 'notes', 'notes_unpartitioned', COLUMNS, ['user_id', 'id'])
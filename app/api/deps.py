@@ -1,11 +1,13 @@
+import secrets
 from typing import AsyncGenerator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core import security
 from app.core.config import settings
+from app.db import replicas
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
 from app.schemas.auth import TokenPayload
@@ -14,14 +16,14 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"/api/v1/auth/login"
 )
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
+        # Lets commits be attributed to the user for read-your-writes routing
+        session.info["request_state"] = request.state
         yield session
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(reusable_oauth2)
-) -> User:
+async def user_from_token(token: str) -> User:
+    """Resolve a bearer token (API_SECRET_KEY or a JWT) to the user it authenticates."""
     # Check if API_SECRET_KEY is configured and matches the provided token
     if settings.API_SECRET_KEY and token == settings.API_SECRET_KEY:
         # Return a system user for API key authentication
@@ -40,21 +42,59 @@ async def get_current_user(
     
     # Otherwise, proceed with JWT validation
     try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = security.decode_access_token(token)
         token_data = TokenPayload(**payload)
-    except (JWTError, ValueError):
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
     
-    result = await db.execute(select(User).where(User.id == token_data.sub))
-    user = result.scalars().first()
+    # Short-lived session of its own: the connection goes back to the pool
+    # before the handler runs, instead of being held through e.g. a long AI
+    # call. Sessions connect lazily, so a handler that never queries never
+    # checks one out.
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User).where(User.id == token_data.sub))
+        user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(reusable_oauth2)
+) -> User:
+    user = await user_from_token(token)
+    request.state.user_id = user.id
+    return user
+
+async def get_read_db(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only endpoints: a replica within the allowed lag, or
+    the primary when there is none or the user has just written.
+    """
+    sessionmaker = await replicas.read_sessionmaker(
+        current_user.id, replicas.client_wrote_recently(request)
+    )
+    async with sessionmaker() as session:
+        yield session
+
+async def get_admin(
+    token: str = Depends(reusable_oauth2)
+) -> None:
+    """
+    Operator-only endpoints: require the API_SECRET_KEY bearer token.
+    Disabled entirely when no API_SECRET_KEY is configured.
+    """
+    if not settings.API_SECRET_KEY or not secrets.compare_digest(token, settings.API_SECRET_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
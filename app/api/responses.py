@@ -0,0 +1,145 @@
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import anyio
+import orjson
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into an inclusive (start, end) pair.
+
+    Returns None when the whole file should be sent (no header, multiple
+    ranges or a non-bytes unit) and raises ValueError when unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError("empty range")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(Response):
+    """
+    Serve a file with HTTP Range support.
+
+    Uses the ASGI `http.response.zerocopysend` extension (sendfile) when the
+    server advertises it and falls back to streaming fixed-size chunks.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        size: int,
+        *,
+        range_header: Optional[str] = None,
+        etag: Optional[str] = None,
+        media_type: str = "application/octet-stream",
+    ) -> None:
+        self.path = path
+        headers = {"Accept-Ranges": "bytes"}
+        if etag:
+            headers["ETag"] = etag
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            status_code = 416
+            headers["Content-Range"] = f"bytes */{size}"
+            self.offset, self.count = 0, 0
+        else:
+            if byte_range is None:
+                status_code = 200
+                self.offset, self.count = 0, size
+            else:
+                status_code = 206
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                self.offset, self.count = start, end - start + 1
+        headers["Content-Length"] = str(self.count)
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"] == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f,
+                        "offset": self.offset,
+                        "count": self.count,
+                        "more_body": False,
+                    }
+                )
+            return
+
+        remaining = self.count
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.offset, os.SEEK_SET)
+            while remaining > 0:
+                chunk = await f.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": remaining > 0}
+                )
+        if remaining > 0:
+            # File shrank underneath us; close the body anyway
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class FastJSONResponse(Response):
+    """
+    JSON rendered with orjson, for handlers that build plain dicts from
+    result rows instead of returning ORM objects through response_model.
+
+    Skips FastAPI's validate-then-serialize pass; orjson writes UUIDs and
+    datetimes in the same form Pydantic does (UTC as "Z").
+    """
+    media_type = "application/json"
+
+    @staticmethod
+    def _default(value):
+        # asyncpg returns its own uuid.UUID subclass, which orjson only
+        # serializes natively for the exact uuid.UUID type
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=self._default, option=orjson.OPT_UTC_Z)
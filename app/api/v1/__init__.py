@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import routes_auth, routes_wallet_auth, routes_users, routes_notes, routes_ai
+from app.api.v1 import routes_auth, routes_wallet_auth, routes_users, routes_notes, routes_chunks, routes_audio, routes_ai, routes_admin
 
 api_router = APIRouter()
 
@@ -7,7 +7,10 @@ api_router.include_router(routes_auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(routes_wallet_auth.router, prefix="/wallet-auth", tags=["wallet-auth"])
 api_router.include_router(routes_users.router, prefix="/users", tags=["users"])
 api_router.include_router(routes_notes.router, prefix="/notes", tags=["notes"])
+api_router.include_router(routes_chunks.router, prefix="/notes", tags=["notes"])
+api_router.include_router(routes_audio.router, prefix="/notes", tags=["audio"])
 api_router.include_router(routes_ai.router, prefix="/ai", tags=["ai"])
+api_router.include_router(routes_admin.router, prefix="/admin", tags=["admin"])
 
 @api_router.get("/health", tags=["health"])
 async def health_check():
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.api import deps
+from app.core import profiling
+from app.db.replicas import replicas
+from app.db.session import engine
+from app.schemas.admin import DatabasePoolStatus, ProfileInfo
+
+router = APIRouter(dependencies=[Depends(deps.get_admin)])
+
+@router.get("/db/pool", response_model=DatabasePoolStatus)
+async def read_pool_stats() -> Any:
+    """
+    Live connection pool statistics (checkouts, waits, overflow) of this
+    worker, for the primary and each read replica.
+    """
+    return {
+        "primary": engine.pool.stats(),
+        "replicas": [
+            {
+                "url": replica.name,
+                "lag_seconds": replica.lag,
+                "usable": replica.usable,
+                "pool": replica.engine.pool.stats(),
+            }
+            for replica in replicas
+        ],
+    }
+
+@router.get("/profiles", response_model=List[ProfileInfo])
+async def read_profiles() -> Any:
+    """
+    Request profiles stored by the profiling middleware, newest first.
+    """
+    profiles = []
+    for path in profiling.list_profiles():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        profiles.append({
+            "id": path.name.removesuffix(profiling.PROFILE_SUFFIX),
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        })
+    return profiles
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=FileResponse,
+    responses={200: {"content": {"application/json": {}}}},
+)
+async def read_profile(profile_id: str) -> Any:
+    """
+    Download a request profile in speedscope format.
+    """
+    path = profiling.profile_path(profile_id)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=path.name)
@@ -0,0 +1,201 @@
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+import uuid
+
+from app.api import deps
+from app.api.responses import RangeFileResponse
+from app.core.etag import compute_etag, etag_matches
+from app.models.user import User
+from app.models.note import Note
+from app.schemas.audio import AudioUpload, AudioUploadComplete, AudioUploadCreate
+from app.services import blobstore, note_events, transcription
+
+router = APIRouter()
+
+
+async def _ensure_note(db: AsyncSession, note_id: uuid.UUID, user: User) -> None:
+    result = await db.execute(select(Note.id).where(Note.id == note_id, Note.user_id == user.id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+
+async def _attach_audio(
+    db: AsyncSession,
+    note_id: uuid.UUID,
+    user: User,
+    digest: str,
+    audio_duration: Optional[int] = None,
+    transcription_key: Optional[str] = None,
+) -> None:
+    values: dict[str, Any] = {"audio_file_path": blobstore.blob_key(digest), "has_audio": True}
+    if audio_duration is not None:
+        values["audio_duration"] = audio_duration
+    if transcription_key:
+        # The transcription of the previous audio no longer applies
+        values["encrypted_transcription"] = None
+    result = await db.execute(
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == user.id)
+        .values(**values)
+        .returning(Note.updated_at)
+    )
+    updated_at = result.scalar_one_or_none()
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if transcription_key:
+        await transcription.enqueue(db, note_id, user.id, values["audio_file_path"], transcription_key)
+    await note_events.publish(db, user.id, "updated", note_id, compute_etag(note_id, updated_at))
+    await db.commit()
+
+
+def _check_digest(digest: Optional[str]) -> None:
+    if digest is not None and not blobstore.is_valid_digest(digest):
+        raise HTTPException(status_code=422, detail="Digest must be a lowercase hex SHA-256")
+
+
+@router.post("/{note_id}/audio/uploads", response_model=AudioUpload)
+async def create_audio_upload(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    upload_in: AudioUploadCreate,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Start a resumable upload of encrypted audio for a note.
+
+    If the client sends the digest and size of a blob it already uploaded,
+    the note is linked to the stored blob and no upload is needed.
+    With `transcription_key`, the linked audio is transcribed in the background.
+    """
+    _check_digest(upload_in.digest)
+    await _ensure_note(db, note_id, current_user)
+
+    if upload_in.digest:
+        size = await blobstore.blob_size(current_user.id, upload_in.digest)
+        if size is not None and (upload_in.size is None or upload_in.size == size):
+            await _attach_audio(
+                db, note_id, current_user, upload_in.digest, transcription_key=upload_in.transcription_key
+            )
+            return AudioUpload(offset=size, completed=True, digest=upload_in.digest)
+
+    upload_id = await blobstore.create_upload(note_id)
+    return AudioUpload(upload_id=upload_id, offset=0)
+
+
+@router.get("/{note_id}/audio/uploads/{upload_id}", response_model=AudioUpload)
+async def read_audio_upload(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    upload_id: uuid.UUID,
+    response: Response,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get the current offset of an upload, to resume after a dropped connection.
+    """
+    await _ensure_note(db, note_id, current_user)
+    offset = await blobstore.upload_offset(note_id, upload_id)
+    response.headers["Upload-Offset"] = str(offset)
+    return AudioUpload(upload_id=upload_id, offset=offset)
+
+
+@router.patch("/{note_id}/audio/uploads/{upload_id}", response_model=AudioUpload)
+async def append_audio_upload(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    upload_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Append a chunk (raw request body) at `Upload-Offset`.
+
+    The body is streamed to disk without being buffered in memory.
+    """
+    await _ensure_note(db, note_id, current_user)
+    # Release the connection before the (possibly slow) body upload
+    await db.close()
+
+    offset = await blobstore.append_chunk(note_id, upload_id, upload_offset, request.stream())
+    response.headers["Upload-Offset"] = str(offset)
+    return AudioUpload(upload_id=upload_id, offset=offset)
+
+
+@router.post("/{note_id}/audio/uploads/{upload_id}/complete", response_model=AudioUpload)
+async def complete_audio_upload(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    upload_id: uuid.UUID,
+    complete_in: AudioUploadComplete,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Finish an upload: verify the digest, store the blob and link it to the note.
+
+    With `transcription_key`, the audio is queued for transcription and
+    `encrypted_transcription` is filled in once Whisper is done.
+    """
+    _check_digest(complete_in.digest)
+    await _ensure_note(db, note_id, current_user)
+    await db.close()
+
+    digest, size = await blobstore.complete_upload(
+        current_user.id, note_id, upload_id, expected_digest=complete_in.digest
+    )
+    await _attach_audio(
+        db, note_id, current_user, digest, complete_in.audio_duration, complete_in.transcription_key
+    )
+    return AudioUpload(offset=size, completed=True, digest=digest)
+
+
+@router.get(
+    "/{note_id}/audio",
+    response_class=Response,
+    responses={
+        200: {"content": {"application/octet-stream": {}}},
+        206: {"description": "Partial content"},
+    },
+)
+async def download_audio(
+    *,
+    db: AsyncSession = Depends(deps.get_read_db),
+    note_id: uuid.UUID,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download the encrypted audio of a note, honouring HTTP Range requests.
+    """
+    result = await db.execute(
+        select(Note.audio_file_path).where(Note.id == note_id, Note.user_id == current_user.id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    await db.close()
+
+    digest = blobstore.digest_from_key(row.audio_file_path)
+    size = await blobstore.blob_size(current_user.id, digest) if digest else None
+    if size is None:
+        raise HTTPException(status_code=404, detail="No audio uploaded for this note")
+
+    # Blobs are content-addressed, so the digest is a perfect strong ETag
+    etag = f'"{digest}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return RangeFileResponse(
+        blobstore.blob_path(current_user.id, digest),
+        size,
+        range_header=range_header,
+        etag=etag,
+    )
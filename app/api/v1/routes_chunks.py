@@ -0,0 +1,57 @@
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+import uuid
+
+from app.api import deps
+from app.core.etag import compute_etag
+from app.models.user import User
+from app.models.note import Note
+from app.schemas.note import ChunkDigest, Note as NoteSchema, NoteChunks, NoteChunksPatch
+from app.services import note_chunks, note_events
+
+router = APIRouter()
+
+@router.get("/{note_id}/chunks", response_model=NoteChunks)
+async def read_note_chunks(
+    *,
+    db: AsyncSession = Depends(deps.get_read_db),
+    note_id: uuid.UUID,
+    digest: List[ChunkDigest] = Query(..., max_length=256, description="Chunk digests to fetch"),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Fetch chunk ciphertexts of a chunked note by digest.
+
+    Clients compare the note's content_chunks with their local cache and
+    only fetch the digests they are missing.
+    """
+    result = await db.execute(
+        select(Note.id).where(Note.id == note_id, Note.user_id == current_user.id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    chunks = await note_chunks.fetch_chunks(db, current_user.id, digest)
+    return {"chunks": chunks}
+
+@router.patch("/{note_id}/chunks", response_model=NoteSchema)
+async def patch_note_chunks(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    patch_in: NoteChunksPatch,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Update a note body as a chunk delta.
+
+    Send the new ordered digest list, the `base_version` it was derived
+    from, and only the chunks the server does not already have. A stale
+    `base_version` is rejected with 409.
+    """
+    note = await note_chunks.apply_patch(db, note_id, current_user.id, patch_in)
+    await note_events.publish(db, current_user.id, "updated", note.id, compute_etag(note.id, note.updated_at))
+    await db.commit()
+    return note
@@ -1,31 +1,248 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from typing import Any, List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import LargeBinary, delete, insert, select, type_coerce, update
 import uuid
 
 from app.api import deps
+from app.api.responses import FastJSONResponse
+from app.core.config import settings
+from app.core.etag import compute_etag, compute_list_etag, etag_matches
 from app.models.user import User
 from app.models.note import Note
-from app.schemas.note import Note as NoteSchema, NoteCreate, NoteUpdate
+from app.schemas.note import (
+    Note as NoteSchema,
+    NoteCreate,
+    NoteImportResult,
+    NoteSummary,
+    NoteUpdate,
+    SearchToken,
+)
+from app.services import note_chunks, note_events, note_export, note_import, search_index, transcription
 
 router = APIRouter()
 
-@router.get("/", response_model=List[NoteSchema])
+# Columns selected for each response shape, kept in sync with the schemas.
+# Handlers select these and return the rows as dicts through FastJSONResponse;
+# response_model only documents the shape.
+NOTE_COLUMNS = tuple(getattr(Note, name) for name in NoteSchema.model_fields)
+SUMMARY_COLUMNS = tuple(getattr(Note, name) for name in NoteSummary.model_fields)
+
+@router.get("/", response_model=Union[List[NoteSchema], List[NoteSummary]])
 async def read_notes(
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_user),
     skip: int = 0,
     limit: int = 100,
+    view: Literal["full", "summary"] = "full",
+    if_none_match: Optional[str] = Header(None),
 ) -> Any:
     """
     Retrieve notes.
+
+    `view=summary` selects only the list-screen columns and leaves the
+    encrypted content and transcription blobs in the database.
+    The page ETag is computed from (id, updated_at) of each row. When the
+    client sends If-None-Match it is checked against a version-only query,
+    so an unchanged page is answered with 304 before any payload is loaded.
     """
+    if if_none_match:
+        result = await db.execute(
+            select(Note.id, Note.updated_at)
+            .where(Note.user_id == current_user.id)
+            .order_by(Note.created_at, Note.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        etag = compute_list_etag(result.all(), view, skip, limit)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    columns = SUMMARY_COLUMNS if view == "summary" else NOTE_COLUMNS
     result = await db.execute(
-        select(Note).where(Note.user_id == current_user.id).offset(skip).limit(limit)
+        select(*columns)
+        .where(Note.user_id == current_user.id)
+        .order_by(Note.created_at, Note.id)
+        .offset(skip)
+        .limit(limit)
     )
-    notes = result.scalars().all()
-    return notes
+    rows = result.all()
+
+    etag = compute_list_etag(((row.id, row.updated_at) for row in rows), view, skip, limit)
+    return FastJSONResponse([row._asdict() for row in rows], headers={"ETag": etag})
+
+@router.get("/search", response_model=Union[List[NoteSchema], List[NoteSummary]])
+async def search_notes(
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_user),
+    token: List[SearchToken] = Query(..., max_length=64, description="Blind-index search tokens"),
+    mode: Literal["all", "any"] = "all",
+    skip: int = 0,
+    limit: int = 100,
+    view: Literal["full", "summary"] = "summary",
+) -> Any:
+    """
+    Search notes by client-computed blind-index tokens.
+
+    `mode=all` returns notes having every token (AND), `mode=any` notes
+    having at least one (OR). Prefix search works by sending the token of
+    the prefix; clients index each prefix they want to be searchable by.
+    """
+    matches = search_index.matching_note_ids(current_user.id, token, match_all=(mode == "all"))
+    columns = SUMMARY_COLUMNS if view == "summary" else NOTE_COLUMNS
+    result = await db.execute(
+        select(*columns)
+        .where(Note.user_id == current_user.id, Note.id.in_(matches))
+        .order_by(Note.updated_at.desc(), Note.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return FastJSONResponse([row._asdict() for row in result])
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_notes(
+    current_user: User = Depends(deps.get_current_user),
+    after: Optional[uuid.UUID] = Query(None, description="Resume after this note id"),
+    compress: bool = Query(False, description="gzip the stream (Content-Encoding: gzip)"),
+) -> Any:
+    """
+    Export all notes as NDJSON, one note per line, ordered by id.
+
+    Streams from a server-side cursor, so memory use is constant. After a
+    dropped connection, resume with `after` set to the last received id.
+    Bodies of chunked notes are referenced by digest (content_chunks) and
+    fetched through the chunks endpoint.
+    """
+    headers = {"Content-Encoding": "gzip"} if compress else None
+    return StreamingResponse(
+        note_export.export_notes(current_user.id, after=after, compress=compress),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+@router.post(
+    "/import",
+    response_model=NoteImportResult,
+    openapi_extra={"requestBody": {"content": {"application/x-ndjson": {}}}},
+)
+async def import_notes(
+    request: Request,
+    start_line: int = Query(1, ge=1, description="Skip input lines before this one (resume a failed import)"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Bulk import notes from an NDJSON body (one NoteCreate-shaped object per line).
+
+    Lines are validated as they stream in and loaded in batches via COPY.
+    Each batch commits independently; rows carry an `id` (or one derived
+    from the line content), so re-running the same import is idempotent.
+    The result reports every committed batch and `committed_line`, the
+    cursor to resume from.
+    """
+    result = await note_import.import_notes(db, current_user.id, request.stream(), start_line)
+    if result.imported:
+        # Too many notes for one event each: other devices revalidate their list
+        await note_events.publish(db, current_user.id, "resync")
+        await db.commit()
+    return result
+
+def _require_note_events() -> None:
+    if not settings.NOTE_EVENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Note events are disabled")
+
+async def _sse(user_id: uuid.UUID):
+    with note_events.hub.subscribe(user_id) as subscription:
+        # Reconnect delay for EventSource after the stream ends
+        yield b"retry: 2000\n\n"
+        async for event in subscription:
+            if event is note_events.PING:
+                yield b": ping\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def note_events_stream(
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Server-Sent Events stream of the user's note changes, across devices.
+
+    Each note create, update and delete pushes `{"op", "id", "version"}`
+    (`version` is the note's ETag, null for deletes), so clients refetch
+    only notes whose ETag they don't have instead of polling the list. A
+    `resync` event means events were missed: revalidate the list with
+    If-None-Match. Comment lines are sent as a heartbeat.
+    """
+    _require_note_events()
+    return StreamingResponse(
+        _sse(current_user.id),
+        media_type="text/event-stream",
+        # No proxy buffering, or events sit in nginx until the buffer fills
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/events/ws")
+async def note_events_socket(websocket: WebSocket) -> None:
+    """
+    WebSocket variant of GET /notes/events: the same events as JSON text
+    frames, plus `{"type": "ping"}` heartbeats.
+
+    Authenticate with an `Authorization: Bearer` header, or, where the
+    client can't set headers (browsers), with a first frame
+    `{"token": "..."}`. A client that can't keep up with the frames within
+    NOTE_EVENTS_SEND_TIMEOUT is disconnected.
+    """
+    await websocket.accept()
+    try:
+        scheme, _, token = (websocket.headers.get("authorization") or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            message = await asyncio.wait_for(websocket.receive(), settings.NOTE_EVENTS_SEND_TIMEOUT)
+            if message["type"] == "websocket.disconnect":
+                return
+            # Only a text frame can carry the token; anything else is rejected below
+            first = json.loads(message.get("text") or "null")
+            token = first.get("token", "") if isinstance(first, dict) else ""
+        user = await deps.user_from_token(token)
+        _require_note_events()
+    except (HTTPException, ValueError, asyncio.TimeoutError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async def send_events() -> None:
+        with note_events.hub.subscribe(user.id) as subscription:
+            async for event in subscription:
+                await asyncio.wait_for(websocket.send_json(event), settings.NOTE_EVENTS_SEND_TIMEOUT)
+
+    async def read_until_disconnect() -> None:
+        # Client frames are ignored; reading them is how a disconnect is noticed
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(read_until_disconnect())
+    done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if sender in done:
+        error = sender.exception()
+        if error is None:
+            # Stream ended by the server (shutdown): the client reconnects
+            await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+        elif isinstance(error, asyncio.TimeoutError):
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
 
 @router.post("/", response_model=NoteSchema)
 async def create_note(
@@ -36,33 +253,62 @@ async def create_note(
 ) -> Any:
     """
     Create new note.
+
+    Single INSERT ... RETURNING; server defaults come back in the same round trip.
+    An audio note created with `transcription_key` and no transcription is
+    queued for transcription in the same transaction.
     """
-    note = Note(
-        **note_in.model_dump(),
-        user_id=current_user.id,
-        title=None,  # Explicitly set to None since we're using encrypted fields
-        content=None  # Explicitly set to None since we're using encrypted fields
+    result = await db.execute(
+        insert(Note)
+        .values(
+            **note_in.model_dump(exclude={"search_tokens", "transcription_key"}),
+            user_id=current_user.id,
+            title=None,  # Explicitly set to None since we're using encrypted fields
+            content=None  # Explicitly set to None since we're using encrypted fields
+        )
+        .returning(*NOTE_COLUMNS)
     )
-    db.add(note)
+    note = result.one()
+    if note_in.search_tokens:
+        await search_index.add_tokens(db, note.id, current_user.id, note_in.search_tokens)
+    if note_in.transcription_key and note.has_audio and note.encrypted_transcription is None:
+        await transcription.enqueue(
+            db, note.id, current_user.id, note.audio_file_path, note_in.transcription_key
+        )
+    await note_events.publish(db, current_user.id, "created", note.id, compute_etag(note.id, note.updated_at))
     await db.commit()
-    await db.refresh(note)
-    return note
+    return FastJSONResponse(note._asdict())
 
 @router.get("/{note_id}", response_model=NoteSchema)
 async def read_note(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     note_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get note by ID.
+
+    Supports conditional GET: the ETag is derived from id and updated_at,
+    and If-None-Match is checked before the encrypted payload is fetched.
     """
-    result = await db.execute(select(Note).where(Note.id == note_id, Note.user_id == current_user.id))
-    note = result.scalars().first()
+    if if_none_match:
+        result = await db.execute(
+            select(Note.updated_at).where(Note.id == note_id, Note.user_id == current_user.id)
+        )
+        updated_at = result.scalar_one_or_none()
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        etag = compute_etag(note_id, updated_at)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    result = await db.execute(select(*NOTE_COLUMNS).where(Note.id == note_id, Note.user_id == current_user.id))
+    note = result.first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    return note
+    return FastJSONResponse(note._asdict(), headers={"ETag": compute_etag(note.id, note.updated_at)})
 
 @router.put("/{note_id}", response_model=NoteSchema)
 async def update_note(
@@ -74,20 +320,45 @@ async def update_note(
 ) -> Any:
     """
     Update note.
+
+    Single UPDATE ... RETURNING scoped by user_id; no matched row means 404.
+    Other devices of the user are told through note events.
     """
-    result = await db.execute(select(Note).where(Note.id == note_id, Note.user_id == current_user.id))
-    note = result.scalars().first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    
     update_data = note_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(note, field, value)
-        
-    db.add(note)
+    search_tokens = update_data.pop("search_tokens", None)
+    replaces_body = "encrypted_content" in update_data
+    if replaces_body:
+        update_data.update(note_chunks.inline_content_values())
+    if not update_data:
+        # Nothing to change: keep updated_at untouched and just return the note
+        result = await db.execute(select(*NOTE_COLUMNS).where(Note.id == note_id, Note.user_id == current_user.id))
+    else:
+        statement = (
+            update(Note)
+            .where(Note.id == note_id, Note.user_id == current_user.id)
+            .values(**update_data)
+            .returning(*NOTE_COLUMNS)
+        )
+        if replaces_body:
+            statement = note_chunks.returning_previous_chunks(statement, note_id, current_user.id)
+        result = await db.execute(statement)
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    note = row._asdict()
+    previous_chunks = note.pop("previous_chunks", None)
+
+    if search_tokens is not None:
+        await search_index.replace_tokens(db, note["id"], current_user.id, search_tokens)
+    if previous_chunks:
+        # The note was chunked; drop the chunks it no longer references
+        await note_chunks.prune_chunks(db, current_user.id, previous_chunks)
+    if update_data:
+        await note_events.publish(
+            db, current_user.id, "updated", note["id"], compute_etag(note["id"], note["updated_at"])
+        )
     await db.commit()
-    await db.refresh(note)
-    return note
+    return FastJSONResponse(note)
 
 @router.delete("/{note_id}", response_model=NoteSchema)
 async def delete_note(
@@ -98,12 +369,96 @@ async def delete_note(
 ) -> Any:
     """
     Delete note.
+
+    Single DELETE ... RETURNING scoped by user_id; no matched row means 404.
     """
-    result = await db.execute(select(Note).where(Note.id == note_id, Note.user_id == current_user.id))
-    note = result.scalars().first()
+    result = await db.execute(
+        delete(Note)
+        .where(Note.id == note_id, Note.user_id == current_user.id)
+        .returning(*NOTE_COLUMNS)
+    )
+    note = result.first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-        
-    await db.delete(note)
+    if note.content_chunks:
+        await note_chunks.prune_chunks(db, current_user.id, note.content_chunks)
+    await note_events.publish(db, current_user.id, "deleted", note.id)
+    await db.commit()
+    return FastJSONResponse(note._asdict())
+
+# Encrypted fields available through the binary (application/octet-stream) transport
+RAW_FIELDS = {
+    "title": Note.encrypted_title,
+    "content": Note.encrypted_content,
+    "transcription": Note.encrypted_transcription,
+}
+
+@router.get(
+    "/{note_id}/raw/{field}",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+async def read_note_raw(
+    *,
+    db: AsyncSession = Depends(deps.get_read_db),
+    note_id: uuid.UUID,
+    field: Literal["title", "content", "transcription"],
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download one encrypted field as raw bytes, without base64 or JSON framing.
+    """
+    result = await db.execute(
+        select(type_coerce(RAW_FIELDS[field], LargeBinary), Note.updated_at)
+        .where(Note.id == note_id, Note.user_id == current_user.id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    data, updated_at = row
+
+    etag = compute_etag(note_id, updated_at, field)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if data is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"ETag": etag})
+    return Response(content=data, media_type="application/octet-stream", headers={"ETag": etag})
+
+@router.put("/{note_id}/raw/{field}", response_model=NoteSummary)
+async def update_note_raw(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    note_id: uuid.UUID,
+    field: Literal["title", "content", "transcription"],
+    request: Request,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Replace one encrypted field with the raw request body (application/octet-stream).
+    """
+    data = await request.body()
+    values = {RAW_FIELDS[field]: data}
+    if field == "content":
+        values.update(note_chunks.inline_content_values())
+    statement = (
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == current_user.id)
+        .values(values)
+        .returning(*SUMMARY_COLUMNS)
+    )
+    if field == "content":
+        statement = note_chunks.returning_previous_chunks(statement, note_id, current_user.id)
+    result = await db.execute(statement)
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    summary = row._asdict()
+    previous_chunks = summary.pop("previous_chunks", None)
+    if previous_chunks:
+        await note_chunks.prune_chunks(db, current_user.id, previous_chunks)
+    await note_events.publish(
+        db, current_user.id, "updated", summary["id"], compute_etag(summary["id"], summary["updated_at"])
+    )
     await db.commit()
-    return note
+    return FastJSONResponse(summary)
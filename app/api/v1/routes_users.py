@@ -1,8 +1,10 @@
 from typing import Any
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
 from app.models.user import User
-from app.schemas.user import User as UserSchema
+from app.schemas.user import AccountDeletion as AccountDeletionSchema, User as UserSchema
+from app.services import account_deletion
 
 router = APIRouter()
 
@@ -14,3 +16,20 @@ async def read_user_me(
     Get current user.
     """
     return current_user
+
+@router.delete("/me", response_model=AccountDeletionSchema, status_code=status.HTTP_202_ACCEPTED)
+async def delete_user_me(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Delete the current account.
+
+    The account is deactivated immediately; notes and the user row are
+    removed by a background job in small batches.
+    """
+    if not isinstance(current_user, User):
+        raise HTTPException(status_code=400, detail="The API key user cannot be deleted")
+    job = await account_deletion.request_deletion(db, current_user)
+    account_deletion.schedule(current_user.id)
+    return job
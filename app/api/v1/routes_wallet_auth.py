@@ -37,7 +37,6 @@ async def get_nonce(
         user.wallet_nonce = nonce
     
     await db.commit()
-    await db.refresh(user)
     
     return {"wallet_address": wallet_address, "nonce": nonce}
 
@@ -7,6 +7,20 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = -1  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = False
+    # PgBouncer transaction pooling: disable asyncpg statement caches and
+    # use unique prepared statement names
+    DB_PGBOUNCER: bool = False
+
+    # Read replicas (comma-separated URLs); GET endpoints read from them
+    DATABASE_REPLICA_URLS: str = ""
+    DATABASE_REPLICA_MAX_LAG: float = 5.0  # seconds; lagging replicas fall back to primary
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL: float = 2.0  # seconds between lag probes
+    DATABASE_READ_YOUR_WRITES_WINDOW: float = 5.0  # seconds a user reads from primary after a write
     
     # JWT
     JWT_SECRET_KEY: str
@@ -27,7 +41,65 @@ class Settings(BaseSettings):
     )
     LLM_TEMPERATURE: float = 0.4
     LLM_TIMEOUT: int = 120
+
+    # Encrypted audio blob storage (content-addressed, local filesystem)
+    BLOB_STORAGE_DIR: str = "./data/blobs"
+    AUDIO_UPLOAD_MAX_BYTES: int = 500 * 1024 * 1024
+    AUDIO_UPLOAD_EXPIRY: float = 24 * 3600.0  # seconds an unfinished upload is kept after its last write
+    AUDIO_UPLOAD_SWEEP_INTERVAL: float = 3600.0  # seconds between sweeps of abandoned uploads
+
+    # Background account deletion
+    ACCOUNT_DELETION_BATCH_SIZE: int = 1000
+    ACCOUNT_DELETION_BATCH_PAUSE: float = 0.05  # seconds between batches
+
+    # Server-side encryption (app.core.encryption)
+    ENCRYPTION_KDF_ITERATIONS: int = 600_000  # PBKDF2-HMAC-SHA256
+    ENCRYPTION_KEY_CACHE_SIZE: int = 1024  # derived keys kept per worker process
+    ENCRYPTION_KEY_CACHE_TTL: float = 900.0  # seconds
+    # Base64 AES-256 key sealing secrets the server stores for itself (job
+    # secrets); derived from JWT_SECRET_KEY when unset, so rotating that
+    # fails the queued jobs that carry a secret
+    SERVER_ENCRYPTION_KEY: Optional[str] = None
+
+    # Durable job queue (app.services.jobs), consumed by every app worker process
+    JOBS_ENABLED: bool = True
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between polls of an empty queue
+    JOB_VISIBILITY_TIMEOUT: float = 60.0  # lease, extended while a job runs; reclaimed when expired
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_DELAY: float = 5.0  # seconds, doubled per attempt
+    JOB_RETRY_MAX_DELAY: float = 600.0
+    JOB_RETENTION: float = 7 * 24 * 3600.0  # seconds done and failed jobs are kept
+    JOB_SWEEP_INTERVAL: float = 3600.0  # seconds between sweeps of finished jobs
+    JOB_SWEEP_BATCH_SIZE: int = 1000
+    TRANSCRIPTION_CONCURRENCY: int = 2  # transcription jobs per worker process
+
+    # Real-time note change events (app.services.note_events)
+    NOTE_EVENTS_ENABLED: bool = True
+    NOTE_EVENTS_LISTEN_URL: str = ""  # direct connection for LISTEN when DATABASE_URL goes through PgBouncer
+    NOTE_EVENTS_HEARTBEAT: float = 25.0  # seconds of silence before a ping (below proxy idle timeouts)
+    NOTE_EVENTS_QUEUE_SIZE: int = 100  # events a connection may lag behind before it gets a resync
+    NOTE_EVENTS_SEND_TIMEOUT: float = 10.0  # seconds; a WebSocket that can't take a frame is closed
+
+    # Per-request sampling profiler: requests carrying X-Profile-Key set to
+    # API_SECRET_KEY are always profiled, others with PROFILING_SAMPLE_RATE
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL: float = 0.001  # seconds between samples
+    PROFILING_DIR: str = "./data/profiles"
+    PROFILING_MAX_FILES: int = 200
+
+    # Production server (python -m app.server)
+    SERVER_BIND: str = "0.0.0.0:8000"
+    WEB_CONCURRENCY: Optional[int] = None  # worker processes, default: CPU count
+    SERVER_MAX_REQUESTS: int = 10000  # recycle a worker after this many requests, 0: never
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_GRACEFUL_TIMEOUT: Optional[int] = None  # drain deadline, default: longest AI timeout + 10 s
+    SERVER_KEEPALIVE: int = 5
+    AI_HTTP_MAX_CONNECTIONS: int = 100  # per worker, shared by Whisper and LLM calls
     
+    @property
+    def database_replica_urls(self) -> list[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
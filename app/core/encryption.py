@@ -1,129 +1,241 @@
 """
 Encryption Service for Vaulto Note
 
-This module will handle encryption/decryption of note content.
-Currently contains placeholder functions that pass through data unchanged.
-
-ENCRYPTION CONTRACT:
--------------------
-1. All note content MUST be encrypted before storage in DB
-2. Encryption happens in this service layer, NOT in routes
-3. API accepts/returns plaintext, DB stores encrypted data
-
-FIELDS:
--------
-- title: Plaintext (for search/indexing)
-- encrypted_title: Encrypted title (optional, for future full encryption)
-- content: LEGACY plaintext field (will be removed)
-- encrypted_content: Encrypted content (current standard)
-
-FUTURE IMPLEMENTATION:
----------------------
-Replace placeholder functions with actual encryption using:
-- Fernet (symmetric encryption)
-- User-specific keys (derived from password or separate encryption key)
-- Key derivation: PBKDF2 or Argon2
+Server-side AES-256-GCM for data the server itself has to seal or open
+(e.g. transcriptions written by background jobs). Note fields sent by the
+clients are already encrypted end to end and are stored as they come.
+
+ENVELOPE:
+---------
+nonce (12 random bytes) || ciphertext || tag (16 bytes), the same layout
+the clients use, so either side can open what the other sealed. Text
+helpers wrap the envelope in standard base64.
+
+KEYS:
+-----
+- derive_key: PBKDF2-HMAC-SHA256 with ENCRYPTION_KDF_ITERATIONS (deliberately
+  slow, hundreds of ms at the default)
+- user_key: the same, but each user's key is derived once and kept in a
+  bounded LRU cache with a TTL. Evicted keys are overwritten with zeros
+  (best effort: callers get short-lived copies, and Python and OpenSSL
+  may hold transient ones). Concurrent requests for a key that is not
+  cached yet share one derivation.
+- Derivation always runs in a worker thread; hashlib releases the GIL, so
+  the event loop keeps serving other requests meanwhile.
+- server_key: the server's own key (SERVER_ENCRYPTION_KEY, or derived from
+  JWT_SECRET_KEY), for secrets it keeps at rest such as job secrets
 
 USAGE:
 ------
-from app.core.encryption import encrypt_content, decrypt_content
+from app.core import encryption
 
-# In route handler:
-encrypted = encrypt_content(plaintext_content, user_key)
-# Store encrypted in DB
+key = await encryption.user_key(user.id, secret, salt)
+sealed = encryption.encrypt_content(plaintext, key)
+plaintext = encryption.decrypt_content(sealed, key)
 
-# When retrieving:
-plaintext = decrypt_content(encrypted_content, user_key)
-# Return plaintext to API
+# List endpoints: one thread hop for the whole page
+titles = await encryption.decrypt_many(key, [row.encrypted_title for row in rows])
 """
 
-from typing import Optional
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Sequence
+import uuid
 
+import anyio
 
-def encrypt_content(plaintext: str, encryption_key: Optional[str] = None) -> str:
-    """
-    Encrypt note content.
-    
-    Args:
-        plaintext: The plaintext content to encrypt
-        encryption_key: User-specific encryption key (optional for now)
-    
-    Returns:
-        Encrypted content as base64 string
-    
-    TODO: Implement actual encryption using Fernet or similar
-    For now, this is a passthrough function.
-    """
-    # PLACEHOLDER: Return plaintext unchanged
-    # Future: Use Fernet(key).encrypt(plaintext.encode()).decode()
-    return plaintext
+from app.core.config import settings
 
+KEY_BYTES = 32
+NONCE_BYTES = 12
+TAG_BYTES = 16
+SALT_BYTES = 16
 
-def decrypt_content(encrypted: str, encryption_key: Optional[str] = None) -> str:
-    """
-    Decrypt note content.
-    
-    Args:
-        encrypted: The encrypted content (base64 string)
-        encryption_key: User-specific encryption key (optional for now)
-    
-    Returns:
-        Decrypted plaintext content
-    
-    TODO: Implement actual decryption using Fernet or similar
-    For now, this is a passthrough function.
-    """
-    # PLACEHOLDER: Return encrypted unchanged
-    # Future: Use Fernet(key).decrypt(encrypted.encode()).decode()
-    return encrypted
+# Below this many bytes per batch, a thread hop costs more than the AES work
+_INLINE_BATCH_BYTES = 64 * 1024
+
+
+class DecryptionError(ValueError):
+    """Wrong key, or the ciphertext was truncated or tampered with."""
+
+
+@lru_cache(maxsize=None)
+def _aesgcm_class():
+    # cryptography is slow to import; load it on first use, not at worker boot
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM
+
+
+def new_salt() -> bytes:
+    return os.urandom(SALT_BYTES)
+
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    """PBKDF2-HMAC-SHA256 key derivation (slow on purpose; blocks the caller)."""
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), salt, settings.ENCRYPTION_KDF_ITERATIONS, dklen=KEY_BYTES
+    )
+
+
+@lru_cache(maxsize=None)
+def server_key() -> bytes:
+    """The server's own key: SERVER_ENCRYPTION_KEY, or one derived from JWT_SECRET_KEY."""
+    if settings.SERVER_ENCRYPTION_KEY:
+        key = base64.b64decode(settings.SERVER_ENCRYPTION_KEY, validate=True)
+        if len(key) != KEY_BYTES:
+            raise ValueError(f"SERVER_ENCRYPTION_KEY must be {KEY_BYTES} bytes, base64-encoded")
+        return key
+    # JWT_SECRET_KEY is a random secret, not a password: one HMAC suffices
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), b"vaulto server encryption key", hashlib.sha256).digest()
+
+
+def generate_encryption_key(password: str, salt: bytes) -> str:
+    """Derive a key from a password and return it base64-encoded."""
+    return base64.b64encode(derive_key(password, salt)).decode()
+
+
+def encrypt_bytes(key: bytes, plaintext: bytes, associated_data: Optional[bytes] = None) -> bytes:
+    nonce = os.urandom(NONCE_BYTES)
+    return nonce + _aesgcm_class()(bytes(key)).encrypt(nonce, plaintext, associated_data)
 
 
-def generate_encryption_key(password: str, salt: Optional[bytes] = None) -> str:
+def decrypt_bytes(key: bytes, sealed: bytes, associated_data: Optional[bytes] = None) -> bytes:
+    if len(sealed) < NONCE_BYTES + TAG_BYTES:
+        raise DecryptionError("ciphertext is too short")
+    from cryptography.exceptions import InvalidTag
+    try:
+        return _aesgcm_class()(bytes(key)).decrypt(
+            sealed[:NONCE_BYTES], sealed[NONCE_BYTES:], associated_data
+        )
+    except InvalidTag as exc:
+        raise DecryptionError("ciphertext does not authenticate with this key") from exc
+
+
+def encrypt_content(plaintext: str, encryption_key: bytes) -> str:
+    """Encrypt text and return the base64 envelope."""
+    return base64.b64encode(encrypt_bytes(encryption_key, plaintext.encode())).decode("ascii")
+
+
+def decrypt_content(encrypted: str, encryption_key: bytes) -> str:
+    """Decrypt a base64 envelope produced by encrypt_content (or a client)."""
+    return decrypt_bytes(encryption_key, base64.b64decode(encrypted)).decode()
+
+
+def _encrypt_all(key: bytes, plaintexts: Sequence[Optional[str]]) -> list[Optional[str]]:
+    aesgcm = _aesgcm_class()(bytes(key))
+    sealed: list[Optional[str]] = []
+    for text in plaintexts:
+        if text is None:
+            sealed.append(None)
+            continue
+        nonce = os.urandom(NONCE_BYTES)
+        sealed.append(base64.b64encode(nonce + aesgcm.encrypt(nonce, text.encode(), None)).decode("ascii"))
+    return sealed
+
+
+def _decrypt_all(key: bytes, envelopes: Sequence[Optional[str]]) -> list[Optional[str]]:
+    return [None if value is None else decrypt_content(value, key) for value in envelopes]
+
+
+def _batch_size(values: Sequence[Optional[str]]) -> int:
+    return sum(len(value) for value in values if value is not None)
+
+
+async def encrypt_many(key: bytes, plaintexts: Sequence[Optional[str]]) -> list[Optional[str]]:
     """
-    Generate encryption key from user password.
-    
-    Args:
-        password: User's password
-        salt: Optional salt for key derivation
-    
-    Returns:
-        Base64-encoded encryption key
-    
-    TODO: Implement using PBKDF2 or Argon2
+    Encrypt a page of values (None stays None) with one cipher instance,
+    in a worker thread unless the batch is small.
     """
-    # PLACEHOLDER
-    # Future: Use PBKDF2 or Argon2 to derive key from password
-    return "placeholder_key"
+    if _batch_size(plaintexts) <= _INLINE_BATCH_BYTES:
+        return _encrypt_all(key, plaintexts)
+    return await anyio.to_thread.run_sync(_encrypt_all, key, plaintexts)
 
 
-# Example of future implementation:
-"""
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2
-import base64
-import os
+async def decrypt_many(key: bytes, envelopes: Sequence[Optional[str]]) -> list[Optional[str]]:
+    """Batch counterpart of decrypt_content; raises DecryptionError on the first bad value."""
+    if _batch_size(envelopes) <= _INLINE_BATCH_BYTES:
+        return _decrypt_all(key, envelopes)
+    return await anyio.to_thread.run_sync(_decrypt_all, key, envelopes)
 
-def generate_encryption_key(password: str, salt: Optional[bytes] = None) -> str:
-    if salt is None:
-        salt = os.urandom(16)
-    
-    kdf = PBKDF2(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-    return key.decode()
-
-def encrypt_content(plaintext: str, encryption_key: str) -> str:
-    f = Fernet(encryption_key.encode())
-    encrypted = f.encrypt(plaintext.encode())
-    return encrypted.decode()
-
-def decrypt_content(encrypted: str, encryption_key: str) -> str:
-    f = Fernet(encryption_key.encode())
-    decrypted = f.decrypt(encrypted.encode())
-    return decrypted.decode()
-"""
+
+class KeyCache:
+    """
+    LRU + TTL cache of derived keys, keyed by a keyed hash of (user, secret,
+    salt) so that neither the secret nor a fast-to-check hash of it is kept,
+    and a wrong secret never hits another entry.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, tuple[bytearray, float]] = OrderedDict()
+        self._pending: dict[bytes, asyncio.Task] = {}
+        self._pepper = os.urandom(32)
+        self.derivations = 0
+
+    def _cache_key(self, user_id: uuid.UUID, secret: str, salt: bytes) -> bytes:
+        message = user_id.bytes + salt + secret.encode()
+        return hmac.new(self._pepper, message, hashlib.sha256).digest()
+
+    @staticmethod
+    def _zeroize(key: bytearray) -> None:
+        key[:] = bytes(len(key))
+
+    def _evict(self, cache_key: bytes) -> None:
+        key, _ = self._entries.pop(cache_key)
+        self._zeroize(key)
+
+    def _lookup(self, cache_key: bytes) -> Optional[bytearray]:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        key, expires = entry
+        if expires <= time.monotonic():
+            self._evict(cache_key)
+            return None
+        self._entries.move_to_end(cache_key)
+        return key
+
+    def _store(self, cache_key: bytes, key: bytes) -> None:
+        self._entries[cache_key] = (bytearray(key), time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+
+    async def get(self, user_id: uuid.UUID, secret: str, salt: bytes) -> bytes:
+        cache_key = self._cache_key(user_id, secret, salt)
+        key = self._lookup(cache_key)
+        if key is not None:
+            # Callers get a copy, so an eviction never zeroes a key in use
+            return bytes(key)
+
+        task = self._pending.get(cache_key)
+        if task is None:
+            # Not tied to the first caller: its cancellation must not fail the others
+            task = asyncio.create_task(self._derive(cache_key, secret, salt))
+            self._pending[cache_key] = task
+            task.add_done_callback(lambda _: self._pending.pop(cache_key, None))
+        return await asyncio.shield(task)
+
+    async def _derive(self, cache_key: bytes, secret: str, salt: bytes) -> bytes:
+        derived = await anyio.to_thread.run_sync(derive_key, secret, salt)
+        self.derivations += 1
+        self._store(cache_key, derived)
+        return derived
+
+    def clear(self) -> None:
+        for cache_key in list(self._entries):
+            self._evict(cache_key)
+
+
+key_cache = KeyCache(settings.ENCRYPTION_KEY_CACHE_SIZE, settings.ENCRYPTION_KEY_CACHE_TTL)
+
+
+async def user_key(user_id: uuid.UUID, secret: str, salt: bytes) -> bytes:
+    """A user's derived key, from the cache or derived once off the event loop."""
+    return await key_cache.get(user_id, secret, salt)
@@ -0,0 +1,35 @@
+import hashlib
+from typing import Any, Iterable, Optional
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from row versions (e.g. note id and updated_at).
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        value = part.isoformat() if hasattr(part, "isoformat") else str(part)
+        digest.update(value.encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def compute_list_etag(versions: Iterable[tuple[Any, Any]], *extra: Any) -> str:
+    """
+    Build an aggregate ETag for a page of (id, updated_at) rows.
+    """
+    parts: list[Any] = list(extra)
+    for note_id, updated_at in versions:
+        parts.extend((note_id, updated_at))
+    return compute_etag(*parts)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against the current ETag."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Weak comparison is what RFC 9110 prescribes for If-None-Match
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
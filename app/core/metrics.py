@@ -0,0 +1,272 @@
+"""
+Prometheus metrics.
+
+Series are per worker process and exposed on /metrics:
+
+- HTTP latency and in-flight requests per route template (never the raw
+  path, so label cardinality stays bounded)
+- SQL statement count and duration per request, from engine events and a
+  per-request context variable
+- Whisper / LLM call latency, payload sizes and errors (see `ai_call`)
+- background job attempts and durations per kind (app.services.jobs)
+- connection pool gauges, read from the pools only when scraped
+
+Under the multi-worker server (app.server) PROMETHEUS_MULTIPROC_DIR is set
+and the counters and histograms of all workers are aggregated on scrape;
+pool gauges then describe the worker that answered the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response headers are sent",
+    ["method", "route", "status"],
+)
+# By method only: the route is not known until routing has run
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, float("inf")),
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL statements per HTTP request",
+    ["method", "route"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+AI_REQUEST_DURATION = Histogram(
+    "ai_request_duration_seconds",
+    "Latency of calls to the AI backends",
+    ["backend"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+NOTE_EVENT_SUBSCRIPTIONS = Gauge(
+    "note_event_subscriptions",
+    "Open note event streams (WebSocket and SSE)",
+    multiprocess_mode="livesum",
+)
+NOTE_EVENTS_DROPPED = Counter(
+    "note_events_dropped_total",
+    "Event backlogs of slow subscribers replaced by a resync",
+)
+AI_REQUEST_BYTES = Histogram(
+    "ai_request_bytes",
+    "Payload sizes exchanged with the AI backends",
+    ["backend", "direction"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864),
+)
+AI_REQUEST_ERRORS = Counter(
+    "ai_request_errors_total",
+    "Failed calls to the AI backends",
+    ["backend", "reason"],
+)
+
+JOBS_PROCESSED = Counter(
+    "jobs_processed_total",
+    "Background job attempts by outcome (done, retry, failed)",
+    ["kind", "outcome"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Duration of background job attempts",
+    ["kind"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+
+@dataclass
+class _QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+_request_queries: ContextVar[Optional[_QueryStats]] = ContextVar("request_queries", default=None)
+
+
+# SQL statements of every engine (primary and replicas). The asyncpg adapter
+# runs these hooks in a greenlet that shares the caller's context, so the
+# per-request stats set by the middleware are visible here.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+@contextmanager
+def ai_call(backend: str, sent_bytes: int) -> Iterator[dict]:
+    """
+    Time a call to an AI backend. The caller stores the size of the reply
+    in the yielded dict ("received") and, on failure, a short "error" reason.
+    """
+    AI_REQUEST_BYTES.labels(backend, "sent").observe(sent_bytes)
+    outcome: dict = {}
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome.setdefault("error", "exception")
+        raise
+    finally:
+        AI_REQUEST_DURATION.labels(backend).observe(time.perf_counter() - started)
+        if "received" in outcome:
+            AI_REQUEST_BYTES.labels(backend, "received").observe(outcome["received"])
+        if "error" in outcome:
+            AI_REQUEST_ERRORS.labels(backend, outcome["error"]).inc()
+
+
+class PoolCollector:
+    """Connection pool gauges, read from the pools at scrape time."""
+
+    def collect(self):
+        from app.db.replicas import replicas
+        from app.db.session import engine
+
+        pools = [("primary", engine.pool.stats())]
+        pools += [(replica.name, replica.engine.pool.stats()) for replica in replicas]
+
+        gauges = {
+            "size": "Configured pool size",
+            "checked_out": "Connections currently in use",
+            "checked_in": "Idle connections in the pool",
+            "overflow": "Connections above pool size",
+        }
+        for key, doc in gauges.items():
+            family = GaugeMetricFamily(f"db_pool_{key}", doc, labels=["pool"])
+            for name, stats in pools:
+                family.add_metric([name], stats[key])
+            yield family
+
+        counters = {
+            "checkouts": "Connection checkouts",
+            "timeouts": "Checkouts that timed out waiting for a connection",
+            "wait_seconds": "Time spent waiting for a connection",
+        }
+        for key, doc in counters.items():
+            family = CounterMetricFamily(f"db_pool_{key}", doc, labels=["pool"])
+            stat = "wait_seconds_total" if key == "wait_seconds" else key
+            for name, stats in pools:
+                family.add_metric([name], stats[stat])
+            yield family
+
+
+REGISTRY.register(PoolCollector())
+
+
+def render() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(PoolCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering), so it is
+    cheap enough to stay on in production.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    def _route(self, scope: Scope) -> str:
+        """Path template of the route that handled the request, once routing has run."""
+        route = scope.get("route")
+        template = getattr(route, "path", None)
+        if template is None:
+            return UNMATCHED_ROUTE
+        # Routes of included routers may be matched on the rest of the path
+        # (newer FastAPI keeps them unprefixed): restore the prefix it consumed
+        path = scope["path"]
+        for start, char in enumerate(path):
+            if char == "/" and route.path_regex.match(path[start:]):
+                return path[:start] + template
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        responded = False
+        started = time.perf_counter()
+        stats = _QueryStats()
+        token = _request_queries.set(stats)
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+
+        async def send_wrapper(message) -> None:
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                HTTP_REQUEST_DURATION.labels(method, self._route(scope), str(message["status"])).observe(
+                    time.perf_counter() - started
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Routing records the matched route in `scope` (the same dict it was given)
+            route = self._route(scope)
+            if not responded:
+                # Unhandled exception before any response was started
+                HTTP_REQUEST_DURATION.labels(method, route, "500").observe(time.perf_counter() - started)
+            in_flight.dec()
+            _request_queries.reset(token)
+            HTTP_REQUEST_DB_QUERIES.labels(method, route).observe(stats.count)
+            HTTP_REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
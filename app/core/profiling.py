@@ -0,0 +1,116 @@
+"""
+On-demand per-request sampling profiler.
+
+A request is profiled when it carries `X-Profile-Key: <API_SECRET_KEY>` or
+is picked at random with PROFILING_SAMPLE_RATE. The profile is a
+wall-clock sampling profile (pyinstrument, async-aware), so time spent
+awaiting the database or an AI backend shows up at the await that waited.
+It is written to PROFILING_DIR in speedscope format (open it at
+https://www.speedscope.app) and its id is returned in `X-Profile-Id`;
+operators download it from /api/v1/admin/profiles/<id>.
+
+With no API_SECRET_KEY and a zero sample rate the middleware passes
+requests straight through.
+"""
+import logging
+import random
+import re
+import secrets
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY_HEADER = b"x-profile-key"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_SUFFIX = ".speedscope.json"
+_PROFILE_ID_RE = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{12}$")
+
+
+def profile_dir() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Path of a stored profile, or None for a malformed id."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    return profile_dir() / f"{profile_id}{PROFILE_SUFFIX}"
+
+
+def list_profiles() -> list[Path]:
+    """Stored profiles, newest first."""
+    return sorted(profile_dir().glob(f"*{PROFILE_SUFFIX}"), reverse=True)
+
+
+def _store(profile_id: str, data: str) -> None:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile_id}{PROFILE_SUFFIX}").write_text(data)
+    for stale in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        stale.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    def _requested(self, scope: Scope) -> bool:
+        if not settings.API_SECRET_KEY:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_KEY_HEADER:
+                return secrets.compare_digest(value, settings.API_SECRET_KEY.encode())
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (settings.API_SECRET_KEY or settings.PROFILING_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            from pyinstrument import Profiler
+            from pyinstrument.renderers import SpeedscopeRenderer
+        except ImportError:
+            logger.warning("Request profiling needs pyinstrument, which is not installed")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:12]}"
+
+        async def send_wrapper(message) -> None:
+            if requested and message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        # async_mode="enabled" profiles only this request's context, so
+        # concurrent requests on the same loop do not leak into the profile
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            elapsed = time.perf_counter() - started
+            try:
+                data = profiler.output(renderer=SpeedscopeRenderer())
+                await anyio.to_thread.run_sync(_store, profile_id, data)
+                logger.info(
+                    "Stored profile %s for %s %s (%.0f ms)",
+                    profile_id, scope["method"], scope["path"], elapsed * 1000,
+                )
+            except Exception:
+                logger.exception("Could not store profile %s", profile_id)
@@ -1,16 +1,21 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Any, Union
-from jose import jwt
-from passlib.context import CryptContext
-from eth_account.messages import encode_defunct
-from eth_account import Account
 import uuid
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# jose, passlib/bcrypt and especially eth_account (with its crypto stack) are
+# slow to import, so they are loaded on first use instead of at worker boot.
+
+@lru_cache(maxsize=None)
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -20,11 +25,19 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """Decode and verify a JWT; raises ValueError if it is invalid."""
+    from jose import jwt, JWTError
+    try:
+        return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError as exc:
+        raise ValueError(str(exc)) from exc
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 def generate_nonce() -> str:
     """Generate a random nonce for wallet authentication."""
@@ -34,6 +47,9 @@ def verify_wallet_signature(wallet_address: str, nonce: str, signature: str) ->
     """
     Verify that the signature was created by wallet_address signing the nonce.
     """
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
     try:
         # Construct the message that was signed. 
         # In a real app, you might want a specific message format like:
@@ -0,0 +1,464 @@
+"""
+Helpers for Alembic migrations on large, busy tables (notes above all).
+
+Plain Alembic operations take locks that are fine on an empty table but
+freeze a big one: CREATE INDEX blocks writes for the whole build, SET NOT
+NULL holds ACCESS EXCLUSIVE while it scans every row, and a one-statement
+UPDATE backfill holds row locks on the whole table until it commits.
+Conventions for migrations touching existing tables:
+
+- call `set_lock_timeout()` first. Even an instant ACCESS EXCLUSIVE lock
+  queues behind long transactions, and every query queues behind it
+- build indexes with `create_index_concurrently`, drop them with
+  `drop_index_concurrently`
+- make columns NOT NULL with `add_not_null` (NOT VALID check, validated
+  without blocking writes; SET NOT NULL then skips the scan)
+- fill columns with `backfill`: keyset batches, each its own transaction,
+  throttled, and resumable after a failure
+- rebuild a table (e.g. to partition it) as a copy: `mirror_writes` into
+  the new table, `copy_rows` the existing rows, then rename both in one
+  short transaction that starts with LOCK TABLE
+- keep these operations in their own revision: autocommit blocks commit
+  what the revision did before them
+
+Check what a range of revisions would lock before running it:
+
+    python -m app.db.online_migrations locks [base:head]
+"""
+import argparse
+import io
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import command, op
+from alembic.config import Config
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+PROGRESS_TABLE = "online_migration_progress"
+
+BACKFILL_BATCH_SIZE = 5000
+BACKFILL_PAUSE = 0.1  # seconds between batches, leaves room for replication and vacuum
+
+
+def _offline() -> bool:
+    # `alembic upgrade --sql`: emit SQL only, no database to query
+    return op.get_context().as_sql
+
+
+def set_lock_timeout(lock_timeout: str = "5s", statement_timeout: Optional[str] = None) -> None:
+    """Fail fast (and retry the deploy) instead of queueing every query behind a DDL lock."""
+    op.execute(f"SET lock_timeout = '{lock_timeout}'")
+    if statement_timeout is not None:
+        op.execute(f"SET statement_timeout = '{statement_timeout}'")
+
+
+def _drop_invalid_index(index_name: str) -> None:
+    # A failed CONCURRENTLY build leaves an INVALID index behind; rebuild it
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": index_name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def create_index_concurrently(index_name: str, table_name: str, columns: Sequence, **kw) -> None:
+    """CREATE INDEX CONCURRENTLY outside the transaction; safe to rerun."""
+    with op.get_context().autocommit_block():
+        if not _offline():
+            _drop_invalid_index(index_name)
+        op.create_index(
+            index_name, table_name, columns, postgresql_concurrently=True, if_not_exists=True, **kw
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
+
+
+def add_not_null(table_name: str, column_name: str) -> None:
+    """
+    SET NOT NULL without a long ACCESS EXCLUSIVE lock.
+
+    The NOT VALID check is added instantly and committed; VALIDATE scans
+    under SHARE UPDATE EXCLUSIVE (reads and writes go on); SET NOT NULL
+    then uses the validated check instead of scanning (PostgreSQL 12+).
+    """
+    constraint = f"ck_{table_name}_{column_name}_not_null"
+    op.execute(
+        f"ALTER TABLE {table_name} ADD CONSTRAINT {constraint} "
+        f"CHECK ({column_name} IS NOT NULL) NOT VALID"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint}")
+        op.alter_column(table_name, column_name, nullable=False)
+        op.drop_constraint(constraint, table_name, type_="check")
+
+
+def _run_batches(name: str, table_name: str, key: str, change: str, batch_size: int, pause: float) -> int:
+    """
+    Apply `change` to `table_name` one key range at a time, checkpointing.
+
+    `change` is a data-modifying statement over the `batch` CTE (column
+    `batch_key`: the next `batch_size` keys) ending in RETURNING 1.
+    """
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        conn.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ("
+            "name text PRIMARY KEY, last_key text NOT NULL, "
+            "rows_updated bigint NOT NULL DEFAULT 0, updated_at timestamptz NOT NULL DEFAULT now())"
+        ))
+        key_type = conn.execute(
+            sa.text(
+                "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                "WHERE attrelid = CAST(:table AS regclass) AND attname = :key"
+            ),
+            {"table": table_name, "key": key},
+        ).scalar_one()
+        last_key = conn.execute(
+            sa.text(f"SELECT last_key FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name}
+        ).scalar()
+        if last_key is not None:
+            logger.info("%s resumes after %s = %s", name, key, last_key)
+
+        batch = sa.text(f"""
+            WITH batch AS (
+                SELECT {key} AS batch_key FROM {table_name}
+                WHERE CAST(:last_key AS text) IS NULL OR {key} > CAST(CAST(:last_key AS text) AS {key_type})
+                ORDER BY {key}
+                LIMIT :batch_size
+            ),
+            changed AS (
+                {change}
+            ),
+            checkpoint AS (
+                SELECT CAST(max_key AS text) AS last_key, (SELECT count(*) FROM changed) AS rows_updated
+                FROM (SELECT batch_key AS max_key FROM batch ORDER BY batch_key DESC LIMIT 1) AS last_row
+            ),
+            saved AS (
+                INSERT INTO {PROGRESS_TABLE} (name, last_key, rows_updated)
+                SELECT :name, last_key, rows_updated FROM checkpoint
+                ON CONFLICT (name) DO UPDATE SET
+                    last_key = EXCLUDED.last_key,
+                    rows_updated = {PROGRESS_TABLE}.rows_updated + EXCLUDED.rows_updated,
+                    updated_at = now()
+            )
+            SELECT last_key, rows_updated FROM checkpoint
+        """)
+
+        total = 0
+        while True:
+            row = conn.execute(
+                batch, {"last_key": last_key, "batch_size": batch_size, "name": name}
+            ).first()
+            if row is None:
+                break
+            last_key = row.last_key
+            total += row.rows_updated
+            logger.info("%s: %s rows, at %s = %s", name, total, key, last_key)
+            time.sleep(pause)
+
+        conn.execute(sa.text(f"DELETE FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name})
+    return total
+
+
+def backfill(
+    name: str,
+    table_name: str,
+    set_clause: str,
+    where: str,
+    *,
+    key: str = "id",
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    pause: float = BACKFILL_PAUSE,
+) -> int:
+    """
+    UPDATE `table_name` SET `set_clause` WHERE `where`, in batches.
+
+    Rows are walked in `key` order, `batch_size` keys per transaction, with
+    `pause` seconds between batches. The last key of each batch is saved in
+    the same transaction, so a rerun after a failure resumes where it
+    stopped. `where` should exclude rows already done (e.g. `col IS NULL`).
+    Returns the number of rows updated by this run.
+    """
+    if _offline():
+        op.execute(f"-- backfill {name} runs in batches online; equivalent statement:\n"
+                   f"UPDATE {table_name} SET {set_clause} WHERE {where}")
+        return 0
+    change = (
+        f"UPDATE {table_name} SET {set_clause} "
+        f"FROM batch WHERE {table_name}.{key} = batch.batch_key AND ({where}) RETURNING 1"
+    )
+    return _run_batches(name, table_name, key, change, batch_size, pause)
+
+
+def copy_rows(
+    name: str,
+    source: str,
+    target: str,
+    columns: Sequence[str],
+    conflict_columns: Sequence[str],
+    *,
+    key: str = "id",
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    pause: float = BACKFILL_PAUSE,
+) -> int:
+    """
+    Copy every row of `source` into `target` in throttled, resumable batches.
+
+    Rows already in `target` (e.g. written there by `mirror_writes`) win:
+    conflicts on `conflict_columns` are skipped.
+    """
+    column_list = ", ".join(columns)
+    if _offline():
+        op.execute(f"-- copy {name} runs in batches online; equivalent statement:\n"
+                   f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {source}")
+        return 0
+    change = (
+        f"INSERT INTO {target} ({column_list}) "
+        f"SELECT {column_list} FROM {source} JOIN batch ON {source}.{key} = batch.batch_key "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING RETURNING 1"
+    )
+    return _run_batches(name, source, key, change, batch_size, pause)
+
+
+def mirror_writes(source: str, target: str, columns: Sequence[str], key_columns: Sequence[str]) -> None:
+    """
+    Replay every insert, update and delete on `source` into `target`, in the
+    writer's transaction, until `stop_mirroring`. Used to keep a copy current
+    while it is being filled and after a table swap, for rollback.
+    """
+    name = f"mirror_{source}_to_{target}"
+    old_key = ", ".join(f"OLD.{column}" for column in key_columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+    op.execute(f"""CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {target} WHERE ({", ".join(key_columns)}) = ({old_key});
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {target} ({", ".join(columns)}) VALUES ({new_values})
+        ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET {updates};
+    END IF;
+    RETURN NULL;
+END
+$$""")
+    op.execute(
+        f"CREATE TRIGGER {name} AFTER INSERT OR UPDATE OR DELETE ON {source} "
+        f"FOR EACH ROW EXECUTE FUNCTION {name}()"
+    )
+
+
+def stop_mirroring(source: str, target: str) -> None:
+    name = f"mirror_{source}_to_{target}"
+    op.execute(f"DROP TRIGGER IF EXISTS {name} ON {source}")
+    op.execute(f"DROP FUNCTION IF EXISTS {name}()")
+
+
+# --- Lock report -----------------------------------------------------------
+
+BLOCKS_ALL = "reads and writes"
+BLOCKS_WRITES = "writes"
+BLOCKS_NONE = "nothing"
+
+
+@dataclass
+class Rule:
+    pattern: str
+    lock: str
+    blocks: str
+    duration: str  # instant, scan, rewrite, index build or rows (DML)
+
+    def matches(self, statement: str) -> bool:
+        return re.search(self.pattern, statement, re.IGNORECASE | re.DOTALL) is not None
+
+
+# First match wins, so specific forms come before general ones
+RULES = [
+    Rule(r"^CREATE TABLE", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^CREATE (UNIQUE )?INDEX CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", BLOCKS_NONE, "index build"),
+    Rule(r"^CREATE (UNIQUE )?INDEX", "SHARE", BLOCKS_WRITES, "index build"),
+    Rule(r"^DROP INDEX CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", BLOCKS_NONE, "instant"),
+    Rule(r"^DROP INDEX", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^ALTER TABLE .* VALIDATE CONSTRAINT", "SHARE UPDATE EXCLUSIVE", BLOCKS_NONE, "scan"),
+    Rule(r"^ALTER TABLE .* FOREIGN KEY .* NOT VALID", "SHARE ROW EXCLUSIVE", BLOCKS_WRITES, "instant"),
+    Rule(r"^ALTER TABLE .* FOREIGN KEY", "SHARE ROW EXCLUSIVE", BLOCKS_WRITES, "scan"),
+    Rule(r"^ALTER TABLE .* NOT VALID", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    # Promotes an index built CONCURRENTLY beforehand; the columns are already NOT NULL
+    Rule(r"^ALTER TABLE .* (UNIQUE|PRIMARY KEY) USING INDEX", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^ALTER TABLE .* ADD (CONSTRAINT \S+ )?(CHECK|UNIQUE|PRIMARY KEY)", "ACCESS EXCLUSIVE", BLOCKS_ALL, "scan"),
+    Rule(r"^ALTER TABLE .* SET NOT NULL", "ACCESS EXCLUSIVE", BLOCKS_ALL, "scan"),
+    Rule(r"^ALTER TABLE .* TYPE ", "ACCESS EXCLUSIVE", BLOCKS_ALL, "rewrite"),
+    Rule(r"^ALTER TABLE .* ADD COLUMN .* DEFAULT .*(random|uuid|clock_timestamp|nextval)",
+         "ACCESS EXCLUSIVE", BLOCKS_ALL, "rewrite"),
+    Rule(r"^ALTER TABLE", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^DROP TABLE", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^ALTER INDEX", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^LOCK TABLE .* ACCESS EXCLUSIVE", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^CREATE TRIGGER", "SHARE ROW EXCLUSIVE", BLOCKS_WRITES, "instant"),
+    Rule(r"^DROP TRIGGER", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant"),
+    Rule(r"^(CREATE (OR REPLACE )?|DROP )FUNCTION", "none", BLOCKS_NONE, "instant"),
+    Rule(r"^(UPDATE|DELETE|INSERT)", "ROW EXCLUSIVE", BLOCKS_NONE, "rows"),
+]
+UNKNOWN = Rule("", "unknown", "unknown", "unknown")
+# SET NOT NULL on a column with a validated `CHECK (col IS NOT NULL)` skips the scan
+PROVEN_NOT_NULL = Rule("", "ACCESS EXCLUSIVE", BLOCKS_ALL, "instant")
+
+_NOT_NULL_CHECK_RE = re.compile(
+    r"^ALTER TABLE (\w+) ADD CONSTRAINT (\w+) CHECK \((\w+) IS NOT NULL\)", re.IGNORECASE
+)
+_VALIDATE_RE = re.compile(r"^ALTER TABLE \w+ VALIDATE CONSTRAINT (\w+)", re.IGNORECASE)
+_SET_NOT_NULL_RE = re.compile(r"^ALTER TABLE (\w+) ALTER COLUMN (\w+) SET NOT NULL", re.IGNORECASE)
+
+
+@dataclass
+class Finding:
+    revision: str
+    statement: str
+    table: Optional[str]
+    rule: Rule
+    lock_timeout: bool  # a lock_timeout was set earlier in the revision
+    new_table: bool  # the table was created by the same revision
+
+    @property
+    def blocking(self) -> bool:
+        """Holds a lock that blocks traffic for longer than an instant."""
+        if self.new_table or self.rule.blocks in (BLOCKS_NONE, UNKNOWN.blocks):
+            return False
+        if self.rule.lock == "ROW EXCLUSIVE":
+            return False
+        return self.rule.duration != "instant"
+
+    @property
+    def warning(self) -> Optional[str]:
+        if self.rule is UNKNOWN:
+            return "unrecognized statement, check its locks by hand"
+        if self.blocking:
+            return f"blocks {self.rule.blocks} for a full {self.rule.duration}"
+        if not self.new_table and re.match(r"^(UPDATE|DELETE)", self.statement, re.IGNORECASE):
+            return "row locks held until the revision commits; use backfill() on large tables"
+        if not self.new_table and self.rule.blocks == BLOCKS_ALL and not self.lock_timeout:
+            return "no lock_timeout: queues behind long transactions and blocks all queries meanwhile"
+        return None
+
+
+_TABLE_RE = re.compile(
+    r"^(?:ALTER TABLE|CREATE TABLE|DROP TABLE|LOCK TABLE|UPDATE|DELETE FROM|INSERT INTO)\s+"
+    r"(?:IF (?:NOT )?EXISTS\s+)?(\w+)"
+    r"|^(?:CREATE|DROP)\b.*?\b(?:INDEX|TRIGGER)\b.*?\bON\s+(\w+)",
+    re.IGNORECASE | re.DOTALL,
+)
+_SKIP_RE = re.compile(r"^(BEGIN|COMMIT|SET |--)|alembic_version", re.IGNORECASE)
+
+
+def classify(statement: str) -> Rule:
+    return next((rule for rule in RULES if rule.matches(statement)), UNKNOWN)
+
+
+def _table(statement: str) -> Optional[str]:
+    match = _TABLE_RE.search(statement)
+    return (match.group(1) or match.group(2)) if match else None
+
+
+def offline_sql(revision_range: str) -> str:
+    buffer = io.StringIO()
+    config = Config(str(ALEMBIC_INI), output_buffer=buffer)
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    command.upgrade(config, revision_range, sql=True)
+    return buffer.getvalue()
+
+
+def _split_statements(sql: str) -> list[str]:
+    """Split script output on `;` line ends, except inside $$-quoted bodies."""
+    statements, current, quoted = [], [], False
+    for line in sql.splitlines():
+        current.append(line)
+        quoted ^= line.count("$$") % 2 == 1
+        if not quoted and line.rstrip().endswith(";"):
+            statements.append("\n".join(current).rstrip().rstrip(";"))
+            current = []
+    statements.append("\n".join(current))
+    return statements
+
+
+def analyze(sql: str) -> list[Finding]:
+    """Classify each statement of `alembic upgrade --sql` output."""
+    findings: list[Finding] = []
+    revision = "?"
+    created: set[str] = set()
+    lock_timeout = False
+    checks: dict[str, tuple[str, str]] = {}  # NOT NULL check constraint -> (table, column)
+    proven: set[tuple[str, str]] = set()
+    for block in _split_statements(sql):
+        block = block.strip()
+        header = re.search(r"^-- Running upgrade .*?-> (\w+)", block, re.MULTILINE)
+        if header:
+            revision, created, lock_timeout = header.group(1), set(), False
+            block = block[header.end():].strip()
+        if re.match(r"^SET (LOCAL )?lock_timeout", block, re.IGNORECASE):
+            lock_timeout = True
+        if not block or _SKIP_RE.search(block.splitlines()[0]):
+            continue
+        statement = " ".join(block.split())
+        table = _table(statement)
+        rule = classify(statement)
+        if match := _NOT_NULL_CHECK_RE.match(statement):
+            checks[match.group(2)] = (match.group(1), match.group(3))
+            if "NOT VALID" not in statement.upper():
+                proven.add(checks[match.group(2)])
+        elif (match := _VALIDATE_RE.match(statement)) and match.group(1) in checks:
+            proven.add(checks[match.group(1)])
+        elif (match := _SET_NOT_NULL_RE.match(statement)) and match.groups() in proven:
+            rule = PROVEN_NOT_NULL
+        if statement.upper().startswith("CREATE TABLE") and table:
+            created.add(table)
+        findings.append(Finding(revision, statement, table, rule, lock_timeout, table in created))
+    return findings
+
+
+def lock_report(revision_range: str = "base:head") -> list[Finding]:
+    return analyze(offline_sql(revision_range))
+
+
+def _print_report(findings: list[Finding], out=sys.stdout) -> None:
+    revision = None
+    for finding in findings:
+        if finding.revision != revision:
+            revision = finding.revision
+            print(f"\n{revision}", file=out)
+        statement = finding.statement if len(finding.statement) <= 100 else finding.statement[:97] + "..."
+        print(f"  {finding.rule.lock:<24} {finding.rule.duration:<12} {statement}", file=out)
+        if finding.warning:
+            print(f"  {'':<24} !! {finding.warning}", file=out)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Online migration tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    locks = commands.add_parser("locks", help="Dry run: locks each migration statement would take")
+    locks.add_argument("range", nargs="?", default="base:head", help="Revision range (default base:head)")
+    locks.add_argument("--strict", action="store_true", help="Exit 1 if any statement blocks traffic")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("alembic").setLevel(logging.WARNING)
+    findings = lock_report(args.range)
+    _print_report(findings)
+    return 1 if args.strict and any(finding.blocking for finding in findings) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
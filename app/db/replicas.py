@@ -0,0 +1,199 @@
+"""
+Read-replica routing.
+
+Read-only endpoints take their session from `read_sessionmaker()`. A
+replica is chosen round-robin among those whose replication lag, probed
+at most every DATABASE_REPLICA_LAG_CHECK_INTERVAL seconds, is within
+DATABASE_REPLICA_MAX_LAG. If none qualifies, or the user committed a
+write within DATABASE_READ_YOUR_WRITES_WINDOW seconds, reads go to the
+primary.
+
+Writes are tracked per worker process and, so the next read may land on
+any worker or instance, with a marker carried by the client: responses to
+a request that committed a write carry its time in the `X-Last-Write`
+header and a cookie of the same lifetime as the window. Clients that keep
+cookies send it back by themselves; others may echo the header.
+"""
+import asyncio
+import itertools
+import logging
+import math
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, PrimarySession, make_engine
+
+logger = logging.getLogger(__name__)
+
+_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+_LAG_PROBE_TIMEOUT = 1.0
+
+WRITE_MARKER_HEADER = "X-Last-Write"
+WRITE_MARKER_COOKIE = "last_write"
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.engine: AsyncEngine = make_engine(url)
+        self.sessionmaker = async_sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        self.lag: Optional[float] = None  # None: unknown or unreachable
+        self.checked_at = float("-inf")
+        self._probing = False
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.DATABASE_REPLICA_MAX_LAG
+
+    async def refresh_lag(self) -> None:
+        if self._probing or time.monotonic() - self.checked_at < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+            return
+        self._probing = True
+        try:
+            # Bounds connecting too: an unreachable host would otherwise stall
+            # the request that triggered the probe for the full connect timeout
+            lag = await asyncio.wait_for(self._probe(), _LAG_PROBE_TIMEOUT)
+            self.lag = None if lag is None else float(lag)
+        except Exception as exc:
+            if self.lag is not None:
+                logger.warning("Replica %s unavailable: %s", self.name, exc)
+            self.lag = None
+        finally:
+            self.checked_at = time.monotonic()
+            self._probing = False
+
+    async def _probe(self) -> Optional[float]:
+        async with self.engine.connect() as conn:
+            return (await conn.execute(_LAG_QUERY)).scalar()
+
+
+replicas = [Replica(url) for url in settings.database_replica_urls]
+_round_robin = itertools.cycle(replicas) if replicas else None
+
+# user id -> monotonic time of the last committed write
+_recent_writes: dict[uuid.UUID, float] = {}
+
+
+def note_write(user_id: uuid.UUID) -> None:
+    now = time.monotonic()
+    _recent_writes[user_id] = now
+    if len(_recent_writes) > 10_000:
+        window = settings.DATABASE_READ_YOUR_WRITES_WINDOW
+        for key, at in list(_recent_writes.items()):
+            if now - at > window:
+                del _recent_writes[key]
+
+
+def wrote_recently(user_id: Optional[uuid.UUID]) -> bool:
+    at = _recent_writes.get(user_id) if user_id else None
+    return at is not None and time.monotonic() - at <= settings.DATABASE_READ_YOUR_WRITES_WINDOW
+
+
+def client_wrote_recently(conn: HTTPConnection) -> bool:
+    """Whether the client's write marker (header or cookie) is within the window."""
+    marker = conn.headers.get(WRITE_MARKER_HEADER) or conn.cookies.get(WRITE_MARKER_COOKIE)
+    try:
+        at = float(marker) if marker else None
+    except ValueError:
+        return False
+    if at is None or not math.isfinite(at):
+        return False
+    # Wall-clock time from another host: tolerate skew, not a marker far ahead
+    window = settings.DATABASE_READ_YOUR_WRITES_WINDOW
+    return -window <= time.time() - at <= window
+
+
+async def read_sessionmaker(
+    user_id: Optional[uuid.UUID] = None, client_wrote: bool = False
+) -> async_sessionmaker:
+    """Pick the session factory for a read-only request."""
+    if not replicas or client_wrote or wrote_recently(user_id):
+        return AsyncSessionLocal
+    for _ in range(len(replicas)):
+        replica = next(_round_robin)
+        await replica.refresh_lag()
+        if replica.usable:
+            return replica.sessionmaker
+    return AsyncSessionLocal
+
+
+# Write tracking on primary sessions. The request's state is attached to the
+# session by deps.get_db; get_current_user stores the user id on it.
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _track_statement(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _track_flush(session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _record_write(session) -> None:
+    if not session.info.pop("wrote", False):
+        return
+    state = session.info.get("request_state")
+    if state is None:
+        return
+    state.last_write = time.time()
+    user_id = getattr(state, "user_id", None)
+    if user_id is not None:
+        note_write(user_id)
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _reset_write(session) -> None:
+    session.info.pop("wrote", None)
+
+
+class WriteMarkerMiddleware:
+    """Pure ASGI middleware adding the write marker to responses of requests that wrote."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            # Request state lives in scope["state"]; commits precede the response
+            at = scope.get("state", {}).get("last_write")
+            if message["type"] == "http.response.start" and at is not None:
+                marker = f"{at:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers[WRITE_MARKER_HEADER] = marker
+                headers.append(
+                    "Set-Cookie",
+                    f"{WRITE_MARKER_COOKIE}={marker}; Max-Age={math.ceil(settings.DATABASE_READ_YOUR_WRITES_WINDOW)}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
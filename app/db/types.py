@@ -0,0 +1,51 @@
+import base64
+import binascii
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+class Base64Bytes(TypeDecorator):
+    """
+    Stores ciphertext as raw bytes (bytea) while exposing it to the ORM and
+    API layer as a base64 string, so JSON clients keep their contract.
+
+    Bytes values are passed through unchanged, which is what the binary
+    transport endpoints use to skip the base64 round trip entirely.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+            return value
+        return base64.b64decode(value, validate=True)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return base64.b64encode(value).decode("ascii")
+
+
+def is_base64(value: str) -> bool:
+    """Check that a string is strict (padded, standard alphabet) base64."""
+    try:
+        base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    return True
+
+
+_URLSAFE_TO_STANDARD = str.maketrans("-_", "+/")
+
+
+def normalize_base64(value: str) -> str:
+    """
+    Rewrite urlsafe, unpadded or whitespace-wrapped base64 (as some client
+    encoders emit) as strict base64. Strict input is returned unchanged.
+    """
+    if is_base64(value):
+        return value
+    value = "".join(value.split()).translate(_URLSAFE_TO_STANDARD)
+    return value + "=" * (-len(value) % 4)
@@ -1,12 +1,67 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core import metrics, profiling
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.db.replicas import WRITE_MARKER_HEADER, WriteMarkerMiddleware, replicas
+from app.db.session import engine
+from app.services import account_deletion, blobstore, jobs, note_events
+from app.services import ai as ai_service
+from app.services import transcription  # noqa: F401  (registers its job handler)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process: pools are opened here and closed on drain
+    await ai_service.open_client()
+    # Pick up account deletions interrupted by a restart
+    await account_deletion.resume_pending()
+    app.state.job_worker = jobs.Worker()
+    if settings.JOBS_ENABLED:
+        app.state.job_worker.start()
+    # One LISTEN connection per worker fans note changes out to its streams
+    app.state.event_listener = note_events.Listener()
+    if settings.NOTE_EVENTS_ENABLED:
+        app.state.event_listener.start()
+    app.state.upload_sweeper = blobstore.UploadSweeper()
+    app.state.upload_sweeper.start()
+    app.state.draining = None
+    yield
+    await begin_drain(app)
+    await ai_service.close_client()
+    await engine.dispose()
+    for replica in replicas:
+        await replica.engine.dispose()
+
+async def _drain(app: FastAPI) -> None:
+    await app.state.event_listener.stop()
+    await app.state.upload_sweeper.stop()
+    # Jobs still running after the AI timeout are retried by another worker
+    await app.state.job_worker.stop(timeout=max(settings.WHISPER_API_TIMEOUT, settings.LLM_TIMEOUT))
+
+def begin_drain(app: FastAPI) -> Optional[asyncio.Task]:
+    """
+    Stop the event streams, the upload sweeper and the job worker; idempotent.
+
+    app.server calls this as soon as a worker starts shutting down: uvicorn
+    only runs the lifespan shutdown once every connection has closed, and
+    an open event stream never would. Running jobs finish meanwhile.
+    Does nothing before the lifespan has started.
+    """
+    if not hasattr(app.state, "draining"):
+        return None
+    if app.state.draining is None:
+        app.state.draining = asyncio.create_task(_drain(app))
+    return app.state.draining
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url="/api/v1/openapi.json"
+    openapi_url="/api/v1/openapi.json",
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -16,8 +71,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[WRITE_MARKER_HEADER],
 )
 
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(WriteMarkerMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
@@ -32,6 +92,11 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,2 +1,6 @@
 from .user import User
 from .note import Note
+from .search_token import NoteSearchToken
+from .content_chunk import NoteContentChunk
+from .account_deletion import AccountDeletion
+from .job import Job
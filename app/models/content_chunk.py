@@ -0,0 +1,18 @@
+from sqlalchemy import String, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+import uuid
+
+from app.db.session import Base
+from app.db.types import Base64Bytes
+
+class NoteContentChunk(Base):
+    """
+    Individually encrypted piece of a chunked note body, addressed by the
+    SHA-256 of its ciphertext. Deduplicated per user; notes reference chunks
+    through the ordered Note.content_chunks manifest.
+    """
+    __tablename__ = "note_content_chunks"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[str] = mapped_column(Base64Bytes)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import String, Integer, DateTime, LargeBinary, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+import uuid
+
+from app.db.session import Base
+
+class Job(Base):
+    """
+    Durable background job, claimed by workers with FOR UPDATE SKIP LOCKED
+    (see app.services.jobs).
+
+    `secret` holds key material a handler needs (e.g. a client-provided note
+    key), sealed with the server key, and is wiped as soon as the job
+    succeeds or fails for good.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim scan: only unfinished jobs, in due order
+        Index(
+            "ix_jobs_claimable", "kind", "run_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        # At most one unfinished job per key (e.g. one transcription per note
+        # and audio); once it has finished the key can be enqueued again
+        Index(
+            "uq_jobs_dedupe_key_unfinished", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        # Retention sweep (app.services.jobs.sweep_finished)
+        Index(
+            "ix_jobs_finished_at", "finished_at",
+            postgresql_where=text("status IN ('done', 'failed')"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, server_default=func.gen_random_uuid())
+    kind: Mapped[str] = mapped_column(String)
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, server_default="{}")
+    secret: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+    # queued -> running -> done | failed (running jobs whose lease expired are reclaimed);
+    # finished jobs are deleted JOB_RETENTION seconds after finished_at
+    status: Mapped[str] = mapped_column(String, server_default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, server_default="5")
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    lease: Mapped[Optional[uuid.UUID]] = mapped_column(nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -1,38 +1,55 @@
 from datetime import datetime
 
-from sqlalchemy import String, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import String, Text, ForeignKey, DateTime, Boolean, Integer, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 import uuid
 
 from app.db.session import Base
+from app.db.types import Base64Bytes
 
 class Note(Base):
     __tablename__ = "notes"
+    # Hash-partitioned by owner (see migration 9d1e7c4b2a60): every query
+    # filters on user_id, so the planner only touches that user's partition.
+    # The partition key has to be part of the primary key, so note ids are
+    # unique per user.
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "id"),
+        {"postgresql_partition_by": "HASH (user_id)"},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, server_default=func.gen_random_uuid())
-    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), index=True)
+    id: Mapped[uuid.UUID] = mapped_column(server_default=func.gen_random_uuid())
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     
     # Encryption contract:
     # - title: plaintext (for search/indexing) - optional encryption later
     # - encrypted_title: encrypted version (when encryption is enabled)
     # - content: DEPRECATED - use encrypted_content
     # - encrypted_content: always encrypted in DB, decrypted in API layer
+    # Encrypted fields are stored as bytea and exposed as base64 strings (Base64Bytes)
     title: Mapped[str | None] = mapped_column(String, index=True, nullable=True)
-    encrypted_title: Mapped[str | None] = mapped_column(String, nullable=True)
+    encrypted_title: Mapped[str | None] = mapped_column(Base64Bytes, nullable=True)
     
     # Legacy field - will be removed when encryption is fully implemented
     content: Mapped[str | None] = mapped_column(Text, nullable=True)
     
     # New encrypted field - this is the future
-    encrypted_content: Mapped[str] = mapped_column(Text, server_default='')
+    encrypted_content: Mapped[str] = mapped_column(Base64Bytes, server_default='')
+
+    # Chunked body: ordered SHA-256 digests of NoteContentChunk rows.
+    # NULL means the body is stored inline in encrypted_content.
+    content_chunks: Mapped[list[str] | None] = mapped_column(ARRAY(String(64)), nullable=True)
+    # Bumped on every body change; base version for chunk patches
+    content_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
     
     is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
     
     # Voice notes fields
     audio_file_path: Mapped[str | None] = mapped_column(String, nullable=True)
     audio_duration: Mapped[int | None] = mapped_column(nullable=True)  # Duration in seconds
-    encrypted_transcription: Mapped[str | None] = mapped_column(Text, nullable=True)
+    encrypted_transcription: Mapped[str | None] = mapped_column(Base64Bytes, nullable=True)
     has_audio: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
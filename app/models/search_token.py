@@ -0,0 +1,24 @@
+from sqlalchemy import String, ForeignKey, ForeignKeyConstraint, Index, PrimaryKeyConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+import uuid
+
+from app.db.session import Base
+
+class NoteSearchToken(Base):
+    """
+    Blind index entry: a client-computed keyed hash (HMAC) of a word or word
+    prefix in a note. The server never sees the plaintext words.
+    """
+    __tablename__ = "note_search_tokens"
+    __table_args__ = (
+        # Note ids are only unique per user (notes is keyed on (user_id, id))
+        PrimaryKeyConstraint("user_id", "note_id", "token"),
+        Index("ix_note_search_tokens_user_id_token", "user_id", "token"),
+        ForeignKeyConstraint(
+            ["user_id", "note_id"], ["notes.user_id", "notes.id"], ondelete="CASCADE"
+        ),
+    )
+
+    note_id: Mapped[uuid.UUID] = mapped_column()
+    token: Mapped[str] = mapped_column(String(128))
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
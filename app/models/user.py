@@ -21,4 +21,5 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
-    notes = relationship("Note", back_populates="owner", cascade="all, delete-orphan")
+    # Notes are removed by the database (ON DELETE CASCADE), never loaded for deletion
+    notes = relationship("Note", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
@@ -1,4 +1,6 @@
-from .user import User, UserCreate, UserUpdate
-from .note import Note, NoteCreate, NoteUpdate
+from .user import User, UserCreate, UserUpdate, AccountDeletion
+from .note import Note, NoteCreate, NoteUpdate, NoteSummary, NoteChunk, NoteChunks, NoteChunksPatch, NoteImport, NoteImportResult
 from .auth import Token, TokenPayload, LoginRequest, RegisterRequest
 from .wallet import WalletNonceRequest, WalletNonceResponse, WalletVerifyRequest
+from .audio import AudioUpload, AudioUploadCreate, AudioUploadComplete
+from .admin import PoolStats, ReplicaStatus, DatabasePoolStatus, ProfileInfo
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class PoolStats(BaseModel):
+    size: int = Field(..., description="Configured pool size")
+    checked_in: int = Field(..., description="Idle connections in the pool")
+    checked_out: int = Field(..., description="Connections currently in use")
+    overflow: int = Field(..., description="Connections above pool size (negative: unopened slots)")
+    max_overflow: int
+    checkouts: int = Field(..., description="Checkouts since startup")
+    timeouts: int = Field(..., description="Checkouts that timed out waiting for a connection")
+    wait_seconds_total: float = Field(..., description="Total time spent waiting for checkouts")
+    wait_seconds_max: float = Field(..., description="Longest single checkout wait")
+
+
+class ReplicaStatus(BaseModel):
+    url: str = Field(..., description="Replica URL, password hidden")
+    lag_seconds: Optional[float] = Field(None, description="Last measured replication lag (null: unreachable)")
+    usable: bool = Field(..., description="Whether reads are currently routed to this replica")
+    pool: PoolStats
+
+
+class DatabasePoolStatus(BaseModel):
+    primary: PoolStats
+    replicas: List[ReplicaStatus] = []
+
+
+class ProfileInfo(BaseModel):
+    id: str
+    size: int = Field(..., description="File size in bytes")
+    created_at: datetime
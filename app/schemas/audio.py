@@ -0,0 +1,28 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+import uuid
+
+from app.schemas.note import AudioKey
+
+_TRANSCRIPTION_KEY_DESCRIPTION = "Audio key; when given, the server transcribes the audio in the background"
+
+
+class AudioUploadCreate(BaseModel):
+    digest: Optional[str] = Field(
+        None, description="SHA-256 (hex) of the encrypted audio, enables dedup of known blobs"
+    )
+    size: Optional[int] = Field(None, ge=0, description="Total size of the encrypted audio in bytes")
+    transcription_key: Optional[AudioKey] = Field(None, description=_TRANSCRIPTION_KEY_DESCRIPTION)
+
+
+class AudioUploadComplete(BaseModel):
+    digest: Optional[str] = Field(None, description="Expected SHA-256 (hex) of the uploaded audio")
+    audio_duration: Optional[int] = Field(None, description="Audio duration in seconds")
+    transcription_key: Optional[AudioKey] = Field(None, description=_TRANSCRIPTION_KEY_DESCRIPTION)
+
+
+class AudioUpload(BaseModel):
+    upload_id: Optional[uuid.UUID] = Field(None, description="Resumable upload id (None if deduplicated)")
+    offset: int = Field(..., description="Number of bytes received so far")
+    completed: bool = False
+    digest: Optional[str] = Field(None, description="SHA-256 of the stored blob once completed")
@@ -1,39 +1,81 @@
-from typing import Optional
-from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Optional
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, StringConstraints
 from datetime import datetime
+import base64
 import uuid
 
+from app.db.types import is_base64, normalize_base64
+
 # Encryption Contract:
 # - API accepts encrypted fields: 'encrypted_title' and 'encrypted_content'.
 # - Backend stores these encrypted values. Decryption is performed on the client.
+# - Encrypted fields are base64 in JSON and stored as raw bytes (bytea) in the DB.
+
+def _validate_base64(value: str) -> str:
+    value = normalize_base64(value)
+    if not is_base64(value):
+        raise ValueError("must be base64")
+    return value
+
+EncryptedStr = Annotated[str, AfterValidator(_validate_base64)]
+
+def _validate_audio_key(value: str) -> str:
+    value = normalize_base64(value)
+    if not is_base64(value) or len(base64.b64decode(value)) != 32:
+        raise ValueError("must be a base64 AES-256 key")
+    return value
+
+# Client's AES-256 audio key, handed over so the server can transcribe the
+# note (see app.services.transcription); never stored on the note
+AudioKey = Annotated[str, AfterValidator(_validate_audio_key)]
+
+# Blind-index token: client-computed HMAC of a word or word prefix (hex/base64)
+SearchToken = Annotated[str, StringConstraints(min_length=1, max_length=128)]
+MAX_SEARCH_TOKENS = 2000
+
+# SHA-256 (lowercase hex) of a chunk's ciphertext
+ChunkDigest = Annotated[str, StringConstraints(pattern=r"^[0-9a-f]{64}$")]
+MAX_CHUNK_BYTES = 1024 * 1024
 
 class NoteBase(BaseModel):
-    encrypted_title: Optional[str] = Field(None, description="Encrypted title (AES-GCM base64)")
-    encrypted_content: str = Field(..., description="Encrypted content (AES-GCM base64)")
+    encrypted_title: Optional[EncryptedStr] = Field(None, description="Encrypted title (AES-GCM base64)")
+    encrypted_content: EncryptedStr = Field(..., description="Encrypted content (AES-GCM base64)")
     is_archived: bool = False
     audio_file_path: Optional[str] = Field(None, description="Path to encrypted audio file")
     audio_duration: Optional[int] = Field(None, description="Audio duration in seconds")
-    encrypted_transcription: Optional[str] = Field(None, description="Encrypted transcription text")
+    encrypted_transcription: Optional[EncryptedStr] = Field(None, description="Encrypted transcription text")
     has_audio: bool = False
 
 class NoteCreate(NoteBase):
     """Create note with encrypted data."""
-    pass
+    search_tokens: Optional[List[SearchToken]] = Field(
+        None, max_length=MAX_SEARCH_TOKENS, description="Blind-index search tokens (HMAC)"
+    )
+    transcription_key: Optional[AudioKey] = Field(
+        None, description="Audio key; with has_audio and uploaded audio, the server transcribes the note"
+    )
 
 class NoteUpdate(BaseModel):
     """Update note with encrypted data."""
-    encrypted_title: Optional[str] = Field(None, description="New encrypted title")
-    encrypted_content: Optional[str] = Field(None, description="New encrypted content")
+    encrypted_title: Optional[EncryptedStr] = Field(None, description="New encrypted title")
+    encrypted_content: Optional[EncryptedStr] = Field(None, description="New encrypted content")
     is_archived: Optional[bool] = None
     audio_file_path: Optional[str] = Field(None, description="Path to encrypted audio file")
     audio_duration: Optional[int] = Field(None, description="Audio duration in seconds")
-    encrypted_transcription: Optional[str] = Field(None, description="Encrypted transcription text")
+    encrypted_transcription: Optional[EncryptedStr] = Field(None, description="Encrypted transcription text")
     has_audio: Optional[bool] = None
+    search_tokens: Optional[List[SearchToken]] = Field(
+        None, max_length=MAX_SEARCH_TOKENS, description="Replaces the note's blind-index search tokens"
+    )
 
 class NoteInDBBase(NoteBase):
     """Note as stored in DB (encrypted)."""
     id: uuid.UUID
     user_id: uuid.UUID
+    content_version: int = 0
+    content_chunks: Optional[List[str]] = Field(
+        None, description="Ordered chunk digests; when set, the body is chunked and encrypted_content is empty"
+    )
     created_at: datetime
     updated_at: datetime
     
@@ -43,12 +85,79 @@ class Note(NoteInDBBase):
     """Public note schema (encrypted)."""
     pass
 
+class NoteSummary(BaseModel):
+    """Slim note projection for list screens (no content/transcription blobs)."""
+    id: uuid.UUID
+    user_id: uuid.UUID
+    encrypted_title: Optional[str]
+    is_archived: bool
+    audio_duration: Optional[int]
+    has_audio: bool
+    content_version: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class NoteChunk(BaseModel):
+    """One individually encrypted piece of a chunked note body."""
+    digest: ChunkDigest = Field(..., description="SHA-256 (hex) of the chunk ciphertext")
+    data: EncryptedStr = Field(..., max_length=MAX_CHUNK_BYTES * 4 // 3 + 4, description="Chunk ciphertext (base64)")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class NoteChunks(BaseModel):
+    chunks: List[NoteChunk]
+
+class NoteChunksPatch(BaseModel):
+    """
+    Delta update of a chunked note body: the full ordered digest list plus
+    only the chunks the server does not have yet.
+    """
+    base_version: int = Field(..., description="content_version the edit is based on")
+    chunks: List[ChunkDigest] = Field(..., max_length=100_000, description="New ordered list of chunk digests")
+    new_chunks: List[NoteChunk] = Field(default_factory=list, description="Chunks not yet stored on the server")
+
+class NoteImport(NoteBase):
+    """One NDJSON line of a bulk import."""
+    id: Optional[uuid.UUID] = Field(
+        None, description="Stable note id; derived from the line content when omitted"
+    )
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class NoteImportError(BaseModel):
+    line: int
+    error: str
+
+class NoteImportBatch(BaseModel):
+    """One committed batch of a bulk import."""
+    batch: int
+    through_line: int = Field(..., description="Last input line the batch covers")
+    imported: int
+    skipped: int
+
+class NoteImportResult(BaseModel):
+    """Outcome of a bulk import; re-running the same file only adds skipped rows."""
+    received: int = 0
+    imported: int = 0
+    skipped: int = Field(0, description="Valid rows already present (idempotent re-run)")
+    failed: int = 0
+    batches: int = 0
+    committed_line: int = Field(
+        0, description="Input lines processed and committed; resume with start_line=committed_line+1"
+    )
+    progress: List[NoteImportBatch] = Field(default_factory=list, description="Committed batches, in order")
+    errors: List[NoteImportError] = Field(default_factory=list, description="First validation errors")
+
 class NoteInDB(BaseModel):
     """Internal DB representation (encrypted fields)."""
     id: uuid.UUID
     user_id: uuid.UUID
     encrypted_title: Optional[str]
     encrypted_content: str
+    content_chunks: Optional[List[str]]
+    content_version: int
     is_archived: bool
     audio_file_path: Optional[str]
     audio_duration: Optional[int]
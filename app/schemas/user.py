@@ -26,3 +26,12 @@ class User(UserInDBBase):
 
 class UserInDB(UserInDBBase):
     hashed_password: Optional[str] = None
+
+class AccountDeletion(BaseModel):
+    user_id: uuid.UUID
+    status: str
+    notes_deleted: int
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,121 @@
+"""
+Production server: gunicorn supervising uvicorn workers.
+
+    python -m app.server
+
+- WEB_CONCURRENCY worker processes (default: CPU count), each running the
+  app lifespan, so every worker opens its own DB and AI HTTP pools
+- uvloop event loop and httptools HTTP parser
+- SIGTERM drains: workers stop accepting connections, end the note event
+  streams and stop claiming jobs at once; in-flight requests, including
+  AI calls, and running jobs get SERVER_GRACEFUL_TIMEOUT seconds (default:
+  the longest AI timeout plus 10 s), less SHUTDOWN_CLEANUP_TIME for closing
+  the pools, before being cancelled
+- workers are recycled after SERVER_MAX_REQUESTS (+ jitter) requests to
+  bound memory growth
+
+`python -m app.main` remains the auto-reloading development server.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import uvicorn
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from uvicorn.workers import UvicornWorker
+
+from app.core.config import settings
+
+# Seconds of graceful_timeout kept for the lifespan shutdown (closing pools)
+# after open connections were given the rest
+SHUTDOWN_CLEANUP_TIME = 5
+
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets=None) -> None:
+        # uvicorn waits for every connection before the lifespan shutdown:
+        # end the event streams and the job worker first, or they hold it
+        from app.main import begin_drain
+        begin_drain(self.config.app)
+        await super().shutdown(sockets)
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Cancel what is left before gunicorn kills the worker, so the
+        # lifespan shutdown still runs
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - SHUTDOWN_CLEANUP_TIME, 1)
+
+    async def _serve(self) -> None:
+        # UvicornWorker._serve, with DrainingServer
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def _child_exit(server, worker) -> None:
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def options() -> dict:
+    graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+    if graceful_timeout is None:
+        graceful_timeout = max(settings.WHISPER_API_TIMEOUT, settings.LLM_TIMEOUT) + 10
+    return {
+        "bind": settings.SERVER_BIND,
+        "workers": settings.WEB_CONCURRENCY or os.cpu_count() or 1,
+        "worker_class": f"{Worker.__module__}.{Worker.__qualname__}",
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": graceful_timeout,
+        # Worker heartbeat, not a request timeout: long AI calls do not block the loop
+        "timeout": 30,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "child_exit": _child_exit,
+        # Import the app in each worker, after fork: no engine or pool may be
+        # shared across processes
+        "preload_app": False,
+        "accesslog": "-",
+    }
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        return app
+
+
+def main() -> None:
+    # Shared by the workers so /metrics aggregates all of them; must be set
+    # before any worker imports prometheus_client
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    cleanup = metrics_dir is None
+    if cleanup:
+        metrics_dir = tempfile.mkdtemp(prefix="vaulto-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    try:
+        Server(options()).run()
+    finally:
+        if cleanup:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
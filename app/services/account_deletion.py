@@ -0,0 +1,122 @@
+"""
+Background, batched account deletion.
+
+Deleting a user in one statement would cascade through every note (and its
+search tokens) in a single long transaction. Instead the account is
+deactivated right away and a background job deletes notes in bounded
+batches, each in its own short transaction, recording progress in
+`account_deletions`. Pending jobs are resumed on startup, and batches use
+SKIP LOCKED, so several workers resuming the same job do not block each other.
+"""
+import asyncio
+import contextvars
+import logging
+import shutil
+import uuid
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.account_deletion import AccountDeletion
+from app.models.content_chunk import NoteContentChunk
+from app.models.note import Note
+from app.models.user import User
+from app.services import blobstore
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running jobs (asyncio only keeps weak ones)
+_running: set[asyncio.Task] = set()
+
+
+async def request_deletion(db: AsyncSession, user: User) -> AccountDeletion:
+    """Deactivate the user and record a pending deletion job (idempotent)."""
+    await db.execute(update(User).where(User.id == user.id).values(is_active=False))
+    await db.execute(
+        insert(AccountDeletion).values(user_id=user.id).on_conflict_do_nothing()
+    )
+    result = await db.execute(select(AccountDeletion).where(AccountDeletion.user_id == user.id))
+    job = result.scalar_one()
+    await db.commit()
+    return job
+
+
+async def _delete_batch(session: AsyncSession, model, key, user_id: uuid.UUID) -> int:
+    batch = (
+        select(key)
+        .where(model.user_id == user_id)
+        .limit(settings.ACCOUNT_DELETION_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    # Keys are only unique per user (note ids, chunk digests): scope the
+    # DELETE itself too, which also keeps it on the user's notes partition
+    result = await session.execute(delete(model).where(model.user_id == user_id, key.in_(batch)))
+    return result.rowcount
+
+
+async def purge_account(user_id: uuid.UUID) -> None:
+    """Delete all data of a user in small transactions, then the user row."""
+    async with AsyncSessionLocal() as session:
+        while True:
+            deleted = await _delete_batch(session, Note, Note.id, user_id)
+            if deleted:
+                await session.execute(
+                    update(AccountDeletion)
+                    .where(AccountDeletion.user_id == user_id)
+                    .values(notes_deleted=AccountDeletion.notes_deleted + deleted)
+                )
+            await session.commit()
+            if not deleted:
+                break
+            await asyncio.sleep(settings.ACCOUNT_DELETION_BATCH_PAUSE)
+
+        while await _delete_batch(session, NoteContentChunk, NoteContentChunk.digest, user_id):
+            await session.commit()
+            await asyncio.sleep(settings.ACCOUNT_DELETION_BATCH_PAUSE)
+
+        await session.execute(delete(User).where(User.id == user_id))
+        await session.execute(
+            update(AccountDeletion)
+            .where(AccountDeletion.user_id == user_id)
+            .values(status="completed", completed_at=func.now())
+        )
+        await session.commit()
+
+    await asyncio.to_thread(shutil.rmtree, blobstore.user_blob_dir(user_id), ignore_errors=True)
+    logger.info("Account %s deleted", user_id)
+
+
+async def _run(user_id: uuid.UUID) -> None:
+    try:
+        await purge_account(user_id)
+    except Exception:
+        # The job stays pending and is picked up again on the next startup
+        logger.exception("Account deletion for %s failed", user_id)
+
+
+def schedule(user_id: uuid.UUID) -> None:
+    # Fresh context: the job outlives the request and must not inherit its
+    # request-scoped state (metrics, read-your-writes attribution)
+    task = asyncio.create_task(_run(user_id), context=contextvars.Context())
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def resume_pending() -> None:
+    """Restart deletion jobs interrupted by a shutdown or crash."""
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(AccountDeletion.user_id).where(AccountDeletion.status == "pending")
+            )
+            user_ids = result.scalars().all()
+    except Exception:
+        logger.exception("Could not load pending account deletions")
+        return
+    for user_id in user_ids:
+        logger.info("Resuming deletion of account %s", user_id)
+        schedule(user_id)
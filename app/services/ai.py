@@ -1,13 +1,44 @@
+import json
 import logging
 import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
 import httpx
 from fastapi import HTTPException, UploadFile
 
+from app.core import metrics
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Per-worker connection pool to the AI backends, opened by the app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_client() -> None:
+    global _client
+    if _client is None:
+        limits = httpx.Limits(max_connections=settings.AI_HTTP_MAX_CONNECTIONS)
+        _client = httpx.AsyncClient(limits=limits)
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def _http_client() -> AsyncIterator[httpx.AsyncClient]:
+    if _client is not None:
+        yield _client
+        return
+    # Outside the app lifespan (scripts, some tests): one-off client
+    async with httpx.AsyncClient() as client:
+        yield client
+
 
 def _merge_prompt(prompt: str, text: str) -> str:
     """
@@ -27,9 +58,28 @@ def _merge_prompt(prompt: str, text: str) -> str:
     return f"{prompt}\n\n\"{text}\""
 
 
+def _error_reason(exc: httpx.RequestError) -> str:
+    return "timeout" if isinstance(exc, httpx.TimeoutException) else "unreachable"
+
+
 async def transcribe_audio(file: UploadFile, language: str | None = None) -> str:
     """Send audio to the Whisper service and return transcription text."""
     content = await file.read()
+    return await transcribe_bytes(
+        content,
+        filename=file.filename or "audio.m4a",
+        content_type=file.content_type or "audio/m4a",
+        language=language,
+    )
+
+
+async def transcribe_bytes(
+    content: bytes,
+    filename: str = "audio.m4a",
+    content_type: str = "audio/m4a",
+    language: str | None = None,
+) -> str:
+    """Transcribe audio already in memory (e.g. decrypted by a job)."""
     if not content:
         raise HTTPException(status_code=400, detail="Uploaded audio file is empty")
 
@@ -37,34 +87,37 @@ async def transcribe_audio(file: UploadFile, language: str | None = None) -> str
     if language:
         data["language"] = language
 
-    files = {
-        "file": (
-            file.filename or "audio.m4a",
-            content,
-            file.content_type or "audio/m4a",
-        )
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=settings.WHISPER_API_TIMEOUT) as client:
-            response = await client.post(settings.WHISPER_API_URL, data=data, files=files)
-    except httpx.RequestError as exc:
-        logger.exception("Whisper request failed: %s", exc)
-        raise HTTPException(
-            status_code=502,
-            detail="Whisper service is not reachable at the moment",
-        ) from exc
-
-    if response.status_code >= 400:
-        logger.error(
-            "Whisper service responded with %s: %s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail="Failed to transcribe audio with Whisper service",
-        )
+    files = {"file": (filename, content, content_type)}
+
+    with metrics.ai_call("whisper", len(content)) as call:
+        try:
+            async with _http_client() as client:
+                response = await client.post(
+                    settings.WHISPER_API_URL,
+                    data=data,
+                    files=files,
+                    timeout=settings.WHISPER_API_TIMEOUT,
+                )
+        except httpx.RequestError as exc:
+            call["error"] = _error_reason(exc)
+            logger.exception("Whisper request failed: %s", exc)
+            raise HTTPException(
+                status_code=502,
+                detail="Whisper service is not reachable at the moment",
+            ) from exc
+
+        call["received"] = len(response.content)
+        if response.status_code >= 400:
+            call["error"] = "http_status"
+            logger.error(
+                "Whisper service responded with %s: %s",
+                response.status_code,
+                response.text,
+            )
+            raise HTTPException(
+                status_code=502,
+                detail="Failed to transcribe audio with Whisper service",
+            )
 
     payload = response.json()
     text = payload.get("text") or payload.get("transcription") or payload.get("result")
@@ -72,6 +125,7 @@ async def transcribe_audio(file: UploadFile, language: str | None = None) -> str
         text = text.get("text") or text.get("transcription")
 
     if not text:
+        metrics.AI_REQUEST_ERRORS.labels("whisper", "empty_response").inc()
         logger.error("Whisper response missing text: %s", payload)
         raise HTTPException(
             status_code=502,
@@ -96,26 +150,36 @@ async def improve_text(prompt: str, text: str, model_override: str | None = None
         "stream": False,
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=settings.LLM_TIMEOUT) as client:
-            response = await client.post(settings.LLM_API_URL, json=payload)
-    except httpx.RequestError as exc:
-        logger.exception("LLM request failed: %s", exc)
-        raise HTTPException(
-            status_code=502,
-            detail="LLM service is not reachable at the moment",
-        ) from exc
-
-    if response.status_code >= 400:
-        logger.error(
-            "LLM service responded with %s: %s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail="LLM service failed to generate text",
-        )
+    body = json.dumps(payload).encode()
+    with metrics.ai_call("llm", len(body)) as call:
+        try:
+            async with _http_client() as client:
+                response = await client.post(
+                    settings.LLM_API_URL,
+                    content=body,
+                    headers={"Content-Type": "application/json"},
+                    timeout=settings.LLM_TIMEOUT,
+                )
+        except httpx.RequestError as exc:
+            call["error"] = _error_reason(exc)
+            logger.exception("LLM request failed: %s", exc)
+            raise HTTPException(
+                status_code=502,
+                detail="LLM service is not reachable at the moment",
+            ) from exc
+
+        call["received"] = len(response.content)
+        if response.status_code >= 400:
+            call["error"] = "http_status"
+            logger.error(
+                "LLM service responded with %s: %s",
+                response.status_code,
+                response.text,
+            )
+            raise HTTPException(
+                status_code=502,
+                detail="LLM service failed to generate text",
+            )
 
     data = response.json()
     result_text = None
@@ -134,6 +198,7 @@ async def improve_text(prompt: str, text: str, model_override: str | None = None
             result_text = data.get("response") or data.get("text")
 
     if not result_text:
+        metrics.AI_REQUEST_ERRORS.labels("llm", "empty_response").inc()
         logger.error("LLM response missing text: %s", data)
         raise HTTPException(
             status_code=502,
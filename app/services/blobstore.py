@@ -0,0 +1,279 @@
+"""
+Local content-addressed storage for encrypted audio blobs.
+
+Layout under settings.BLOB_STORAGE_DIR:
+    uploads/<note_id>/<upload_id>.part     in-progress resumable uploads
+    sha256/<user_id>/<aa>/<digest>         finished blobs, keyed by SHA-256
+
+Blobs are namespaced per user: the audio is encrypted client-side, so
+cross-user dedup would buy nothing but would leak whether a given
+ciphertext exists on the server.
+
+Requests appending to or completing an upload hold an exclusive `flock`
+on its .part file, so the offset check and the write are atomic across
+requests and worker processes; a second concurrent request gets 409.
+Uploads not written to for AUDIO_UPLOAD_EXPIRY seconds are deleted by
+every worker's `UploadSweeper`. Filesystem calls run in worker threads.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import anyio
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BLOB_KEY_PREFIX = "sha256:"
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _root() -> Path:
+    return Path(settings.BLOB_STORAGE_DIR)
+
+
+def is_valid_digest(digest: str) -> bool:
+    return bool(_DIGEST_RE.match(digest))
+
+
+def blob_key(digest: str) -> str:
+    """Value stored in Note.audio_file_path for an uploaded blob."""
+    return f"{BLOB_KEY_PREFIX}{digest}"
+
+
+def digest_from_key(key: str | None) -> str | None:
+    if not key or not key.startswith(BLOB_KEY_PREFIX):
+        return None
+    digest = key[len(BLOB_KEY_PREFIX):]
+    return digest if is_valid_digest(digest) else None
+
+
+def user_blob_dir(user_id: uuid.UUID) -> Path:
+    return _root() / "sha256" / str(user_id)
+
+
+def blob_path(user_id: uuid.UUID, digest: str) -> Path:
+    return user_blob_dir(user_id) / digest[:2] / digest
+
+
+def upload_path(note_id: uuid.UUID, upload_id: uuid.UUID) -> Path:
+    return _root() / "uploads" / str(note_id) / f"{upload_id}.part"
+
+
+async def blob_size(user_id: uuid.UUID, digest: str) -> int | None:
+    try:
+        return (await anyio.Path(blob_path(user_id, digest)).stat()).st_size
+    except FileNotFoundError:
+        return None
+
+
+def _create_part(path: Path) -> None:
+    # The sweep removes empty note directories: retry if it just did
+    for _ in range(3):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            path.touch(exist_ok=False)
+            return
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(path)
+
+
+async def create_upload(note_id: uuid.UUID) -> uuid.UUID:
+    upload_id = uuid.uuid4()
+    await anyio.to_thread.run_sync(_create_part, upload_path(note_id, upload_id))
+    return upload_id
+
+
+async def upload_offset(note_id: uuid.UUID, upload_id: uuid.UUID) -> int:
+    try:
+        return (await anyio.Path(upload_path(note_id, upload_id)).stat()).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+def _lock_upload(path: Path, flags: int) -> int:
+    """Open an upload and take its exclusive lock; returns the descriptor."""
+    try:
+        fd = os.open(path, flags)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(status_code=409, detail="Upload is being written by another request")
+        # Completed or swept while we waited to open it
+        try:
+            current = os.stat(path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            current = False
+        if not current:
+            raise HTTPException(status_code=404, detail="Upload not found")
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+async def append_chunk(
+    note_id: uuid.UUID,
+    upload_id: uuid.UUID,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+) -> int:
+    """
+    Append a streamed chunk at `offset` and return the new upload offset.
+
+    The body is written piece by piece as it arrives, so memory use does not
+    depend on the chunk size. A mismatching offset returns 409 with the
+    current offset so the client can resume from there.
+    """
+    fd = await anyio.to_thread.run_sync(
+        _lock_upload, upload_path(note_id, upload_id), os.O_WRONLY | os.O_APPEND
+    )
+    try:
+        current = (await anyio.to_thread.run_sync(os.fstat, fd)).st_size
+        if offset != current:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload offset mismatch, current offset is {current}",
+                headers={"Upload-Offset": str(current)},
+            )
+
+        written = current
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if written > settings.AUDIO_UPLOAD_MAX_BYTES:
+                await anyio.to_thread.run_sync(os.ftruncate, fd, current)
+                raise HTTPException(status_code=413, detail="Audio file is too large")
+            await anyio.to_thread.run_sync(_write_all, fd, chunk)
+    finally:
+        # Closing releases the lock
+        await anyio.to_thread.run_sync(os.close, fd)
+    return written
+
+
+def _hash_file(fd: int) -> str:
+    digest = hashlib.sha256()
+    with open(fd, "rb", closefd=False) as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _commit_blob(part: Path, target: Path) -> None:
+    if target.exists():
+        # Same ciphertext already stored for this user: keep the existing blob
+        part.unlink()
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(part, target)
+
+
+async def complete_upload(
+    user_id: uuid.UUID,
+    note_id: uuid.UUID,
+    upload_id: uuid.UUID,
+    expected_digest: str | None = None,
+) -> tuple[str, int]:
+    """
+    Hash the finished upload and move it into the content-addressed store.
+
+    Returns (digest, size). If `expected_digest` is given and does not match,
+    the partial upload is discarded and 422 is raised.
+    """
+    part = upload_path(note_id, upload_id)
+    # Held until the blob is in place, so no append can slip in after hashing
+    fd = await anyio.to_thread.run_sync(_lock_upload, part, os.O_RDONLY)
+    try:
+        size = (await anyio.to_thread.run_sync(os.fstat, fd)).st_size
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded audio file is empty")
+
+        digest = await anyio.to_thread.run_sync(_hash_file, fd)
+        if expected_digest and expected_digest != digest:
+            await anyio.Path(part).unlink(missing_ok=True)
+            raise HTTPException(status_code=422, detail="Uploaded audio does not match digest")
+
+        await anyio.to_thread.run_sync(_commit_blob, part, blob_path(user_id, digest))
+    finally:
+        await anyio.to_thread.run_sync(os.close, fd)
+    return digest, size
+
+
+def sweep_stale_uploads(max_age: float) -> int:
+    """Delete uploads not written to for `max_age` seconds; returns the count. Blocking."""
+    cutoff = time.time() - max_age
+    swept = 0
+    try:
+        note_dirs = list((_root() / "uploads").iterdir())
+    except FileNotFoundError:
+        return 0
+    for note_dir in note_dirs:
+        for part in note_dir.glob("*.part"):
+            try:
+                if part.stat().st_mtime >= cutoff:
+                    continue
+                fd = os.open(part, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # A request is writing to it right now
+                os.close(fd)
+                continue
+            try:
+                part.unlink(missing_ok=True)
+                swept += 1
+            finally:
+                os.close(fd)
+        try:
+            note_dir.rmdir()
+        except OSError:
+            pass  # still has uploads, or already gone
+    return swept
+
+
+class UploadSweeper:
+    """Per-process loop deleting abandoned uploads every AUDIO_UPLOAD_SWEEP_INTERVAL seconds."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                swept = await anyio.to_thread.run_sync(sweep_stale_uploads, settings.AUDIO_UPLOAD_EXPIRY)
+                if swept:
+                    logger.info("Deleted %s abandoned audio uploads", swept)
+            except Exception:
+                logger.exception("Could not sweep abandoned audio uploads")
+            await asyncio.sleep(settings.AUDIO_UPLOAD_SWEEP_INTERVAL)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,327 @@
+"""
+Durable job queue on the `jobs` table.
+
+Jobs are enqueued inside the caller's transaction, so they exist exactly
+when the change that needs them was committed. Every app worker process
+runs a `Worker` that claims due jobs with FOR UPDATE SKIP LOCKED: any
+number of processes and instances share the queue without blocking each
+other or running a job twice at the same time.
+
+- A claimed job holds a lease (`locked_until`) that its worker extends
+  while the handler runs. If the process dies the lease expires and
+  another worker reclaims the job, so work survives restarts.
+- Failures are retried with exponential backoff and jitter up to
+  `max_attempts`; `PermanentError` fails the job right away.
+- Each kind has a per-process concurrency cap, so e.g. transcriptions
+  cannot take every Whisper connection of a worker.
+- Finished jobs are kept for `JOB_RETENTION` seconds (for inspection),
+  then deleted in batches by every worker's sweep loop.
+- A job's `secret` is stored sealed with the server key
+  (app.core.encryption.server_key) and handed to the handler opened.
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.core import encryption, metrics
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict[str, Any], Optional[bytes]], Awaitable[None]]
+
+UNFINISHED = ("queued", "running")
+FINISHED = ("done", "failed")
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help."""
+
+
+@dataclass
+class JobKind:
+    name: str
+    func: Handler
+    concurrency: int
+
+
+registry: dict[str, JobKind] = {}
+
+
+def handler(kind: str, concurrency: int = 1) -> Callable[[Handler], Handler]:
+    """
+    Register `async def func(payload, secret)` as the handler of `kind`.
+
+    At most `concurrency` jobs of this kind run at once per worker process.
+    """
+    def register(func: Handler) -> Handler:
+        registry[kind] = JobKind(kind, func, concurrency)
+        return func
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any],
+    *,
+    secret: Optional[bytes] = None,
+    dedupe_key: Optional[str] = None,
+    delay: float = 0.0,
+) -> None:
+    """
+    Add a job in the caller's transaction (not committed here).
+
+    An unfinished job with the same `dedupe_key` is kept and this one is
+    dropped; a finished one does not count, so e.g. failed work can be
+    enqueued again.
+    """
+    values: dict[str, Any] = {
+        "kind": kind,
+        "payload": payload,
+        "secret": _seal_secret(kind, secret),
+        "dedupe_key": dedupe_key,
+        "max_attempts": settings.JOB_MAX_ATTEMPTS,
+    }
+    if delay:
+        values["run_at"] = func.now() + timedelta(seconds=delay)
+    await db.execute(
+        insert(Job).values(**values).on_conflict_do_nothing(
+            index_elements=[Job.dedupe_key], index_where=Job.status.in_(UNFINISHED)
+        )
+    )
+
+
+def _seal_secret(kind: str, secret: Optional[bytes]) -> Optional[bytes]:
+    if secret is None:
+        return None
+    # Bound to the kind: a sealed secret can't be replayed to another handler
+    return encryption.encrypt_bytes(encryption.server_key(), secret, kind.encode())
+
+
+def _open_secret(job: Job) -> Optional[bytes]:
+    if job.secret is None:
+        return None
+    try:
+        return encryption.decrypt_bytes(encryption.server_key(), job.secret, job.kind.encode())
+    except encryption.DecryptionError as exc:
+        raise PermanentError("job secret does not open with the server key") from exc
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number `attempts`: exponential, capped, jittered."""
+    delay = min(settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _lease_expiry():
+    return func.now() + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+
+
+async def claim(kind: str, limit: int) -> list[Job]:
+    """Lease up to `limit` due jobs of `kind`: queued ones and expired leases."""
+    due = (
+        select(Job.id)
+        .where(
+            Job.kind == kind,
+            Job.status.in_(UNFINISHED),
+            or_(
+                and_(Job.status == "queued", Job.run_at <= func.now()),
+                and_(Job.status == "running", Job.locked_until < func.now()),
+            ),
+        )
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Job)
+            .where(Job.id.in_(due.scalar_subquery()))
+            .values(
+                status="running",
+                attempts=Job.attempts + 1,
+                lease=func.gen_random_uuid(),
+                locked_until=_lease_expiry(),
+            )
+            .returning(Job)
+        )
+        jobs = list(result.scalars())
+        await session.commit()
+    return jobs
+
+
+async def _update_leased(job: Job, **values: Any) -> bool:
+    """Update the job only if this worker still holds its lease."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.lease == job.lease, Job.status == "running")
+            .values(**values)
+            .returning(Job.id)
+        )
+        updated = result.scalar_one_or_none() is not None
+        await session.commit()
+    return updated
+
+
+async def _heartbeat(job: Job) -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_VISIBILITY_TIMEOUT / 3)
+        try:
+            if not await _update_leased(job, locked_until=_lease_expiry()):
+                logger.warning("Lost the lease of job %s (%s)", job.id, job.kind)
+                return
+        except Exception:
+            logger.exception("Could not extend the lease of job %s", job.id)
+
+
+async def execute(job: Job) -> str:
+    """Run one leased job and record the outcome: done, retry or failed."""
+    kind = registry[job.kind]
+    started = time.perf_counter()
+    if job.attempts > job.max_attempts:
+        # Claimed again after crashing its worker every time
+        error: Optional[Exception] = PermanentError("lease expired too many times")
+    else:
+        heartbeat = asyncio.create_task(_heartbeat(job))
+        try:
+            await kind.func(job.payload, _open_secret(job))
+            error = None
+        except Exception as exc:
+            error = exc
+        finally:
+            heartbeat.cancel()
+
+    if error is None:
+        outcome = "done"
+        await _update_leased(
+            job, status="done", secret=None, lease=None, locked_until=None, finished_at=func.now()
+        )
+    elif isinstance(error, PermanentError) or job.attempts >= job.max_attempts:
+        outcome = "failed"
+        logger.error("Job %s (%s) failed after %s attempts: %r", job.id, job.kind, job.attempts, error)
+        await _update_leased(
+            job, status="failed", secret=None, lease=None, locked_until=None,
+            last_error=repr(error), finished_at=func.now(),
+        )
+    else:
+        outcome = "retry"
+        delay = backoff(job.attempts)
+        logger.warning("Job %s (%s) attempt %s failed, retrying in %.0fs: %r",
+                       job.id, job.kind, job.attempts, delay, error)
+        await _update_leased(
+            job, status="queued", lease=None, locked_until=None, last_error=repr(error),
+            run_at=func.now() + timedelta(seconds=delay),
+        )
+    metrics.JOBS_PROCESSED.labels(job.kind, outcome).inc()
+    metrics.JOB_DURATION.labels(job.kind).observe(time.perf_counter() - started)
+    return outcome
+
+
+async def sweep_finished() -> int:
+    """Delete jobs finished more than JOB_RETENTION seconds ago, in batches; returns the count."""
+    swept = 0
+    while True:
+        expired = (
+            select(Job.id)
+            .where(
+                Job.status.in_(FINISHED),
+                Job.finished_at < func.now() - timedelta(seconds=settings.JOB_RETENTION),
+            )
+            .limit(settings.JOB_SWEEP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(delete(Job).where(Job.id.in_(expired.scalar_subquery())))
+            await session.commit()
+        swept += result.rowcount
+        if result.rowcount < settings.JOB_SWEEP_BATCH_SIZE:
+            return swept
+
+
+async def run_once(kind: str) -> list[str]:
+    """Claim and run one batch of `kind` inline (scripts and tests)."""
+    jobs = await claim(kind, registry[kind].concurrency)
+    return [await execute(job) for job in jobs]
+
+
+class Worker:
+    """Per-process consumer: one polling loop per registered job kind, plus the sweep."""
+
+    def __init__(self) -> None:
+        self._stopping = asyncio.Event()
+        self._loops: list[asyncio.Task] = []
+        self._running: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        for kind in registry.values():
+            # Fresh context: jobs must not inherit request-scoped state
+            task = asyncio.create_task(self._poll(kind), context=contextvars.Context())
+            self._loops.append(task)
+        self._loops.append(asyncio.create_task(self._sweep(), context=contextvars.Context()))
+
+    async def _sweep(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                swept = await sweep_finished()
+                if swept:
+                    logger.info("Deleted %s finished jobs", swept)
+            except Exception:
+                logger.exception("Could not sweep finished jobs")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.JOB_SWEEP_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, kind: JobKind) -> None:
+        running: set[asyncio.Task] = set()
+        while not self._stopping.is_set():
+            free = kind.concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                jobs = await claim(kind.name, free)
+            except Exception:
+                logger.exception("Could not claim %s jobs", kind.name)
+                jobs = []
+            for job in jobs:
+                task = asyncio.create_task(execute(job))
+                for tasks in (running, self._running):
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if len(jobs) < free:
+                # Queue drained: wait before polling again (or until stopped)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def stop(self, timeout: float) -> None:
+        """Stop claiming and give running jobs `timeout` seconds to finish."""
+        self._stopping.set()
+        # The loops only claim and sleep; a batch claimed but not started
+        # yet is retried once its lease expires
+        for loop in self._loops:
+            loop.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=timeout)
+            # Cancelled jobs keep their lease, which expires and lets another worker retry them
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
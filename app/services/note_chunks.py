@@ -0,0 +1,150 @@
+"""
+Chunked note bodies with delta updates.
+
+A chunked note stores its body as an ordered list of digests
+(Note.content_chunks) pointing at individually encrypted, per-user
+deduplicated NoteContentChunk rows. An edit sends the new digest list plus
+only the chunks the server has not seen, so write volume follows the size
+of the edit instead of the size of the note.
+"""
+import base64
+import hashlib
+import uuid
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Update, delete, exists, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.content_chunk import NoteContentChunk
+from app.models.note import Note
+from app.schemas.note import NoteChunksPatch
+
+
+def inline_content_values() -> dict[str, Any]:
+    """
+    Extra column values for writes that replace the body with inline
+    encrypted_content: drop the chunk manifest and bump the version.
+    """
+    return {"content_chunks": None, "content_version": Note.content_version + 1}
+
+
+def returning_previous_chunks(statement: Update, note_id: uuid.UUID, user_id: uuid.UUID) -> Update:
+    """
+    Add the note's chunk manifest from before the UPDATE to its RETURNING
+    clause (which only sees new values), as `previous_chunks`. The row is
+    locked first, so it is the version the UPDATE replaces.
+    """
+    old = aliased(Note)
+    previous = (
+        select(old.id, old.content_chunks.label("previous_chunks"))
+        .where(old.id == note_id, old.user_id == user_id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    return statement.where(Note.id == previous.c.id).returning(previous.c.previous_chunks)
+
+
+async def prune_chunks(
+    db: AsyncSession, user_id: uuid.UUID, digests: Optional[Iterable[str]] = None
+) -> None:
+    """
+    Delete the user's chunks no longer referenced by any note.
+
+    Restricted to `digests` when given, otherwise sweeps all of the user's
+    chunks. Rows locked by an in-flight patch are skipped, so a chunk that
+    is about to be referenced is never removed underneath it.
+    """
+    candidates = select(NoteContentChunk.digest).where(
+        NoteContentChunk.user_id == user_id,
+        ~exists().where(
+            Note.user_id == user_id,
+            NoteContentChunk.digest == Note.content_chunks.any_(),
+        ),
+    )
+    if digests is not None:
+        digests = set(digests)
+        if not digests:
+            return
+        candidates = candidates.where(NoteContentChunk.digest.in_(digests))
+    await db.execute(
+        delete(NoteContentChunk).where(
+            NoteContentChunk.user_id == user_id,
+            NoteContentChunk.digest.in_(candidates.with_for_update(skip_locked=True)),
+        )
+    )
+
+
+async def fetch_chunks(db: AsyncSession, user_id: uuid.UUID, digests: Iterable[str]) -> list[NoteContentChunk]:
+    result = await db.execute(
+        select(NoteContentChunk).where(
+            NoteContentChunk.user_id == user_id,
+            NoteContentChunk.digest.in_(set(digests)),
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def apply_patch(
+    db: AsyncSession, note_id: uuid.UUID, user_id: uuid.UUID, patch: NoteChunksPatch
+) -> Note:
+    """
+    Apply a chunk delta to a note and return the updated note (not committed).
+
+    Raises 404 for a missing note, 409 when `base_version` is stale and 422
+    when a chunk is corrupt or a referenced digest is unknown.
+    """
+    result = await db.execute(
+        select(Note.content_version, Note.content_chunks)
+        .where(Note.id == note_id, Note.user_id == user_id)
+        .with_for_update()
+    )
+    current = result.first()
+    if not current:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if current.content_version != patch.base_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Note content changed, current version is {current.content_version}",
+        )
+
+    rows = []
+    for chunk in patch.new_chunks:
+        data = base64.b64decode(chunk.data)
+        if hashlib.sha256(data).hexdigest() != chunk.digest:
+            raise HTTPException(status_code=422, detail=f"Chunk {chunk.digest} does not match its digest")
+        rows.append({"user_id": user_id, "digest": chunk.digest, "data": data})
+    if rows:
+        await db.execute(insert(NoteContentChunk).values(rows).on_conflict_do_nothing())
+
+    wanted = set(patch.chunks)
+    if wanted:
+        # KEY SHARE keeps a concurrent prune from deleting chunks we are about to reference
+        result = await db.execute(
+            select(NoteContentChunk.digest)
+            .where(NoteContentChunk.user_id == user_id, NoteContentChunk.digest.in_(wanted))
+            .with_for_update(read=True, key_share=True)
+        )
+        missing = wanted - set(result.scalars().all())
+        if missing:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": "Unknown chunks, send them in new_chunks", "missing": sorted(missing)},
+            )
+
+    result = await db.execute(
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == user_id)
+        .values(
+            content_chunks=patch.chunks,
+            encrypted_content=b"",
+            content_version=Note.content_version + 1,
+        )
+        .returning(Note)
+    )
+    note = result.scalar_one()
+
+    await prune_chunks(db, user_id, set(current.content_chunks or ()) - wanted)
+    return note
@@ -0,0 +1,210 @@
+"""
+Real-time note change events over Postgres LISTEN/NOTIFY.
+
+Writers call `publish()` inside their transaction: Postgres delivers the
+NOTIFY when the transaction commits, and drops it on rollback, so an
+event never announces a change that did not happen. Every app worker
+process runs a `Listener`, one dedicated connection LISTENing on the
+channel, which fans events out to the `hub` subscriptions of the user
+they belong to (the WebSocket and SSE streams of routes_notes).
+
+EVENTS:
+-------
+Events are hints, not data; note fields never leave through this path.
+
+{"type": "note", "op": "created" | "updated" | "deleted", "id": ..., "version": ...}
+    `version` is the note's ETag (as returned by GET /notes/{id}), null
+    for deletes. Clients compare it with the ETag they hold and fetch the
+    note only when it differs, so their own writes cost nothing.
+{"type": "resync"}
+    Events may have been lost (slow consumer, listener reconnect): the
+    client revalidates its list with If-None-Match.
+{"type": "ping"}
+    Heartbeat, every NOTE_EVENTS_HEARTBEAT seconds of silence.
+
+BACKPRESSURE:
+-------------
+Each subscription has a bounded queue. A consumer that falls
+NOTE_EVENTS_QUEUE_SIZE events behind has its backlog replaced by a single
+resync, so a stalled connection costs constant memory and never slows
+down the listener or the other subscribers.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import asyncpg
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "note_events"
+
+RESYNC = {"type": "resync"}
+PING = {"type": "ping"}
+
+
+async def publish(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    op: str,
+    note_id: Optional[uuid.UUID] = None,
+    version: Optional[str] = None,
+) -> None:
+    """Queue a change event; it is sent when `db` commits (not committed here)."""
+    if op == "resync":
+        event = RESYNC
+    else:
+        event = {"type": "note", "op": op, "id": str(note_id), "version": version}
+    payload = json.dumps({"user_id": str(user_id), "event": event}, separators=(",", ":"))
+    await db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class Subscription:
+    """One client connection's view of a user's events."""
+
+    def __init__(self, user_id: uuid.UUID, max_size: int) -> None:
+        self.user_id = user_id
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=max(max_size, 2))
+        self.closed = False
+
+    def push(self, event: dict[str, Any]) -> None:
+        if self._queue.full():
+            # Too far behind: the backlog is worth less than a resync
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            metrics.NOTE_EVENTS_DROPPED.inc()
+            event = RESYNC
+        self._queue.put_nowait(event)
+
+    def close(self) -> None:
+        self.closed = True
+        self.push(RESYNC)
+
+    async def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        """Events as they come, PING after a quiet heartbeat interval; ends on close."""
+        while not (self.closed and self._queue.empty()):
+            try:
+                event = await asyncio.wait_for(self._queue.get(), settings.NOTE_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                event = PING
+            yield event
+
+
+class Hub:
+    """Subscriptions of this worker process, by user."""
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[uuid.UUID, set[Subscription]] = {}
+        self.closed = False
+
+    @contextmanager
+    def subscribe(self, user_id: uuid.UUID) -> Iterator[Subscription]:
+        subscription = Subscription(user_id, settings.NOTE_EVENTS_QUEUE_SIZE)
+        if self.closed:
+            # Draining: the stream ends at once and the client reconnects elsewhere
+            subscription.close()
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        metrics.NOTE_EVENT_SUBSCRIPTIONS.inc()
+        try:
+            yield subscription
+        finally:
+            metrics.NOTE_EVENT_SUBSCRIPTIONS.dec()
+            subscriptions = self._subscriptions.get(user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[user_id]
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            user_id = uuid.UUID(message["user_id"])
+            event = message["event"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s notification: %.200s", CHANNEL, payload)
+            return
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.push(event)
+
+    def resync_all(self) -> None:
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.push(RESYNC)
+
+    def close(self) -> None:
+        """
+        End every stream, and any opened from now on; clients reconnect (to
+        another worker when draining).
+        """
+        self.closed = True
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+
+hub = Hub()
+
+
+def _listen_dsn() -> str:
+    # LISTEN needs a session of its own: never through PgBouncer transaction pooling
+    url = make_url(settings.NOTE_EVENTS_LISTEN_URL or settings.DATABASE_URL)
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class Listener:
+    """Per-process LISTEN connection feeding `hub`; reconnects with backoff."""
+
+    def __init__(self, hub: Hub = hub) -> None:
+        self.hub = hub
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                conn = await asyncpg.connect(_listen_dsn())
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Note events listener could not connect")
+            else:
+                if failures:
+                    # Anything published while we were away is lost
+                    self.hub.resync_all()
+                failures = 0
+                try:
+                    await self._listen(conn)
+                except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    logger.exception("Note events listener lost its connection")
+                finally:
+                    conn.terminate()
+            failures += 1
+            await asyncio.sleep(min(2 ** failures, 30))
+
+    async def _listen(self, conn: asyncpg.Connection) -> None:
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        await conn.add_listener(CHANNEL, lambda _conn, _pid, _channel, payload: self.hub.dispatch(payload))
+        while not closed.is_set():
+            try:
+                await asyncio.wait_for(closed.wait(), settings.NOTE_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # A half-open TCP connection would otherwise go unnoticed
+                await conn.execute("SELECT 1", timeout=settings.NOTE_EVENTS_HEARTBEAT)
+
+    async def stop(self) -> None:
+        self.hub.close()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,57 @@
+"""
+Streaming NDJSON export of a user's notes.
+
+Rows are read through a server-side cursor in batches (yield_per), encoded
+one JSON object per line and flushed in ~64 KiB pieces, so memory stays
+flat regardless of account size. Notes are ordered by id: a client whose
+connection dropped resumes with `after=<id of the last line it received>`.
+"""
+import uuid
+import zlib
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from app.db import replicas
+from app.models.note import Note
+from app.schemas.note import Note as NoteSchema
+
+EXPORT_BATCH_SIZE = 500
+_FLUSH_BYTES = 64 * 1024
+
+
+async def export_notes(
+    user_id: uuid.UUID, after: Optional[uuid.UUID] = None, compress: bool = False
+) -> AsyncIterator[bytes]:
+    # The request's session is already closed when the body streams,
+    # so the export runs on its own session, on a replica when one is usable.
+    query = select(Note).where(Note.user_id == user_id).order_by(Note.id)
+    if after is not None:
+        query = query.where(Note.id > after)
+
+    # gzip container (wbits=31); sync-flushed per piece so a partial
+    # download is still decodable up to the last complete line
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = bytearray()
+
+    def emit(final: bool = False) -> bytes:
+        data = bytes(buffer)
+        buffer.clear()
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(
+            zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        )
+
+    sessionmaker = await replicas.read_sessionmaker(user_id)
+    async with sessionmaker() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for note in result.scalars():
+            buffer += NoteSchema.model_validate(note).model_dump_json().encode()
+            buffer += b"\n"
+            if len(buffer) >= _FLUSH_BYTES:
+                yield emit()
+            # Keep the identity map from growing with the export
+            session.expunge(note)
+
+    yield emit(final=True)
@@ -0,0 +1,191 @@
+"""
+High-throughput NDJSON import of notes through PostgreSQL COPY.
+
+The request body is parsed line by line as it streams in. Valid rows are
+buffered into batches, loaded with asyncpg's binary COPY
+(copy_records_to_table) into a per-connection temp staging table and merged
+into `notes` with INSERT ... SELECT ... ON CONFLICT (user_id, id) DO NOTHING. Each
+batch commits on its own, so progress survives a dropped upload and a
+re-run of the same file only skips what is already there.
+
+The result lists every committed batch and the last input line covered
+(`committed_line`); an import that fails part way reports it in the
+`Import-Committed-Line` header. Sending the file again with
+`start_line=committed_line + 1` skips the lines already loaded without
+parsing them.
+"""
+import base64
+import hashlib
+import logging
+import uuid
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.note import NoteImport, NoteImportBatch, NoteImportError, NoteImportResult
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+MAX_LINE_BYTES = 16 * 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+
+# Namespace for ids derived from line content when the client sends none
+IMPORT_NAMESPACE = uuid.UUID("f9d63f7f-ce28-4c0c-93d4-2c2b5f42e9df")
+
+STAGING_TABLE = "notes_import"
+STAGING_COLUMNS = (
+    "id",
+    "encrypted_title",
+    "encrypted_content",
+    "is_archived",
+    "audio_file_path",
+    "audio_duration",
+    "encrypted_transcription",
+    "has_audio",
+    "created_at",
+    "updated_at",
+)
+
+_CREATE_STAGING = text(f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        id uuid NOT NULL,
+        encrypted_title bytea,
+        encrypted_content bytea NOT NULL,
+        is_archived boolean NOT NULL,
+        audio_file_path varchar,
+        audio_duration integer,
+        encrypted_transcription bytea,
+        has_audio boolean NOT NULL,
+        created_at timestamptz,
+        updated_at timestamptz
+    ) ON COMMIT DELETE ROWS
+""")
+
+_MERGE_STAGING = text(f"""
+    INSERT INTO notes (
+        id, user_id, encrypted_title, encrypted_content, is_archived,
+        audio_file_path, audio_duration, encrypted_transcription, has_audio,
+        created_at, updated_at
+    )
+    SELECT
+        id, :user_id, encrypted_title, encrypted_content, is_archived,
+        audio_file_path, audio_duration, encrypted_transcription, has_audio,
+        COALESCE(created_at, now()), COALESCE(updated_at, created_at, now())
+    FROM {STAGING_TABLE}
+    ON CONFLICT (user_id, id) DO NOTHING
+""")
+
+
+def _b64(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else base64.b64decode(value)
+
+
+def _to_record(user_id: uuid.UUID, line: bytes, note: NoteImport) -> tuple:
+    note_id = note.id or uuid.uuid5(
+        IMPORT_NAMESPACE, f"{user_id}:{hashlib.sha256(line).hexdigest()}"
+    )
+    return (
+        note_id,
+        _b64(note.encrypted_title),
+        _b64(note.encrypted_content),
+        note.is_archived,
+        note.audio_file_path,
+        note.audio_duration,
+        _b64(note.encrypted_transcription),
+        note.has_audio,
+        note.created_at,
+        note.updated_at,
+    )
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+        if len(pending) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail="Import line is too large")
+    if pending:
+        yield pending
+
+
+async def _load_batch(db: AsyncSession, user_id: uuid.UUID, records: list[tuple]) -> int:
+    await db.execute(_CREATE_STAGING)
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        STAGING_TABLE, records=records, columns=STAGING_COLUMNS
+    )
+    result = await db.execute(_MERGE_STAGING, {"user_id": user_id})
+    # ON COMMIT DELETE ROWS empties the staging table for the next batch
+    await db.commit()
+    return result.rowcount
+
+
+def _read_line(
+    report: NoteImportResult, records: list[tuple], user_id: uuid.UUID, line_number: int, line: bytes
+) -> None:
+    """Validate one input line into `records`, or record why it failed."""
+    line = line.strip()
+    if not line:
+        return
+    report.received += 1
+    try:
+        note = NoteImport.model_validate_json(line)
+    except ValidationError as exc:
+        report.failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            message = "; ".join(
+                f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}" for err in exc.errors()
+            )
+            report.errors.append(NoteImportError(line=line_number, error=message))
+        return
+    records.append(_to_record(user_id, line, note))
+
+
+async def import_notes(
+    db: AsyncSession, user_id: uuid.UUID, chunks: AsyncIterator[bytes], start_line: int = 1
+) -> NoteImportResult:
+    report = NoteImportResult(committed_line=start_line - 1)
+    records: list[tuple] = []
+    line_number = 0
+
+    async def flush() -> None:
+        imported = await _load_batch(db, user_id, records)
+        report.imported += imported
+        report.skipped += len(records) - imported
+        report.batches += 1
+        report.committed_line = line_number
+        report.progress.append(NoteImportBatch(
+            batch=report.batches, through_line=line_number,
+            imported=imported, skipped=len(records) - imported,
+        ))
+        records.clear()
+        logger.info(
+            "Note import for user %s: batch %d done, %d received, %d imported, %d skipped, %d failed",
+            user_id, report.batches, report.received, report.imported, report.skipped, report.failed,
+        )
+
+    try:
+        async for line in _lines(chunks):
+            line_number += 1
+            if line_number < start_line:
+                continue
+            _read_line(report, records, user_id, line_number, line)
+            if len(records) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if records:
+            await flush()
+    except HTTPException as exc:
+        exc.headers = {**(exc.headers or {}), "Import-Committed-Line": str(report.committed_line)}
+        raise
+    # Trailing blank or invalid lines need no batch
+    report.committed_line = max(line_number, report.committed_line)
+    return report
+
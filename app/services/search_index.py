@@ -0,0 +1,64 @@
+"""
+Blind-index maintenance for encrypted note search.
+
+Clients derive search tokens as HMAC(search_key, normalized word) and, for
+prefix search, HMAC(search_key, prefix) for each prefix of a word they want
+to be findable by. The server only stores and compares opaque tokens.
+"""
+import uuid
+from typing import Iterable
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.models.search_token import NoteSearchToken
+
+
+async def add_tokens(
+    db: AsyncSession, note_id: uuid.UUID, user_id: uuid.UUID, tokens: Iterable[str]
+) -> None:
+    """Insert tokens for a note, ignoring ones it already has."""
+    rows = [{"note_id": note_id, "user_id": user_id, "token": token} for token in set(tokens)]
+    if not rows:
+        return
+    await db.execute(
+        insert(NoteSearchToken)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "note_id", "token"])
+    )
+
+
+async def replace_tokens(
+    db: AsyncSession, note_id: uuid.UUID, user_id: uuid.UUID, tokens: Iterable[str]
+) -> None:
+    """
+    Make the note's token set equal to `tokens`.
+
+    Only the difference is written: stale tokens are deleted and new ones
+    inserted, unchanged tokens are left untouched.
+    """
+    tokens = set(tokens)
+    stale = delete(NoteSearchToken).where(
+        NoteSearchToken.user_id == user_id, NoteSearchToken.note_id == note_id
+    )
+    if tokens:
+        stale = stale.where(NoteSearchToken.token.not_in(tokens))
+    await db.execute(stale)
+    await add_tokens(db, note_id, user_id, tokens)
+
+
+def matching_note_ids(user_id: uuid.UUID, tokens: Iterable[str], match_all: bool) -> Select:
+    """
+    Subquery of note ids having all (AND) or any (OR) of the given tokens.
+    """
+    tokens = set(tokens)
+    query = (
+        select(NoteSearchToken.note_id)
+        .where(NoteSearchToken.user_id == user_id, NoteSearchToken.token.in_(tokens))
+        .group_by(NoteSearchToken.note_id)
+    )
+    if match_all:
+        query = query.having(func.count() == len(tokens))
+    return query
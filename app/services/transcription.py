@@ -0,0 +1,93 @@
+"""
+Automatic transcription of voice notes, run by the job queue.
+
+Audio blobs are encrypted by the client, so the server can only transcribe
+a note when the client hands over the note's audio key (`transcription_key`,
+a base64 AES-256 key) along with the audio. The key is kept, sealed with
+the server key, in the job's `secret` column, which is wiped when the job
+finishes. The job:
+
+1. decrypts the blob (the AES-GCM envelope of app.core.encryption, the
+   same layout the client uses for every encrypted field),
+2. sends the audio to Whisper,
+3. encrypts the text with the same key into `encrypted_transcription`,
+   unless the note's audio changed or a transcription arrived meanwhile.
+"""
+import base64
+import uuid
+from typing import Any, Optional
+
+import anyio
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import encryption
+from app.core.etag import compute_etag
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.note import Note
+from app.services import ai as ai_service
+from app.services import blobstore, jobs, note_events
+
+KIND = "transcribe_note"
+
+
+async def enqueue(
+    db: AsyncSession,
+    note_id: uuid.UUID,
+    user_id: uuid.UUID,
+    audio_file_path: Optional[str],
+    key: str,
+) -> None:
+    """Queue transcription of the note's current audio in the caller's transaction."""
+    digest = blobstore.digest_from_key(audio_file_path)
+    if digest is None:
+        return
+    await jobs.enqueue(
+        db,
+        KIND,
+        {"note_id": str(note_id), "user_id": str(user_id), "digest": digest},
+        secret=base64.b64decode(key),
+        # Note ids are only unique per user
+        dedupe_key=f"{KIND}:{user_id}:{note_id}:{digest}",
+    )
+
+
+@jobs.handler(KIND, concurrency=settings.TRANSCRIPTION_CONCURRENCY)
+async def transcribe_note(payload: dict[str, Any], secret: Optional[bytes]) -> None:
+    note_id = uuid.UUID(payload["note_id"])
+    user_id = uuid.UUID(payload["user_id"])
+    digest = payload["digest"]
+    if secret is None:
+        raise jobs.PermanentError("no audio key")
+
+    try:
+        sealed = await anyio.Path(blobstore.blob_path(user_id, digest)).read_bytes()
+    except FileNotFoundError:
+        raise jobs.PermanentError("audio blob no longer exists")
+    try:
+        audio = await anyio.to_thread.run_sync(encryption.decrypt_bytes, secret, sealed)
+    except encryption.DecryptionError:
+        raise jobs.PermanentError("audio does not decrypt with the provided key")
+    if not audio:
+        raise jobs.PermanentError("audio is empty")
+
+    text = await ai_service.transcribe_bytes(audio)
+    encrypted = encryption.encrypt_bytes(secret, text.encode())
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(Note)
+            .where(
+                Note.id == note_id,
+                Note.user_id == user_id,
+                Note.audio_file_path == blobstore.blob_key(digest),
+                Note.encrypted_transcription.is_(None),
+            )
+            .values(encrypted_transcription=encrypted)
+            .returning(Note.updated_at)
+        )
+        updated_at = result.scalar_one_or_none()
+        if updated_at is not None:
+            await note_events.publish(session, user_id, "updated", note_id, compute_etag(note_id, updated_at))
+        await session.commit()
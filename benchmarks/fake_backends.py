@@ -0,0 +1,81 @@
+"""
+In-process stand-ins for the Whisper and Ollama (OpenAI-compatible) services.
+
+They answer with the same response shapes as the real services after a
+configurable latency plus uniform jitter, so AI endpoints can be load
+tested without GPUs and with reproducible backend timings.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+@dataclass
+class Latency:
+    mean: float = 0.0  # seconds
+    jitter: float = 0.0  # +/- seconds, uniform
+
+    async def wait(self) -> None:
+        delay = self.mean + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def create_app(whisper: Latency, llm: Latency) -> Starlette:
+    async def inference(request: Request) -> JSONResponse:
+        form = await request.form()
+        upload = form.get("file")
+        size = len(await upload.read()) if upload is not None else 0
+        await whisper.wait()
+        return JSONResponse({"text": f"fake transcript of {size} bytes"})
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        payload = await request.json()
+        prompt = payload["messages"][-1]["content"]
+        await llm.wait()
+        return JSONResponse({
+            "choices": [{"message": {"role": "assistant", "content": prompt.upper()}}],
+            "model": payload.get("model"),
+        })
+
+    return Starlette(routes=[
+        Route("/inference", inference, methods=["POST"]),
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    ])
+
+
+class FakeBackends:
+    """Serves both fakes on one port from the current event loop."""
+
+    def __init__(self, whisper: Latency, llm: Latency, host: str = "127.0.0.1", port: int = 8901):
+        self.host = host
+        self.port = port
+        config = uvicorn.Config(create_app(whisper, llm), host=host, port=port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def whisper_url(self) -> str:
+        return f"http://{self.host}:{self.port}/inference"
+
+    @property
+    def llm_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1/chat/completions"
+
+    async def __aenter__(self) -> "FakeBackends":
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.should_exit = True
+        await self._task
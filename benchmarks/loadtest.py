@@ -0,0 +1,394 @@
+"""
+End-to-end load test of the API.
+
+Starts the app with uvicorn against the database in DATABASE_URL (a local
+Postgres, migrated to head), points WHISPER_API_URL and LLM_API_URL at
+in-process fakes with configurable latency, then drives a weighted mix of
+auth, note CRUD, list and AI calls at a fixed concurrency. Reports
+p50/p95/p99 latency per operation and overall requests per second.
+
+    python -m benchmarks.loadtest --scenario mixed --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --scenario mixed --save-baseline
+    python -m benchmarks.loadtest --scenario mixed --check
+
+--check compares against benchmarks/baselines/<scenario>.json and exits
+non-zero when RPS drops or a p95/p99 grows by more than --tolerance; it
+refuses to start without a baseline. Baselines record the machine they
+were measured on and are only comparable there: --check warns when the
+current machine differs.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.fake_backends import FakeBackends, Latency
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+SCENARIOS: dict[str, dict[str, int]] = {
+    "mixed": {
+        "login": 2,
+        "create_note": 15,
+        "list_notes": 20,
+        "list_summary": 15,
+        "get_note": 20,
+        "update_note": 12,
+        "delete_note": 6,
+        "transcribe": 5,
+        "improve": 5,
+    },
+    "read-heavy": {
+        "list_notes": 30,
+        "list_summary": 30,
+        "get_note": 35,
+        "create_note": 5,
+    },
+    "write-heavy": {
+        "create_note": 40,
+        "update_note": 40,
+        "delete_note": 20,
+    },
+    "ai": {
+        "transcribe": 50,
+        "improve": 50,
+    },
+}
+
+
+def _b64(size: int) -> str:
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+@dataclass
+class VirtualUser:
+    email: str
+    password: str
+    token: str = ""
+    note_ids: list[uuid.UUID] = field(default_factory=list)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, note_bytes: int, audio_bytes: int):
+        self.client = client
+        self.note_bytes = note_bytes
+        self.audio = os.urandom(audio_bytes)
+
+    def _note(self) -> dict:
+        return {
+            "encrypted_title": _b64(48),
+            "encrypted_content": _b64(self.note_bytes),
+            "is_archived": False,
+        }
+
+    async def register(self, user: VirtualUser) -> None:
+        response = await self.client.post(
+            "/api/v1/auth/register", json={"email": user.email, "password": user.password}
+        )
+        response.raise_for_status()
+        await self.login(user)
+
+    async def login(self, user: VirtualUser) -> httpx.Response:
+        response = await self.client.post(
+            "/api/v1/auth/login", json={"email": user.email, "password": user.password}
+        )
+        if response.status_code == 200:
+            user.token = response.json()["access_token"]
+        return response
+
+    async def create_note(self, user: VirtualUser) -> httpx.Response:
+        response = await self.client.post("/api/v1/notes/", json=self._note(), headers=user.headers)
+        if response.status_code == 200:
+            user.note_ids.append(uuid.UUID(response.json()["id"]))
+        return response
+
+    async def list_notes(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.get("/api/v1/notes/?limit=50", headers=user.headers)
+
+    async def list_summary(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.get("/api/v1/notes/?view=summary&limit=50", headers=user.headers)
+
+    async def get_note(self, user: VirtualUser) -> httpx.Response:
+        if not user.note_ids:
+            return await self.create_note(user)
+        note_id = random.choice(user.note_ids)
+        return await self.client.get(f"/api/v1/notes/{note_id}", headers=user.headers)
+
+    async def update_note(self, user: VirtualUser) -> httpx.Response:
+        if not user.note_ids:
+            return await self.create_note(user)
+        note_id = random.choice(user.note_ids)
+        return await self.client.put(
+            f"/api/v1/notes/{note_id}",
+            json={"encrypted_content": _b64(self.note_bytes)},
+            headers=user.headers,
+        )
+
+    async def delete_note(self, user: VirtualUser) -> httpx.Response:
+        if len(user.note_ids) < 2:
+            return await self.create_note(user)
+        note_id = user.note_ids.pop(random.randrange(len(user.note_ids)))
+        return await self.client.delete(f"/api/v1/notes/{note_id}", headers=user.headers)
+
+    async def transcribe(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.post(
+            "/api/v1/ai/transcribe",
+            files={"file": ("audio.m4a", self.audio, "audio/m4a")},
+            headers=user.headers,
+        )
+
+    async def improve(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.post(
+            "/api/v1/ai/improve",
+            json={"text": "some text to improve " * 20, "prompt": "Fix grammar: {text}"},
+            headers=user.headers,
+        )
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> dict:
+    operations = {}
+    total = 0
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        total += len(values)
+        operations[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return {"rps": round(total / elapsed, 1) if elapsed else 0.0, "requests": total, "operations": operations}
+
+
+async def drive(
+    workload: Workload,
+    users: list[VirtualUser],
+    mix: dict[str, int],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+) -> dict:
+    operations: dict[str, Callable[[VirtualUser], Awaitable[httpx.Response]]] = {
+        name: getattr(workload, name) for name in mix
+    }
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def worker(index: int) -> None:
+        user = users[index % len(users)]
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = random.choices(names, weights)[0]
+            try:
+                response = await operations[name](user)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            finished = time.perf_counter()
+            if now >= measure_from:
+                latencies[name].append(finished - now)
+                if failed:
+                    errors[name] += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - measure_from)
+
+
+def machine() -> dict:
+    """What a baseline's numbers depend on, besides the code."""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `result` against `baseline`, as readable lines."""
+    problems = []
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        problems.append(f"rps {result['rps']} < baseline {baseline['rps']}")
+    for name, base in baseline["operations"].items():
+        current = result["operations"].get(name)
+        if current is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > base[key] * (1 + tolerance):
+                problems.append(f"{name} {key} {current[key]} > baseline {base[key]}")
+        if current["errors"] > base["errors"]:
+            problems.append(f"{name} errors {current['errors']} > baseline {base['errors']}")
+    return problems
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'operation':<14}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in result["operations"].items():
+        print(
+            f"{name:<14}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+    print(f"\n{result['requests']} requests, {result['rps']} req/s")
+
+
+def start_server(args, backends: FakeBackends) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WHISPER_API_URL": backends.whisper_url,
+        "LLM_API_URL": backends.llm_url,
+    }
+    if not args.no_migrate:
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True)
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: Optional[subprocess.Popen], timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not become ready")
+
+
+async def run(args) -> int:
+    mix = SCENARIOS[args.scenario]
+    baseline_path = BASELINE_DIR / f"{args.scenario}.json"
+    if args.check and not baseline_path.exists():
+        print(f"No baseline at {baseline_path.relative_to(ROOT)}, record one with --save-baseline")
+        return 2
+    whisper = Latency(args.whisper_latency, args.whisper_jitter)
+    llm = Latency(args.llm_latency, args.llm_jitter)
+
+    async with FakeBackends(whisper, llm, port=args.backend_port) as backends:
+        server = None if args.url else start_server(args, backends)
+        base_url = args.url or f"http://127.0.0.1:{args.port}"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+                await wait_ready(client, server)
+                workload = Workload(client, args.note_bytes, args.audio_bytes)
+
+                run_id = uuid.uuid4().hex[:8]
+                users = [
+                    VirtualUser(email=f"load-{run_id}-{i}@example.com", password="load-test-password")
+                    for i in range(args.users)
+                ]
+                await asyncio.gather(*(workload.register(user) for user in users))
+                for user in users:
+                    for _ in range(args.seed_notes):
+                        await workload.create_note(user)
+
+                result = await drive(workload, users, mix, args.concurrency, args.duration, args.warmup)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    result["scenario"] = args.scenario
+    result["config"] = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "users": args.users,
+        "workers": args.workers,
+        "note_bytes": args.note_bytes,
+        "audio_bytes": args.audio_bytes,
+        "whisper_latency": args.whisper_latency,
+        "llm_latency": args.llm_latency,
+    }
+    result["machine"] = machine()
+    print_report(result)
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path.relative_to(ROOT)}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+    if args.check:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get("machine") != result["machine"]:
+            print(f"WARNING: baseline recorded on {baseline.get('machine', 'an unknown machine')}, "
+                  "numbers may not be comparable")
+        problems = compare(result, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--seed-notes", type=int, default=20, help="notes created per user before the run")
+    parser.add_argument("--note-bytes", type=int, default=2048)
+    parser.add_argument("--audio-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--whisper-latency", type=float, default=1.0)
+    parser.add_argument("--whisper-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--backend-port", type=int, default=8901)
+    parser.add_argument("--url", help="target an already running API instead of starting one")
+    parser.add_argument("--no-migrate", action="store_true")
+    parser.add_argument("--output", help="also write the result JSON here")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
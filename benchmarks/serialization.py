@@ -0,0 +1,104 @@
+"""
+CPU cost of serializing a note list response, without the network or DB.
+
+Compares the previous path (ORM objects validated into response_model and
+dumped by FastAPI's JSON encoder) with the notes routes' fast path (rows
+mapped to dicts and rendered by FastJSONResponse).
+
+    python -m benchmarks.serialization --notes 100 --content-bytes 8192
+"""
+import argparse
+import base64
+import json
+import os
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import List
+
+from asyncpg.pgproto.pgproto import UUID as PgUUID
+from pydantic import TypeAdapter
+
+from app.api.responses import FastJSONResponse
+from app.models.note import Note
+from app.schemas.note import Note as NoteSchema
+
+
+def _b64(size: int) -> str:
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+def _uuid() -> uuid.UUID:
+    # The UUID subclass asyncpg returns for uuid columns, as in real result rows
+    return PgUUID(str(uuid.uuid4()))
+
+
+def make_notes(count: int, content_bytes: int) -> list[dict]:
+    user_id = _uuid()
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": _uuid(),
+            "user_id": user_id,
+            "encrypted_title": _b64(64),
+            "encrypted_content": _b64(content_bytes),
+            "is_archived": False,
+            "audio_file_path": None,
+            "audio_duration": None,
+            "encrypted_transcription": _b64(content_bytes // 4),
+            "has_audio": False,
+            "content_version": 0,
+            "content_chunks": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for _ in range(count)
+    ]
+
+
+def previous_path(notes: list[Note], adapter: TypeAdapter) -> bytes:
+    # What FastAPI does for `return notes` with response_model=List[NoteSchema]
+    validated = adapter.validate_python(notes, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast_path(rows: list) -> bytes:
+    return FastJSONResponse([row._asdict() for row in rows]).body
+
+
+def measure(fn, *args, rounds: int) -> float:
+    fn(*args)  # warm up
+    started = time.process_time()
+    for _ in range(rounds):
+        fn(*args)
+    return (time.process_time() - started) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=100)
+    parser.add_argument("--content-bytes", type=int, default=8192)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    data = make_notes(args.notes, args.content_bytes)
+    orm_notes = [Note(**values) for values in data]
+    Row = namedtuple("Row", list(NoteSchema.model_fields))
+    rows = [Row(**{name: values[name] for name in Row._fields}) for values in data]
+    adapter = TypeAdapter(List[NoteSchema])
+
+    assert json.loads(previous_path(orm_notes, adapter)) == json.loads(fast_path(rows))
+
+    before = measure(previous_path, orm_notes, adapter, rounds=args.rounds)
+    after = measure(fast_path, rows, rounds=args.rounds)
+    size = len(fast_path(rows))
+    print(f"{args.notes} notes, {size / 1024:.0f} KiB response")
+    print(f"response_model + json: {before * 1000:8.3f} ms CPU per request")
+    print(f"rows + orjson:         {after * 1000:8.3f} ms CPU per request")
+    print(f"saved:                 {(before - after) * 1000:8.3f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,103 @@
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
 import pytest
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
 from app.main import app
+from query_budgets import QUERY_BUDGETS
+
+
+@dataclass
+class QueryLog:
+    statements: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+_query_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _log_statement(conn, cursor, statement, parameters, context, executemany):
+    log = _query_log.get()
+    if log is not None:
+        log.statements.append(statement)
+        conn.info.setdefault("test_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _log_statement_time(conn, cursor, statement, parameters, context, executemany):
+    log = _query_log.get()
+    started = conn.info.get("test_query_started")
+    if log is not None and started:
+        log.seconds += time.perf_counter() - started.pop()
+
+
+_route_patterns: list[tuple[str, re.Pattern, str]] = []
+
+
+def _route_template(method: str, path: str) -> Optional[str]:
+    if not _route_patterns:
+        for template, operations in app.openapi()["paths"].items():
+            pattern = re.compile("^" + re.sub(r"\{[^}]+\}", "[^/]+", template) + "$")
+            for op in operations:
+                _route_patterns.append((op.upper(), pattern, template))
+        # Static segments win over parameters, as in the router
+        _route_patterns.sort(key=lambda item: item[2].count("{"))
+    for op, pattern, template in _route_patterns:
+        if op == method and pattern.match(path):
+            return template
+    return None
+
+
+class QueryBudgetApp:
+    """
+    Wraps the app for the test client: records the SQL statements of each
+    request and fails the request when its endpoint's budget is exceeded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.requests: list[tuple[str, str, QueryLog]] = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = _query_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_log.reset(token)
+
+        route = _route_template(scope["method"], scope["path"])
+        self.requests.append((scope["method"], route, log))
+        budget = QUERY_BUDGETS.get((scope["method"], route))
+        if budget is not None and len(log.statements) > budget:
+            statements = "\n".join(f"  {statement}" for statement in log.statements)
+            pytest.fail(
+                f"{scope['method']} {route} ran {len(log.statements)} SQL statements "
+                f"({log.seconds * 1000:.1f} ms), budget is {budget}:\n{statements}"
+            )
+
 
 @pytest.fixture
 def anyio_backend():
     return "asyncio"
 
 @pytest.fixture
-async def client():
-    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+def query_budget_app():
+    return QueryBudgetApp(app)
+
+@pytest.fixture
+async def client(query_budget_app):
+    async with AsyncClient(transport=ASGITransport(app=query_budget_app), base_url="http://test") as ac:
         yield ac
 
 @pytest.fixture
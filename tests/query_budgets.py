@@ -0,0 +1,58 @@
+"""
+Maximum number of SQL statements per request, by endpoint.
+
+The conftest client checks every request against this table, so a new
+round trip (an extra refresh, an N+1 loop, a second user lookup) fails
+whichever test exercises the endpoint. Every /api/v1 endpoint must be
+listed (see test_query_budgets.py). Budgets count the user lookup done by
+get_current_user for JWT-authenticated endpoints.
+"""
+
+QUERY_BUDGETS: dict[tuple[str, str], int] = {
+    ("GET", "/api/v1/health"): 0,
+
+    # auth: existing-user check, INSERT, refresh of server defaults
+    ("POST", "/api/v1/auth/register"): 3,
+    ("POST", "/api/v1/auth/login"): 1,
+    ("POST", "/api/v1/wallet-auth/nonce"): 2,
+    ("POST", "/api/v1/wallet-auth/verify"): 2,
+
+    ("GET", "/api/v1/users/me"): 1,
+    # deactivate, enqueue the job, read it back; the purge runs in the background
+    ("DELETE", "/api/v1/users/me"): 4,
+
+    # with If-None-Match the version-only query runs first
+    ("GET", "/api/v1/notes/"): 3,
+    ("GET", "/api/v1/notes/search"): 2,
+    ("GET", "/api/v1/notes/export"): 2,
+    # staging table + merge per batch of IMPORT_BATCH_SIZE lines, one resync event
+    ("POST", "/api/v1/notes/import"): 4,
+    # the user lookup; the stream itself runs no queries
+    ("GET", "/api/v1/notes/events"): 1,
+    # + transcription job for audio notes, + NOTIFY of note events on every write
+    ("POST", "/api/v1/notes/"): 5,
+    ("GET", "/api/v1/notes/{note_id}"): 3,
+    # UPDATE, token diff (delete + insert), chunk prune (previously chunked notes), NOTIFY
+    ("PUT", "/api/v1/notes/{note_id}"): 6,
+    ("DELETE", "/api/v1/notes/{note_id}"): 4,
+    ("GET", "/api/v1/notes/{note_id}/raw/{field}"): 2,
+    ("PUT", "/api/v1/notes/{note_id}/raw/{field}"): 4,
+
+    ("GET", "/api/v1/notes/{note_id}/chunks"): 3,
+    # lock note, insert chunks, key-share referenced chunks, UPDATE, prune, NOTIFY
+    ("PATCH", "/api/v1/notes/{note_id}/chunks"): 7,
+
+    # attaching audio with a transcription_key also enqueues a job
+    ("POST", "/api/v1/notes/{note_id}/audio/uploads"): 5,
+    ("GET", "/api/v1/notes/{note_id}/audio/uploads/{upload_id}"): 2,
+    ("PATCH", "/api/v1/notes/{note_id}/audio/uploads/{upload_id}"): 2,
+    ("POST", "/api/v1/notes/{note_id}/audio/uploads/{upload_id}/complete"): 5,
+    ("GET", "/api/v1/notes/{note_id}/audio"): 2,
+
+    ("POST", "/api/v1/ai/transcribe"): 1,
+    ("POST", "/api/v1/ai/improve"): 1,
+
+    ("GET", "/api/v1/admin/db/pool"): 0,
+    ("GET", "/api/v1/admin/profiles"): 0,
+    ("GET", "/api/v1/admin/profiles/{profile_id}"): 0,
+}
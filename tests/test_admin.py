@@ -0,0 +1,53 @@
+"""
+Tests for operator (admin) endpoints.
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+
+
+@pytest.mark.anyio
+async def test_pool_stats_requires_admin(client: AsyncClient, auth_headers):
+    """Regular user tokens cannot read pool statistics."""
+    response = await client.get("/api/v1/admin/db/pool", headers=auth_headers)
+    assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_pool_stats(client: AsyncClient):
+    """The API secret key can read live pool statistics."""
+    if not settings.API_SECRET_KEY:
+        pytest.skip("API_SECRET_KEY is not configured")
+    headers = {"Authorization": f"Bearer {settings.API_SECRET_KEY}"}
+    response = await client.get("/api/v1/admin/db/pool", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()["primary"]
+    assert stats["size"] >= 0
+    assert stats["checkouts"] >= 0
+
+
+@pytest.mark.anyio
+async def test_profile_request(client: AsyncClient, tmp_path, monkeypatch):
+    """X-Profile-Key profiles the request and stores a downloadable profile."""
+    if not settings.API_SECRET_KEY:
+        pytest.skip("API_SECRET_KEY is not configured")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    headers = {"Authorization": f"Bearer {settings.API_SECRET_KEY}"}
+
+    response = await client.get("/health", headers={"X-Profile-Key": settings.API_SECRET_KEY})
+    profile_id = response.headers["X-Profile-Id"]
+
+    listing = await client.get("/api/v1/admin/profiles", headers=headers)
+    assert profile_id in [profile["id"] for profile in listing.json()]
+    profile = await client.get(f"/api/v1/admin/profiles/{profile_id}", headers=headers)
+    assert profile.status_code == 200
+    assert "speedscope" in profile.json()["$schema"]
+
+
+@pytest.mark.anyio
+async def test_profile_header_requires_admin_key(client: AsyncClient):
+    """A wrong X-Profile-Key does not trigger profiling."""
+    response = await client.get("/health", headers={"X-Profile-Key": "wrong"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
@@ -0,0 +1,143 @@
+"""
+Tests for resumable encrypted audio upload and range download.
+"""
+import hashlib
+
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_audio_upload_resume_and_range(client: AsyncClient, auth_headers):
+    """Upload audio in two chunks, then download a byte range."""
+    create_response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "YXVkaW8="}, headers=auth_headers
+    )
+    note_id = create_response.json()["id"]
+    audio = bytes(range(256)) * 64
+    digest = hashlib.sha256(audio).hexdigest()
+
+    response = await client.post(f"/api/v1/notes/{note_id}/audio/uploads", json={}, headers=auth_headers)
+    assert response.status_code == 200
+    upload_id = response.json()["upload_id"]
+    upload_url = f"/api/v1/notes/{note_id}/audio/uploads/{upload_id}"
+
+    response = await client.patch(
+        upload_url, content=audio[:1000], headers={**auth_headers, "Upload-Offset": "0"}
+    )
+    assert response.json()["offset"] == 1000
+
+    # Wrong offset is rejected with the current one
+    response = await client.patch(upload_url, content=b"x", headers={**auth_headers, "Upload-Offset": "5"})
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "1000"
+
+    response = await client.get(upload_url, headers=auth_headers)
+    offset = response.json()["offset"]
+    await client.patch(
+        upload_url, content=audio[offset:], headers={**auth_headers, "Upload-Offset": str(offset)}
+    )
+
+    response = await client.post(
+        f"{upload_url}/complete", json={"digest": digest, "audio_duration": 3}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["digest"] == digest
+
+    response = await client.get(
+        f"/api/v1/notes/{note_id}/audio", headers={**auth_headers, "Range": "bytes=100-199"}
+    )
+    assert response.status_code == 206
+    assert response.content == audio[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(audio)}"
+
+    note = (await client.get(f"/api/v1/notes/{note_id}", headers=auth_headers)).json()
+    assert note["has_audio"] is True
+    assert note["audio_duration"] == 3
+
+
+@pytest.mark.anyio
+async def test_audio_upload_dedup_by_digest(client: AsyncClient, auth_headers):
+    """A blob the user already uploaded is linked without re-uploading."""
+    audio = b"encrypted-audio" * 10
+    digest = hashlib.sha256(audio).hexdigest()
+    note_ids = []
+    for _ in range(2):
+        response = await client.post(
+            "/api/v1/notes/", json={"encrypted_content": "YXVkaW8="}, headers=auth_headers
+        )
+        note_ids.append(response.json()["id"])
+
+    response = await client.post(f"/api/v1/notes/{note_ids[0]}/audio/uploads", json={}, headers=auth_headers)
+    upload_url = f"/api/v1/notes/{note_ids[0]}/audio/uploads/{response.json()['upload_id']}"
+    await client.patch(upload_url, content=audio, headers={**auth_headers, "Upload-Offset": "0"})
+    await client.post(f"{upload_url}/complete", json={}, headers=auth_headers)
+
+    response = await client.post(
+        f"/api/v1/notes/{note_ids[1]}/audio/uploads",
+        json={"digest": digest, "size": len(audio)},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["completed"] is True
+    assert response.json()["upload_id"] is None
+
+
+@pytest.mark.anyio
+async def test_audio_upload_is_locked_while_written(client: AsyncClient, auth_headers):
+    """A second request on an upload that is being written gets 409, not a torn file."""
+    import fcntl
+    import uuid
+
+    from app.services import blobstore
+
+    note_id = (await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "bG9jaw=="}, headers=auth_headers
+    )).json()["id"]
+    upload_id = (await client.post(
+        f"/api/v1/notes/{note_id}/audio/uploads", json={}, headers=auth_headers
+    )).json()["upload_id"]
+    upload_url = f"/api/v1/notes/{note_id}/audio/uploads/{upload_id}"
+
+    # Stands in for a concurrent append, in this or another worker process
+    with open(blobstore.upload_path(uuid.UUID(note_id), uuid.UUID(upload_id)), "ab") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        response = await client.patch(upload_url, content=b"x", headers={**auth_headers, "Upload-Offset": "0"})
+        assert response.status_code == 409
+        response = await client.post(f"{upload_url}/complete", json={}, headers=auth_headers)
+        assert response.status_code == 409
+
+    response = await client.patch(upload_url, content=b"x", headers={**auth_headers, "Upload-Offset": "0"})
+    assert response.json()["offset"] == 1
+
+
+@pytest.mark.anyio
+async def test_abandoned_uploads_are_swept(client: AsyncClient, auth_headers, monkeypatch, tmp_path):
+    """Uploads not written to within the expiry are deleted with their directory."""
+    import os
+    import time
+    import uuid
+
+    from app.services import blobstore
+
+    monkeypatch.setattr(blobstore.settings, "BLOB_STORAGE_DIR", str(tmp_path))
+
+    note_id = (await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "c3dlZXA="}, headers=auth_headers
+    )).json()["id"]
+    upload_ids = [
+        (await client.post(f"/api/v1/notes/{note_id}/audio/uploads", json={}, headers=auth_headers)).json()["upload_id"]
+        for _ in range(2)
+    ]
+    stale, fresh = (blobstore.upload_path(uuid.UUID(note_id), uuid.UUID(upload_id)) for upload_id in upload_ids)
+    an_hour_ago = time.time() - 3600
+    os.utime(stale, (an_hour_ago, an_hour_ago))
+
+    assert blobstore.sweep_stale_uploads(max_age=60) == 1
+    assert not stale.exists() and fresh.exists()
+    response = await client.get(f"/api/v1/notes/{note_id}/audio/uploads/{upload_ids[0]}", headers=auth_headers)
+    assert response.status_code == 404
+
+    os.utime(fresh, (an_hour_ago, an_hour_ago))
+    assert blobstore.sweep_stale_uploads(max_age=60) == 1
+    assert not fresh.parent.exists()
@@ -0,0 +1,76 @@
+"""
+Tests for server-side AES-GCM encryption and the derived-key cache.
+"""
+import asyncio
+import uuid
+
+import pytest
+
+from app.core import encryption
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def fast_kdf(monkeypatch):
+    monkeypatch.setattr(settings, "ENCRYPTION_KDF_ITERATIONS", 1000)
+
+
+@pytest.mark.anyio
+async def test_user_key_is_derived_once():
+    """Concurrent and repeated lookups share a single PBKDF2 derivation."""
+    cache = encryption.KeyCache(max_size=8, ttl=60)
+    user_id, salt = uuid.uuid4(), encryption.new_salt()
+
+    keys = await asyncio.gather(*(cache.get(user_id, "secret", salt) for _ in range(5)))
+    keys.append(await cache.get(user_id, "secret", salt))
+
+    assert cache.derivations == 1
+    assert set(keys) == {encryption.derive_key("secret", salt)}
+
+    # A different secret never hits the cached entry
+    assert await cache.get(user_id, "other", salt) != keys[0]
+    assert cache.derivations == 2
+
+
+@pytest.mark.anyio
+async def test_evicted_keys_are_zeroized():
+    """The cache is bounded; evicted and expired keys are overwritten with zeros."""
+    cache = encryption.KeyCache(max_size=2, ttl=60)
+    salt = encryption.new_salt()
+    first = uuid.uuid4()
+    key = await cache.get(first, "secret", salt)
+    (stored, _), = cache._entries.values()
+
+    await cache.get(uuid.uuid4(), "secret", salt)
+    await cache.get(uuid.uuid4(), "secret", salt)
+
+    assert len(cache._entries) == 2
+    assert stored == bytearray(len(key))
+    # The copy handed out earlier is unaffected
+    assert key == encryption.derive_key("secret", salt)
+
+    cache.ttl = 0
+    await cache.get(first, "secret", salt)
+    await cache.get(first, "secret", salt)
+    assert cache.derivations == 5
+
+
+@pytest.mark.anyio
+async def test_batch_round_trip_and_tampering():
+    pytest.importorskip("cryptography")
+    key = encryption.derive_key("secret", encryption.new_salt())
+    # One small page (encrypted inline) and one large enough for the thread pool
+    for size in (100, 100_000):
+        values = ["a" * size, None, "ü" * size]
+        sealed = await encryption.encrypt_many(key, values)
+        assert sealed[1] is None
+        assert await encryption.decrypt_many(key, sealed) == values
+
+    assert encryption.decrypt_content(encryption.encrypt_content("note", key), key) == "note"
+
+    tampered = bytearray(encryption.encrypt_bytes(key, b"note"))
+    tampered[-1] ^= 1
+    with pytest.raises(encryption.DecryptionError):
+        encryption.decrypt_bytes(key, bytes(tampered))
+    with pytest.raises(encryption.DecryptionError):
+        encryption.decrypt_bytes(bytes(32), encryption.encrypt_bytes(key, b"note"))
@@ -9,8 +9,8 @@ async def test_create_encrypted_note_only(client: AsyncClient, auth_headers: dic
     This verifies that the backend no longer requires plaintext 'title' and 'content'.
     """
     note_data = {
-        "encrypted_title": "encrypted_title_string",
-        "encrypted_content": "encrypted_content_string",
+        "encrypted_title": "ZW5jcnlwdGVkX3RpdGxl",
+        "encrypted_content": "ZW5jcnlwdGVkX2NvbnRlbnQ=",
         "is_archived": False
     }
     
@@ -22,6 +22,87 @@ async def test_create_encrypted_note_only(client: AsyncClient, auth_headers: dic
     
     assert response.status_code == 200
     data = response.json()
-    assert data["encrypted_title"] == "encrypted_title_string"
-    assert data["encrypted_content"] == "encrypted_content_string"
+    assert data["encrypted_title"] == "ZW5jcnlwdGVkX3RpdGxl"
+    assert data["encrypted_content"] == "ZW5jcnlwdGVkX2NvbnRlbnQ="
     assert "id" in data
+
+
+@pytest.mark.asyncio
+async def test_create_note_rejects_non_base64(client: AsyncClient, auth_headers: dict):
+    """Encrypted fields are stored as bytes, so they must be valid base64."""
+    note_data = {"encrypted_content": "not base64!"}
+
+    response = await client.post("/api/v1/notes/", json=note_data, headers=auth_headers)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_raw_content_round_trip(client: AsyncClient, auth_headers: dict):
+    """Encrypted content can be written and read as raw bytes."""
+    note_data = {"encrypted_content": "aGVsbG8="}
+    response = await client.post("/api/v1/notes/", json=note_data, headers=auth_headers)
+    note_id = response.json()["id"]
+
+    raw = await client.get(f"/api/v1/notes/{note_id}/raw/content", headers=auth_headers)
+    assert raw.status_code == 200
+    assert raw.content == b"hello"
+
+    response = await client.put(
+        f"/api/v1/notes/{note_id}/raw/content",
+        content=b"\x00\x01binary",
+        headers={**auth_headers, "Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/api/v1/notes/{note_id}", headers=auth_headers)
+    assert response.json()["encrypted_content"] == "AAFiaW5hcnk="
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sent", [
+    "aGVsbG8_-w",            # urlsafe alphabet, unpadded
+    "aGVsbG8/+w",            # standard alphabet, unpadded
+    "aGVsbG8/\n+w==\n",      # wrapped, as MIME encoders emit
+    " aGVsbG8/+w== ",
+])
+async def test_create_note_accepts_lenient_base64(client: AsyncClient, auth_headers: dict, sent: str):
+    """Urlsafe, unpadded and wrapped base64 is normalized, not rejected."""
+    response = await client.post("/api/v1/notes/", json={"encrypted_content": sent}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["encrypted_content"] == "aGVsbG8/+w=="
+
+
+@pytest.mark.asyncio
+async def test_bytea_migration_decodes_legacy_base64():
+    """80193dd100ca normalizes legacy values and keeps undecodable ones instead of aborting."""
+    import importlib.util
+    import uuid
+    from pathlib import Path
+
+    from sqlalchemy import text
+
+    from app.db.session import AsyncSessionLocal
+
+    path = next(Path(__file__).parents[1].glob("alembic/versions/80193dd100ca_*.py"))
+    spec = importlib.util.spec_from_file_location("bytea_migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    note_id = uuid.uuid4()
+    async with AsyncSessionLocal() as session:
+        await session.execute(text("CREATE TEMP TABLE undecodable_base64 (note_id uuid, field text)"))
+        await session.execute(text(migration.DECODE_FUNCTION))
+        decode = text("SELECT pg_temp.decode_legacy_base64(:value, :note_id, 'encrypted_content')")
+        for value, expected in [
+            ("aGVsbG8/+w==", b"hello?\xfb"),
+            ("aGVsbG8_-w", b"hello?\xfb"),
+            ("aGVsbG8/\n+w==", b"hello?\xfb"),
+            ("not base64!", b"not base64!"),
+        ]:
+            result = await session.execute(decode, {"value": value, "note_id": note_id})
+            assert result.scalar_one() == expected
+        undecodable = await session.execute(text("SELECT note_id, field FROM undecodable_base64"))
+        assert undecodable.all() == [(note_id, "encrypted_content")]
+        await session.rollback()
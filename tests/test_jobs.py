@@ -0,0 +1,137 @@
+"""
+Tests for the durable job queue and automatic voice-note transcription.
+"""
+import base64
+import os
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app.db.session import AsyncSessionLocal
+from app.models.job import Job
+from app.services import ai as ai_service
+from app.services import jobs, transcription
+
+
+@pytest.mark.anyio
+async def test_audio_note_is_transcribed_by_job(client: AsyncClient, auth_headers, monkeypatch):
+    """Completing an upload with a transcription_key fills encrypted_transcription."""
+    aead = pytest.importorskip("cryptography.hazmat.primitives.ciphers.aead")
+    key = os.urandom(32)
+    nonce = os.urandom(12)
+    sealed_audio = nonce + aead.AESGCM(key).encrypt(nonce, b"RIFF fake wav", None)
+
+    sent = []
+
+    async def fake_transcribe(content, *args, **kwargs):
+        sent.append(content)
+        return "hello from the job"
+
+    monkeypatch.setattr(ai_service, "transcribe_bytes", fake_transcribe)
+
+    note_id = (await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "dm9pY2U="}, headers=auth_headers
+    )).json()["id"]
+    upload_id = (await client.post(
+        f"/api/v1/notes/{note_id}/audio/uploads", json={}, headers=auth_headers
+    )).json()["upload_id"]
+    upload_url = f"/api/v1/notes/{note_id}/audio/uploads/{upload_id}"
+    await client.patch(upload_url, content=sealed_audio, headers={**auth_headers, "Upload-Offset": "0"})
+    response = await client.post(
+        f"{upload_url}/complete",
+        json={"transcription_key": base64.b64encode(key).decode()},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    assert await jobs.run_once(transcription.KIND) == ["done"]
+    assert sent == [b"RIFF fake wav"]
+
+    note = (await client.get(f"/api/v1/notes/{note_id}", headers=auth_headers)).json()
+    sealed_text = base64.b64decode(note["encrypted_transcription"])
+    assert aead.AESGCM(key).decrypt(sealed_text[:12], sealed_text[12:], None) == b"hello from the job"
+
+    async with AsyncSessionLocal() as session:
+        job = (await session.execute(
+            select(Job).where(Job.dedupe_key.startswith(f"{transcription.KIND}:{note['user_id']}:{note_id}:"))
+        )).scalar_one()
+    assert job.status == "done"
+    assert job.secret is None
+
+
+@pytest.mark.anyio
+async def test_failed_job_is_retried_with_backoff():
+    """A failing handler puts the job back in the queue for a later attempt."""
+    kind = f"test_failing_{uuid.uuid4().hex}"
+
+    received = []
+
+    @jobs.handler(kind)
+    async def failing(payload, secret):
+        received.append(secret)
+        raise RuntimeError("backend down")
+
+    try:
+        async with AsyncSessionLocal() as session:
+            await jobs.enqueue(session, kind, {"n": 1}, secret=b"key")
+            await session.commit()
+
+        assert await jobs.run_once(kind) == ["retry"]
+        assert received == [b"key"]
+        # Not due again until the backoff has passed
+        assert await jobs.run_once(kind) == []
+
+        async with AsyncSessionLocal() as session:
+            job = (await session.execute(select(Job).where(Job.kind == kind))).scalar_one()
+            assert job.status == "queued"
+            assert job.attempts == 1
+            assert "backend down" in job.last_error
+            # Kept sealed with the server key, never as sent
+            assert job.secret is not None and b"key" not in job.secret
+            assert job.run_at > job.updated_at
+            await session.delete(job)
+            await session.commit()
+    finally:
+        jobs.registry.pop(kind)
+
+
+@pytest.mark.anyio
+async def test_dedupe_key_only_blocks_unfinished_jobs(monkeypatch):
+    """A key is free again once its job has finished; finished jobs are swept later."""
+    kind = f"test_dedupe_{uuid.uuid4().hex}"
+
+    @jobs.handler(kind)
+    async def failing(payload, secret):
+        raise jobs.PermanentError("bad input")
+
+    async def enqueue_twice():
+        async with AsyncSessionLocal() as session:
+            for _ in range(2):
+                await jobs.enqueue(session, kind, {}, dedupe_key=kind)
+            await session.commit()
+
+    async def statuses():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Job.status).where(Job.kind == kind).order_by(Job.created_at))
+            return list(result.scalars())
+
+    try:
+        await enqueue_twice()
+        assert await statuses() == ["queued"]
+        assert await jobs.run_once(kind) == ["failed"]
+
+        # The failed job no longer holds the key
+        await enqueue_twice()
+        assert await statuses() == ["failed", "queued"]
+
+        assert await jobs.sweep_finished() == 0
+        monkeypatch.setattr(jobs.settings, "JOB_RETENTION", 0)
+        assert await jobs.sweep_finished() == 1
+        assert await statuses() == ["queued"]
+    finally:
+        jobs.registry.pop(kind)
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(Job).where(Job.kind == kind))
+            await session.commit()
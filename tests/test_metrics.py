@@ -0,0 +1,41 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_metrics_exposition(client: AsyncClient):
+    """Requests are recorded per route template and exposed on /metrics."""
+    await client.get("/health")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert 'db_pool_size{pool="primary"}' in body
+
+
+@pytest.mark.anyio
+async def test_metrics_count_queries_per_route(client: AsyncClient, auth_headers):
+    """SQL statements are attributed to the route template, not the raw path."""
+    await client.get("/api/v1/notes/", headers=auth_headers)
+
+    body = (await client.get("/metrics")).text
+    assert 'http_request_db_queries_count{method="GET",route="/api/v1/notes/"}' in body
+
+
+@pytest.mark.anyio
+async def test_metrics_label_path_templates(client: AsyncClient, auth_headers):
+    """Routes of included routers keep their prefix; unknown paths share one label."""
+    await client.get("/api/v1/notes/00000000-0000-0000-0000-000000000000/raw/title", headers=auth_headers)
+    await client.get("/no/such/path")
+
+    body = (await client.get("/metrics")).text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/v1/notes/{note_id}/raw/{field}",status="404"}'
+        in body
+    )
+    assert 'http_request_duration_seconds_count{method="GET",route="<unmatched>",status="404"}' in body
@@ -0,0 +1,130 @@
+"""
+Tests for real-time note change events (LISTEN/NOTIFY fan-out).
+"""
+import asyncio
+import json
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.services import note_events
+
+
+async def _next(subscription: note_events.Subscription, skip_pings: bool = True) -> dict:
+    async for event in subscription:
+        if not (skip_pings and event is note_events.PING):
+            return event
+
+
+def _payload(user_id: uuid.UUID, note_id: uuid.UUID, version: str = '"v"') -> str:
+    event = {"type": "note", "op": "updated", "id": str(note_id), "version": version}
+    return json.dumps({"user_id": str(user_id), "event": event})
+
+
+@pytest.mark.anyio
+async def test_events_reach_only_the_users_subscriptions():
+    hub = note_events.Hub()
+    alice, bob, note_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    with hub.subscribe(alice) as phone, hub.subscribe(alice) as laptop, hub.subscribe(bob) as other:
+        hub.dispatch(_payload(alice, note_id))
+        hub.dispatch("not json")
+
+        for subscription in (phone, laptop):
+            assert await _next(subscription) == {
+                "type": "note", "op": "updated", "id": str(note_id), "version": '"v"'
+            }
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(_next(other), 0.05)
+
+    # Closed subscriptions are forgotten
+    assert hub._subscriptions == {}
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_gets_a_resync(monkeypatch):
+    """A full queue is replaced by one resync instead of growing or blocking."""
+    monkeypatch.setattr(settings, "NOTE_EVENTS_QUEUE_SIZE", 3)
+    monkeypatch.setattr(settings, "NOTE_EVENTS_HEARTBEAT", 0.01)
+    hub = note_events.Hub()
+    user_id = uuid.uuid4()
+
+    with hub.subscribe(user_id) as subscription:
+        for version in range(5):
+            hub.dispatch(_payload(user_id, uuid.uuid4(), str(version)))
+
+        assert await _next(subscription) == note_events.RESYNC
+        assert (await _next(subscription))["version"] == "4"
+        # Silence turns into heartbeats
+        assert await _next(subscription, skip_pings=False) is note_events.PING
+
+        hub.close()
+        assert [event async for event in subscription] == [note_events.RESYNC]
+
+
+@pytest.mark.anyio
+async def test_note_writes_are_pushed_after_commit(client: AsyncClient, auth_headers):
+    """create, update and delete reach a subscriber through Postgres NOTIFY."""
+    me = (await client.get("/api/v1/users/me", headers=auth_headers)).json()
+    listener = note_events.Listener(note_events.Hub())
+    listener.start()
+    try:
+        with listener.hub.subscribe(uuid.UUID(me["id"])) as subscription:
+            # Let the listener connect before anything is published
+            await asyncio.sleep(0.5)
+            created = await client.post("/api/v1/notes/", json={"encrypted_content": "dg=="}, headers=auth_headers)
+            note_id = created.json()["id"]
+            etag = (await client.get(f"/api/v1/notes/{note_id}", headers=auth_headers)).headers["ETag"]
+            await client.put(f"/api/v1/notes/{note_id}", json={"is_archived": True}, headers=auth_headers)
+            await client.delete(f"/api/v1/notes/{note_id}", headers=auth_headers)
+
+            events = [await asyncio.wait_for(_next(subscription), 5) for _ in range(3)]
+    finally:
+        await listener.stop()
+
+    assert [(event["op"], event["id"]) for event in events] == [
+        ("created", note_id), ("updated", note_id), ("deleted", note_id)
+    ]
+    # version is the ETag clients already hold from GET
+    assert events[0]["version"] == etag
+    assert events[1]["version"] != etag
+    assert events[2]["version"] is None
+
+
+@pytest.mark.anyio
+async def test_drain_ends_event_streams():
+    """Shutdown ends open streams at once, and streams opened during the drain."""
+    from app.main import app, begin_drain
+    from app.services import blobstore, jobs
+
+    hub = note_events.Hub()
+    app.state.event_listener = note_events.Listener(hub)
+    app.state.upload_sweeper = blobstore.UploadSweeper()
+    app.state.job_worker = jobs.Worker()
+    app.state.draining = None
+    try:
+        with hub.subscribe(uuid.uuid4()) as subscription:
+            drain = begin_drain(app)
+            assert begin_drain(app) is drain
+            await drain
+            assert [event async for event in subscription] == [note_events.RESYNC]
+        with hub.subscribe(uuid.uuid4()) as late:
+            assert [event async for event in late] == [note_events.RESYNC]
+    finally:
+        for name in ("event_listener", "upload_sweeper", "job_worker", "draining"):
+            delattr(app.state, name)
+
+
+def test_socket_rejects_a_binary_first_frame():
+    from starlette.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    from app.main import app
+
+    with TestClient(app).websocket_connect("/api/v1/notes/events/ws") as websocket:
+        websocket.send_bytes(b"\x00\x01")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1008
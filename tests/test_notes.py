@@ -1,6 +1,8 @@
 """
 Tests for notes CRUD endpoints.
 """
+import uuid
+
 import pytest
 from httpx import AsyncClient
 
@@ -178,3 +180,382 @@ async def test_list_notes_pagination(client: AsyncClient, auth_headers):
     assert response.status_code == 200
     data = response.json()
     assert len(data) <= 2
+
+
+@pytest.mark.anyio
+async def test_list_notes_summary_view(client: AsyncClient, auth_headers):
+    """Test that the summary view omits encrypted blobs."""
+    note_data = {
+        "encrypted_title": "c3VtbWFyeSB0aXRsZQ==",
+        "encrypted_content": "c3VtbWFyeSBjb250ZW50",
+        "encrypted_transcription": "dHJhbnNjcmlwdGlvbg==",
+        "is_archived": False
+    }
+    await client.post("/api/v1/notes/", json=note_data, headers=auth_headers)
+
+    response = await client.get("/api/v1/notes/?view=summary", headers=auth_headers)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert len(data) > 0
+    summary = next(note for note in data if note["encrypted_title"] == note_data["encrypted_title"])
+    assert "encrypted_content" not in summary
+    assert "encrypted_transcription" not in summary
+    assert "has_audio" in summary
+    assert "updated_at" in summary
+
+
+@pytest.mark.anyio
+async def test_get_note_conditional(client: AsyncClient, auth_headers):
+    """Test ETag / If-None-Match handling for a single note."""
+    note_data = {"encrypted_title": "ZXRhZw==", "encrypted_content": "ZXRhZyBjb250ZW50"}
+    create_response = await client.post("/api/v1/notes/", json=note_data, headers=auth_headers)
+    note_id = create_response.json()["id"]
+
+    response = await client.get(f"/api/v1/notes/{note_id}", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    cached = await client.get(
+        f"/api/v1/notes/{note_id}", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    await client.put(
+        f"/api/v1/notes/{note_id}", json={"is_archived": True}, headers=auth_headers
+    )
+    changed = await client.get(
+        f"/api/v1/notes/{note_id}", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_list_notes_conditional(client: AsyncClient, auth_headers):
+    """Test that an unchanged notes page is answered with 304."""
+    response = await client.get("/api/v1/notes/", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    cached = await client.get("/api/v1/notes/", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_search_notes_by_blind_index(client: AsyncClient, auth_headers):
+    """Test AND/OR search over client-supplied search tokens."""
+    first = await client.post(
+        "/api/v1/notes/",
+        json={"encrypted_content": "b25l", "search_tokens": ["tok-alpha", "tok-beta"]},
+        headers=auth_headers,
+    )
+    second = await client.post(
+        "/api/v1/notes/",
+        json={"encrypted_content": "dHdv", "search_tokens": ["tok-beta"]},
+        headers=auth_headers,
+    )
+    first_id, second_id = first.json()["id"], second.json()["id"]
+
+    response = await client.get(
+        "/api/v1/notes/search?token=tok-alpha&token=tok-beta", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert [note["id"] for note in response.json()] == [first_id]
+
+    response = await client.get(
+        "/api/v1/notes/search?token=tok-alpha&token=tok-beta&mode=any", headers=auth_headers
+    )
+    assert {note["id"] for note in response.json()} == {first_id, second_id}
+
+    # Replacing the token set drops stale tokens
+    await client.put(
+        f"/api/v1/notes/{first_id}", json={"search_tokens": ["tok-gamma"]}, headers=auth_headers
+    )
+    response = await client.get("/api/v1/notes/search?token=tok-alpha", headers=auth_headers)
+    assert response.json() == []
+
+
+@pytest.mark.anyio
+async def test_search_tokens_are_keyed_per_user():
+    """Two users' notes sharing an id keep separate search tokens."""
+    from sqlalchemy import delete
+
+    from app.db.session import AsyncSessionLocal
+    from app.models.note import Note
+    from app.models.user import User
+    from app.services import search_index
+
+    note_id = uuid.uuid4()
+    users = [User(email=f"tokens-{uuid.uuid4().hex}@example.com") for _ in range(2)]
+    async with AsyncSessionLocal() as session:
+        session.add_all(users)
+        await session.flush()
+        session.add_all([Note(id=note_id, user_id=user.id, encrypted_content="eA==") for user in users])
+        await session.flush()
+        for user in users:
+            await search_index.add_tokens(session, note_id, user.id, ["tok-shared"])
+        await session.commit()
+
+        for user in users:
+            matches = (await session.execute(
+                search_index.matching_note_ids(user.id, ["tok-shared"], match_all=True)
+            )).scalars().all()
+            assert matches == [note_id]
+
+        await session.execute(delete(User).where(User.id.in_([user.id for user in users])))
+        await session.commit()
+
+
+@pytest.mark.anyio
+async def test_chunked_note_delta_update(client: AsyncClient, auth_headers):
+    """Test chunked bodies: only new chunks are sent, stale versions conflict."""
+    import base64
+    import hashlib
+
+    def chunk(data: bytes) -> dict:
+        return {"digest": hashlib.sha256(data).hexdigest(), "data": base64.b64encode(data).decode()}
+
+    a, b, c = chunk(b"chunk-a"), chunk(b"chunk-b"), chunk(b"chunk-c")
+    create_response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "aW5saW5l"}, headers=auth_headers
+    )
+    note = create_response.json()
+    assert note["content_version"] == 0
+
+    response = await client.patch(
+        f"/api/v1/notes/{note['id']}/chunks",
+        json={"base_version": 0, "chunks": [a["digest"], b["digest"]], "new_chunks": [a, b]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    note = response.json()
+    assert note["content_version"] == 1
+    assert note["content_chunks"] == [a["digest"], b["digest"]]
+    assert note["encrypted_content"] == ""
+
+    # Only the changed chunk travels; unchanged ones are referenced by digest
+    response = await client.patch(
+        f"/api/v1/notes/{note['id']}/chunks",
+        json={"base_version": 1, "chunks": [a["digest"], c["digest"]], "new_chunks": [c]},
+        headers=auth_headers,
+    )
+    assert response.json()["content_version"] == 2
+
+    stale = await client.patch(
+        f"/api/v1/notes/{note['id']}/chunks",
+        json={"base_version": 1, "chunks": [a["digest"]]},
+        headers=auth_headers,
+    )
+    assert stale.status_code == 409
+
+    unknown = await client.patch(
+        f"/api/v1/notes/{note['id']}/chunks",
+        json={"base_version": 2, "chunks": [b["digest"]]},
+        headers=auth_headers,
+    )
+    assert unknown.status_code == 422  # chunk-b was pruned when it stopped being referenced
+
+    response = await client.get(
+        f"/api/v1/notes/{note['id']}/chunks?digest={c['digest']}", headers=auth_headers
+    )
+    assert response.json()["chunks"] == [c]
+
+
+@pytest.mark.anyio
+async def test_inline_body_prunes_previous_chunks(client: AsyncClient, auth_headers):
+    """Replacing a chunked body inline prunes the chunks it referenced, and only those."""
+    import base64
+    import hashlib
+
+    def chunk(data: bytes) -> dict:
+        return {"digest": hashlib.sha256(data).hexdigest(), "data": base64.b64encode(data).decode()}
+
+    a, b = chunk(b"chunk-a"), chunk(b"chunk-b")
+    first, second = [
+        (await client.post("/api/v1/notes/", json={"encrypted_content": "aW5saW5l"}, headers=auth_headers)).json()
+        for _ in range(2)
+    ]
+    await client.patch(
+        f"/api/v1/notes/{first['id']}/chunks",
+        json={"base_version": 0, "chunks": [a["digest"], b["digest"]], "new_chunks": [a, b]},
+        headers=auth_headers,
+    )
+    await client.patch(
+        f"/api/v1/notes/{second['id']}/chunks",
+        json={"base_version": 0, "chunks": [b["digest"]]},
+        headers=auth_headers,
+    )
+
+    async def stored() -> list:
+        response = await client.get(
+            f"/api/v1/notes/{first['id']}/chunks?digest={a['digest']}&digest={b['digest']}",
+            headers=auth_headers,
+        )
+        return sorted(c["digest"] for c in response.json()["chunks"])
+
+    response = await client.put(
+        f"/api/v1/notes/{first['id']}", json={"encrypted_content": "aW5saW5l"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["content_chunks"] is None
+    assert "previous_chunks" not in response.json()
+    # chunk-b is still referenced by the second note
+    assert await stored() == [b["digest"]]
+
+    response = await client.put(
+        f"/api/v1/notes/{second['id']}/raw/content",
+        content=b"inline",
+        headers={**auth_headers, "Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 200
+    assert "previous_chunks" not in response.json()
+    assert await stored() == []
+
+
+@pytest.mark.anyio
+async def test_export_notes_ndjson(client: AsyncClient, auth_headers):
+    """Test NDJSON export and resuming from a cursor."""
+    import json
+
+    for i in range(3):
+        await client.post(
+            "/api/v1/notes/", json={"encrypted_content": "ZXhwb3J0"}, headers=auth_headers
+        )
+
+    response = await client.get("/api/v1/notes/export", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    ids = [note["id"] for note in lines]
+    assert len(ids) >= 3
+    assert ids == sorted(ids)
+
+    resumed = await client.get(f"/api/v1/notes/export?after={ids[0]}", headers=auth_headers)
+    assert [json.loads(line)["id"] for line in resumed.text.splitlines()] == ids[1:]
+
+    compressed = await client.get("/api/v1/notes/export?compress=true", headers=auth_headers)
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["id"] for line in compressed.text.splitlines()] == ids
+
+
+@pytest.mark.anyio
+async def test_import_notes_ndjson_idempotent(client: AsyncClient, auth_headers):
+    """Test bulk NDJSON import, per-line validation and idempotent re-runs."""
+    body = b"\n".join([
+        b'{"encrypted_content": "aW1wb3J0IDE="}',
+        b'{"encrypted_content": "aW1wb3J0IDI=", "created_at": "2024-01-01T00:00:00Z"}',
+        b'{"encrypted_content": "not base64!"}',
+    ])
+    headers = {**auth_headers, "Content-Type": "application/x-ndjson"}
+
+    response = await client.post("/api/v1/notes/import", content=body, headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["received"] == 3
+    assert report["imported"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 3
+
+    rerun = (await client.post("/api/v1/notes/import", content=body, headers=headers)).json()
+    assert rerun["imported"] == 0
+    assert rerun["skipped"] == 2
+
+
+@pytest.mark.anyio
+async def test_import_notes_reports_progress_and_resumes(client: AsyncClient, auth_headers, monkeypatch):
+    """Test per-batch progress, the resume cursor of a failed import, and start_line."""
+    from app.services import note_import
+
+    monkeypatch.setattr(note_import, "IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(note_import, "MAX_LINE_BYTES", 100)
+    lines = [f'{{"id": "{uuid.uuid4()}", "encrypted_content": "cmVzdW1l"}}'.encode() for _ in range(3)]
+    headers = {**auth_headers, "Content-Type": "application/x-ndjson"}
+
+    # The oversized (unterminated) line fails the upload after the first batch committed
+    failing = b"\n".join([*lines[:2], b"x" * 200])
+    response = await client.post("/api/v1/notes/import", content=failing, headers=headers)
+    assert response.status_code == 413
+    assert response.headers["Import-Committed-Line"] == "2"
+
+    body = b"\n".join([*lines[:2], b"", lines[2]])
+    response = await client.post("/api/v1/notes/import?start_line=3", content=body, headers=headers)
+    report = response.json()
+    assert (report["received"], report["imported"], report["committed_line"]) == (1, 1, 4)
+    assert report["progress"] == [{"batch": 1, "through_line": 4, "imported": 1, "skipped": 0}]
+
+
+@pytest.mark.anyio
+async def test_writes_pin_reads_to_primary(client: AsyncClient, auth_headers):
+    """Test that a committed write is recorded for read-your-writes routing."""
+    from app.db import replicas
+
+    create_response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "cGlubmVk"}, headers=auth_headers
+    )
+    user_id = create_response.json()["user_id"]
+    assert replicas.wrote_recently(uuid.UUID(user_id))
+
+    response = await client.get(f"/api/v1/notes/{create_response.json()['id']}", headers=auth_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_write_marker_pins_reads_across_workers(client: AsyncClient, auth_headers, monkeypatch):
+    """Test that the client-carried write marker routes reads to the primary."""
+    import time
+
+    from starlette.requests import Request
+
+    from app.db import replicas
+    from app.db.session import AsyncSessionLocal
+
+    monkeypatch.setattr(replicas, "replicas", [object()])
+    response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "bWFya2Vy"}, headers=auth_headers
+    )
+    marker = response.headers[replicas.WRITE_MARKER_HEADER]
+    assert response.cookies[replicas.WRITE_MARKER_COOKIE] == marker
+    # Reads that only query get no marker
+    listed = await client.get("/api/v1/notes/", headers=auth_headers)
+    assert replicas.WRITE_MARKER_HEADER not in listed.headers
+
+    def request(headers):
+        return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+    # A worker that never saw the write: only the marker tells it
+    assert replicas.client_wrote_recently(request({replicas.WRITE_MARKER_HEADER: marker}))
+    assert replicas.client_wrote_recently(request({"Cookie": f"{replicas.WRITE_MARKER_COOKIE}={marker}"}))
+    assert await replicas.read_sessionmaker(uuid.uuid4(), client_wrote=True) is AsyncSessionLocal
+    stale = f"{time.time() - 60:.3f}"
+    for value in (stale, f"{time.time() + 60:.3f}", "nan", "junk"):
+        assert not replicas.client_wrote_recently(request({replicas.WRITE_MARKER_HEADER: value}))
+    assert not replicas.client_wrote_recently(request({}))
+
+
+@pytest.mark.anyio
+async def test_note_responses_match_schema(client: AsyncClient, auth_headers):
+    """Test that the row-based fast path returns exactly the schema fields."""
+    from app.schemas.note import Note as NoteSchema
+
+    create_response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "ZmFzdCBwYXRo"}, headers=auth_headers
+    )
+    created = create_response.json()
+    assert set(created) == set(NoteSchema.model_fields)
+    assert NoteSchema.model_validate(created).encrypted_content == "ZmFzdCBwYXRo"
+
+    listed = (await client.get("/api/v1/notes/", headers=auth_headers)).json()
+    assert next(note for note in listed if note["id"] == created["id"]) == created
+
+
+def test_fast_json_renders_asyncpg_uuids():
+    """asyncpg's uuid.UUID subclass is rendered like a plain UUID."""
+    from asyncpg.pgproto.pgproto import UUID as PgUUID
+
+    from app.api.responses import FastJSONResponse
+
+    note_id = uuid.uuid4()
+    body = FastJSONResponse({"id": PgUUID(str(note_id)), "user_id": note_id}).body
+    assert body == f'{{"id":"{note_id}","user_id":"{note_id}"}}'.encode()
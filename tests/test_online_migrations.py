@@ -0,0 +1,136 @@
+"""
+Tests for the online migration helpers and the migration lock report.
+"""
+import io
+import re
+import uuid
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects import postgresql
+
+from app.db import online_migrations
+from app.db.session import AsyncSessionLocal
+from app.api.v1.routes_notes import NOTE_COLUMNS
+from app.models.note import Note
+from app.services import note_chunks
+
+
+def _render(upgrade) -> str:
+    """SQL an upgrade function emits in `alembic upgrade --sql` mode."""
+    buffer = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name="postgresql",
+        opts={"as_sql": True, "output_buffer": buffer, "transactional_ddl": True},
+    )
+    with Operations.context(context):
+        upgrade()
+    return "-- Running upgrade a -> example\n\n" + buffer.getvalue()
+
+
+def test_classify_lock_levels():
+    cases = {
+        "CREATE INDEX ix_notes_title ON notes (title)": ("SHARE", "index build"),
+        "CREATE INDEX CONCURRENTLY ix_notes_title ON notes (title)": ("SHARE UPDATE EXCLUSIVE", "index build"),
+        "ALTER TABLE notes ALTER COLUMN title SET NOT NULL": ("ACCESS EXCLUSIVE", "scan"),
+        "ALTER TABLE notes ALTER COLUMN title TYPE BYTEA": ("ACCESS EXCLUSIVE", "rewrite"),
+        "ALTER TABLE notes ADD COLUMN flag BOOLEAN DEFAULT false": ("ACCESS EXCLUSIVE", "instant"),
+        "ALTER TABLE notes ADD CONSTRAINT ck CHECK (title IS NOT NULL) NOT VALID": ("ACCESS EXCLUSIVE", "instant"),
+        "ALTER TABLE notes VALIDATE CONSTRAINT ck": ("SHARE UPDATE EXCLUSIVE", "scan"),
+        "ALTER TABLE notes ADD CONSTRAINT fk FOREIGN KEY(user_id) REFERENCES users (id)": ("SHARE ROW EXCLUSIVE", "scan"),
+    }
+    for statement, expected in cases.items():
+        rule = online_migrations.classify(statement)
+        assert (rule.lock, rule.duration) == expected, statement
+
+
+def test_helpers_do_not_block_traffic():
+    def upgrade():
+        online_migrations.set_lock_timeout()
+        online_migrations.create_index_concurrently("ix_notes_is_archived", "notes", ["is_archived"])
+        online_migrations.add_not_null("notes", "encrypted_title")
+        online_migrations.drop_index_concurrently("ix_notes_title", "notes")
+
+    findings = online_migrations.analyze(_render(upgrade))
+
+    assert [f.rule.lock for f in findings] == [
+        "SHARE UPDATE EXCLUSIVE",  # create index concurrently
+        "ACCESS EXCLUSIVE",  # add NOT VALID check (instant)
+        "SHARE UPDATE EXCLUSIVE",  # validate
+        "ACCESS EXCLUSIVE",  # set not null, proven by the check
+        "ACCESS EXCLUSIVE",  # drop the check
+        "SHARE UPDATE EXCLUSIVE",  # drop index concurrently
+    ]
+    # SET NOT NULL after the validated check does not scan
+    assert findings[3].rule.duration == "instant"
+    assert not any(f.blocking for f in findings)
+    assert all(f.lock_timeout for f in findings)
+
+
+def test_report_flags_blocking_history():
+    """The old migrations that rewrote notes in place are reported."""
+    findings = online_migrations.lock_report("base:451a557c3a62")
+    blocking = {(f.revision, f.rule.duration) for f in findings if f.blocking}
+    assert ("80193dd100ca", "rewrite") in blocking
+    assert ("451a557c3a62", "scan") in blocking
+    # Statements on tables created by the same revision are harmless
+    assert not any(f.blocking for f in findings if f.revision == "1a2b3c4d5e6f")
+
+
+def test_new_migrations_stay_online():
+    """Revisions from here on must not block traffic on existing tables."""
+    findings = online_migrations.lock_report("451a557c3a62:head")
+    assert [f.statement for f in findings if f.blocking] == []
+
+
+def test_notes_partitioning_swaps_under_a_short_lock():
+    """Rows are copied online; only the swap takes ACCESS EXCLUSIVE, briefly."""
+    findings = online_migrations.lock_report("6f0c2a9d4e1b:9d1e7c4b2a60")
+    statements = [f.statement for f in findings]
+    partitions = [s for s in statements if "PARTITION OF notes_partitioned" in s]
+    assert len(partitions) == 16
+    assert "MODULUS 16, REMAINDER 15" in partitions[-1]
+
+    lock = statements.index("LOCK TABLE notes, note_search_tokens IN ACCESS EXCLUSIVE MODE")
+    # Writes are mirrored before the copy and after the swap (for rollback)
+    assert any(s.startswith("CREATE TRIGGER mirror_notes_to_notes_partitioned") for s in statements[:lock])
+    assert statements[lock + 1].startswith("DROP TRIGGER IF EXISTS mirror_notes_to_notes_partitioned")
+    assert any(s.startswith("CREATE TRIGGER mirror_notes_to_notes_unpartitioned") for s in statements[lock:])
+    assert all(f.rule.duration == "instant" for f in findings[lock:-1])
+
+
+def _scanned(node: dict) -> set[str]:
+    """Relations a plan reads; a ModifyTable node names its target, the parent table."""
+    relations = set()
+    if node["Node Type"] != "ModifyTable" and "Relation Name" in node:
+        relations.add(node["Relation Name"])
+    for child in node.get("Plans", ()):
+        relations |= _scanned(child)
+    return relations
+
+
+@pytest.mark.anyio
+async def test_note_queries_prune_to_one_partition():
+    """Queries scoped to a user plan against a single notes partition."""
+    user_id, note_id = uuid.uuid4(), uuid.uuid4()
+    batch = select(Note.id).where(Note.user_id == user_id).limit(100).with_for_update(skip_locked=True)
+    queries = [
+        select(*NOTE_COLUMNS).where(Note.user_id == user_id).order_by(Note.updated_at.desc()),
+        select(*NOTE_COLUMNS).where(Note.id == note_id, Note.user_id == user_id),
+        update(Note).where(Note.id == note_id, Note.user_id == user_id).values(is_archived=True),
+        delete(Note).where(Note.id == note_id, Note.user_id == user_id),
+        note_chunks.returning_previous_chunks(
+            update(Note).where(Note.id == note_id, Note.user_id == user_id).values(content_chunks=None),
+            note_id, user_id,
+        ),
+        # account_deletion._delete_batch
+        delete(Note).where(Note.user_id == user_id, Note.id.in_(batch)),
+    ]
+    async with AsyncSessionLocal() as session:
+        for query in queries:
+            sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            plan = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar_one()
+            relations = _scanned(plan[0]["Plan"])
+            assert len(relations) == 1 and re.fullmatch(r"notes_p\d+", relations.pop()), str(sql)
@@ -0,0 +1,34 @@
+"""
+Checks for the per-endpoint SQL budgets enforced by the test client.
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+from query_budgets import QUERY_BUDGETS
+
+
+def test_every_endpoint_has_a_budget():
+    """New /api/v1 endpoints must declare their query budget."""
+    endpoints = {
+        (method.upper(), path)
+        for path, operations in app.openapi()["paths"].items()
+        if path.startswith("/api/v1/")
+        for method in operations
+    }
+    assert endpoints - set(QUERY_BUDGETS) == set()
+    assert set(QUERY_BUDGETS) - endpoints == set(), "budget declared for a removed endpoint"
+
+
+@pytest.mark.anyio
+async def test_requests_are_measured(client: AsyncClient, auth_headers, query_budget_app):
+    """The client records statements per request under the route template."""
+    create_response = await client.post(
+        "/api/v1/notes/", json={"encrypted_content": "YnVkZ2V0"}, headers=auth_headers
+    )
+    await client.get(f"/api/v1/notes/{create_response.json()['id']}", headers=auth_headers)
+
+    method, route, log = query_budget_app.requests[-1]
+    assert (method, route) == ("GET", "/api/v1/notes/{note_id}")
+    # user lookup + note
+    assert len(log.statements) == 2
@@ -0,0 +1,79 @@
+"""
+Startup-time benchmark with a regression budget.
+
+Each measurement runs in a fresh interpreter, so it sees a true cold start:
+the time to import app.main and the time from there to the first response.
+Run with `pytest -s tests/test_startup.py` to print the numbers.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Generous enough for a loaded CI machine; pulling eth_account back in
+# eagerly alone costs close to a second.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_IMPORT_BUDGET", "1.5"))
+FIRST_REQUEST_BUDGET_SECONDS = float(os.environ.get("STARTUP_FIRST_REQUEST_BUDGET", "0.5"))
+
+LAZY_MODULES = ("eth_account", "passlib", "jose")
+
+_BENCHMARK = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+from httpx import ASGITransport, AsyncClient
+
+async def first_request():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        before = time.perf_counter()
+        response = await client.get("/health")
+        return response.status_code, time.perf_counter() - before
+
+status, first_request_seconds = asyncio.run(first_request())
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_request_seconds": first_request_seconds,
+    "status": status,
+    "lazy_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+@pytest.fixture(scope="module")
+def startup():
+    result = subprocess.run(
+        [sys.executable, "-c", _BENCHMARK],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    print(
+        f"\nstartup: import {measured['import_seconds'] * 1000:.0f} ms, "
+        f"first request {measured['first_request_seconds'] * 1000:.0f} ms"
+    )
+    return measured
+
+
+def test_heavy_modules_load_lazily(startup):
+    """Auth crypto libraries are not imported until first used."""
+    assert startup["status"] == 200
+    assert startup["lazy_loaded"] == []
+
+
+def test_import_time_budget(startup):
+    assert startup["import_seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_first_request_budget(startup):
+    assert startup["first_request_seconds"] < FIRST_REQUEST_BUDGET_SECONDS
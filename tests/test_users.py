@@ -32,3 +32,21 @@ async def test_get_current_user_invalid_token(client: AsyncClient):
     headers = {"Authorization": "Bearer invalid_token_here"}
     response = await client.get("/api/v1/users/me", headers=headers)
     assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_delete_current_user(client: AsyncClient):
+    """Test that account deletion is accepted and locks the account immediately."""
+    user_data = {"email": "deleteme@example.com", "password": "DeletePass123!"}
+    await client.post("/api/v1/auth/register", json=user_data)
+    login = await client.post("/api/v1/auth/login", json=user_data)
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.post("/api/v1/notes/", json={"encrypted_content": "Ynll"}, headers=headers)
+
+    response = await client.delete("/api/v1/users/me", headers=headers)
+    assert response.status_code == 202
+    assert response.json()["status"] in ("pending", "completed")
+
+    # Inactive while the background job runs, gone once it finished
+    response = await client.get("/api/v1/users/me", headers=headers)
+    assert response.status_code in (400, 404)